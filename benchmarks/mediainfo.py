@@ -0,0 +1,70 @@
+"""
+Compares parsing whole MediaInfo output with asking MediaInfo for only
+the fields Medicure reads.
+
+Usage: python benchmarks/mediainfo.py [DIRECTORY] [--repeat N]
+"""
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+from typing import List, Tuple
+
+from medicure.prober import MediaInfoProber
+
+_default_directory = Path(__file__).parents[1] / 'tests' / 'data'
+_suffixes = ('.mkv', '.mka', '.mks', '.mp4', '.m4v')
+
+
+def measure(prober: MediaInfoProber, paths: List[Path]) -> Tuple[float, int]:
+    """
+    Measures mean number of seconds probing a file takes and peak number
+    of bytes allocated by Python while probing a file.
+    """
+    start = time.perf_counter()
+    for path in paths:
+        prober.probe(path)
+    seconds = (time.perf_counter() - start) / len(paths)
+
+    peak = 0
+    for path in set(paths):
+        tracemalloc.start()
+        prober.probe(path)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def main() -> None:
+    """
+    Runs the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('directory', nargs='?', default=_default_directory)
+    parser.add_argument('--repeat', type=int, default=5)
+    arguments = parser.parse_args()
+
+    paths = sorted(
+        path
+        for path in Path(arguments.directory).rglob('*')
+        if path.suffix.lower() in _suffixes
+    )
+    assert paths, 'No Matroska or MP4 file has been found.'
+    paths *= arguments.repeat
+
+    full_time, full_peak = measure(MediaInfoProber(minimal=False), paths)
+    minimal_time, minimal_peak = measure(MediaInfoProber(), paths)
+    print(f'Files:   {len(paths) // arguments.repeat}')
+    print(
+        f'Full:    {full_time * 1e3:.3f} ms, '
+        f'{full_peak / 1024:.1f} KiB peak per file'
+    )
+    print(
+        f'Minimal: {minimal_time * 1e3:.3f} ms, '
+        f'{minimal_peak / 1024:.1f} KiB peak per file'
+    )
+    print(f'Speedup: {full_time / minimal_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Measures planning a synthetic batch of episodes, i.e. selecting tracks
+of dubbing suppliers and making input plans, track orders and kinds of
+commands, without TMDB requests, scanning or probing.
+
+Usage: python benchmarks/plan.py [--episodes N] [--suppliers N]
+       [--repeat N]
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import List
+
+from medicure.core import Medicure
+from medicure.data_structures import (
+    DubbingSupplier,
+    FileInfo,
+    MuxCommand,
+    TrackInfo,
+    TrackSelection,
+)
+from medicure.matcher import SupplierMatcher
+
+_dubbing_suppliers = [
+    DubbingSupplier('original', 0, 'eng', 'eng', 'eng'),
+    DubbingSupplier('Supplier', 1, 'per', 'per', 'per', r'Supplier'),
+    DubbingSupplier('Subtitle', 2, 'per', None, 'per'),
+]
+_english = ['English', 'en', 'eng']
+_persian = ['Persian', 'fa', 'per', 'fas']
+
+
+def make_episode(number: int) -> List[FileInfo]:
+    """
+    Makes probed files of an episode, a video file with an English audio
+    and subtitle, a Persian audio file and a Persian subtitle file.
+    """
+    directory = Path('Show') / 'Season 01'
+    video_tracks = [
+        TrackInfo('General'),
+        TrackInfo('Video', 1, None, 'en', _english, 'Yes', 'No'),
+        TrackInfo('Audio', 2, None, 'en', _english, 'Yes', 'No'),
+        TrackInfo('Text', 3, None, 'en', _english, 'No', 'No'),
+    ]
+    audio_tracks = [
+        TrackInfo('General'),
+        TrackInfo('Audio', 1, 'Supplier', 'fa', _persian, 'Yes', 'No'),
+    ]
+    subtitle_tracks = [
+        TrackInfo('General'),
+        TrackInfo('Text', 1, None, 'fa', _persian, 'Yes', 'No'),
+    ]
+    return [
+        FileInfo(directory / f'S01E{number:04d}.mkv', 0, tracks=video_tracks),
+        FileInfo(directory / f'S01E{number:04d}.mka', 1, tracks=audio_tracks),
+        FileInfo(
+            directory / f'S01E{number:04d}.srt', 2, tracks=subtitle_tracks
+        ),
+    ]
+
+
+def plan(
+    medicure: Medicure,
+    episodes: List[List[FileInfo]],
+    dubbing_suppliers: List[DubbingSupplier],
+) -> None:
+    """
+    Plans commands of episodes the way `Medicure.plan_media` does.
+    """
+    matcher = SupplierMatcher(dubbing_suppliers)
+    for file_infos in episodes:
+        selection = TrackSelection()
+        for file_info in file_infos:
+            medicure._save_file_tracks_info(
+                file_info, file_info.tracks, matcher, selection
+            )
+        command = MuxCommand(
+            Path(f'{file_infos[0].path.stem}.mkv'),
+            medicure._get_input_plans(
+                file_infos,
+                matcher,
+                selection,
+                'eng',
+                'WEB-DL',
+                '1080p',
+            ),
+            medicure._get_track_order(dubbing_suppliers, selection),
+        )
+        command.kind = medicure._choose_kind(command, file_infos, False)
+
+
+def main() -> None:
+    """
+    Runs the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--episodes', type=int, default=1000)
+    parser.add_argument(
+        '--suppliers',
+        type=int,
+        default=len(_dubbing_suppliers),
+        help='Number of dubbing suppliers, extra ones match no track',
+    )
+    parser.add_argument('--repeat', type=int, default=10)
+    arguments = parser.parse_args()
+
+    medicure = Medicure(tmdb_api_key='')
+    episodes = [make_episode(i) for i in range(1, arguments.episodes + 1)]
+    dubbing_suppliers = _dubbing_suppliers + [
+        DubbingSupplier(f'Extra{i}', i % 3, 'ger', 'ger', 'ger', rf'Extra{i}')
+        for i in range(arguments.suppliers - len(_dubbing_suppliers))
+    ]
+    timings = []
+    for _ in range(arguments.repeat):
+        start = time.perf_counter()
+        plan(medicure, episodes, dubbing_suppliers)
+        timings.append(time.perf_counter() - start)
+
+    best_time = min(timings)
+    print(f'Episodes:  {arguments.episodes}')
+    print(f'Suppliers: {len(dubbing_suppliers)}')
+    print(f'Batch:     {best_time * 1e3:.3f} ms')
+    print(f'Episode:   {best_time / arguments.episodes * 1e6:.3f} us')
+
+
+if __name__ == '__main__':
+    main()
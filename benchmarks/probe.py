@@ -0,0 +1,55 @@
+"""
+Compares probing tracks with the native prober and with MediaInfo.
+
+Usage: python benchmarks/probe.py [DIRECTORY] [--repeat N]
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from pymediainfo import MediaInfo
+
+from medicure.prober import probe_tracks
+
+_default_directory = Path(__file__).parents[1] / 'tests' / 'data'
+_suffixes = ('.mkv', '.mka', '.mks', '.mp4', '.m4v')
+
+
+def measure(function: Callable[[Path], object], paths: List[Path]) -> float:
+    """
+    Measures mean number of seconds probing a file takes.
+    """
+    start = time.perf_counter()
+    for path in paths:
+        function(path)
+    return (time.perf_counter() - start) / len(paths)
+
+
+def main() -> None:
+    """
+    Runs the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('directory', nargs='?', default=_default_directory)
+    parser.add_argument('--repeat', type=int, default=20)
+    arguments = parser.parse_args()
+
+    paths = sorted(
+        path
+        for path in Path(arguments.directory).rglob('*')
+        if path.suffix.lower() in _suffixes
+    )
+    assert paths, 'No Matroska or MP4 file has been found.'
+    paths *= arguments.repeat
+
+    native_time = measure(probe_tracks, paths)
+    mediainfo_time = measure(MediaInfo.parse, paths)
+    print(f'Files:     {len(paths) // arguments.repeat}')
+    print(f'Native:    {native_time * 1e3:.3f} ms per file')
+    print(f'MediaInfo: {mediainfo_time * 1e3:.3f} ms per file')
+    print(f'Speedup:   {mediainfo_time / native_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
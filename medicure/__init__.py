@@ -1,2 +1,11 @@
+from medicure.async_core import AsyncMedicure
+from medicure.cache import ProbeCache, TMDBCache
 from medicure.core import Medicure
-from medicure.data_structures import DubbingSupplier
+from medicure.data_structures import DubbingSupplier, MuxResult, TreatEvent
+from medicure.prober import (
+    MediaInfoProber,
+    MkvmergeProber,
+    NativeProber,
+    Prober,
+)
+from medicure.tmdb_client import RateLimiter, TMDBClient
@@ -0,0 +1,339 @@
+import asyncio
+import os
+import time
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from medicure.cache import ProbeCache, TMDBCache
+from medicure.core import Medicure
+from medicure.data_structures import DubbingSupplier, MuxCommand, MuxResult
+from medicure.manifest import ManifestStore
+from medicure.muxer import mux_in_place, report_mux_results, write_option_file
+from medicure.prober import Prober
+
+
+class AsyncMedicure:
+    """
+    The Medicure for asyncio, its treatments can be awaited without
+    blocking the event loop.
+
+    TMDB lookups, directory scans and probes of a treatment are run in
+    the event loop's executor, and mkvmerge processes are run as asyncio
+    subprocesses. Cancelling a treatment terminates its mkvmerge
+    processes and removes their partial outputs.
+    """
+
+    def __init__(
+        self,
+        tmdb_api_key: str,
+        movies_directory: Optional[Path] = None,
+        tvshows_directory: Optional[Path] = None,
+        probe_cache: Optional[ProbeCache] = None,
+        tmdb_cache: Optional[TMDBCache] = None,
+        prober: Optional[Prober] = None,
+    ) -> None:
+        """
+        Initializes AsyncMedicure.
+
+        Parameters
+        ----------
+        tmdb_api_key:
+            Your TMDB API key
+
+        movies_directory:
+            Your movies' directory
+
+        tvshows_directory:
+            Your TV shows' directory
+
+        probe_cache:
+            The cache for probed tracks info of files
+
+        tmdb_cache:
+            The cache for TMDB responses
+
+        prober:
+            The probe backend for finding tracks of files
+        """
+        self._medicure = Medicure(
+            tmdb_api_key,
+            movies_directory,
+            tvshows_directory,
+            probe_cache,
+            tmdb_cache,
+            prober,
+        )
+        self._manifests = ManifestStore()
+
+    async def treat_media(
+        self,
+        imdb_id: str,
+        file_search_patterns: List[str],
+        video_language_code: str,
+        video_source: str,
+        video_release_format: str,
+        dubbing_suppliers: List[DubbingSupplier],
+        season_number: Optional[Union[int, Iterable[int], str]] = None,
+        jobs: int = 1,
+        incremental: bool = False,
+        force: bool = False,
+        recursive: bool = False,
+        propedit: bool = False,
+        infer_layout: bool = False,
+        preflight: bool = False,
+    ) -> List[MuxResult]:
+        """
+        Treats media like `Medicure.treat_media`.
+
+        Parameters
+        ----------
+        imdb_id:
+            IMDb id
+
+        file_search_patterns:
+            List of patterns for finding files
+
+        video_language_code:
+            3-letter language code for video track
+
+        video_source:
+            Source of the video file
+
+        video_release_format:
+            Format of the video file eg: Blu-ray, WEBRip, etc.
+
+        dubbing_suppliers:
+            List of possible dubbing suppliers
+
+        season_number:
+            Season number, a list of season numbers or "all" if
+            `imdb_id` is a TV show
+
+        jobs:
+            Maximum number of mkvmerge processes to run concurrently
+
+        incremental:
+            Whether up-to-date files should be skipped
+
+        force:
+            Whether all files should be rebuilt in incremental mode
+
+        recursive:
+            Whether subdirectories should be searched for files too
+
+        propedit:
+            Whether files should be edited in place with mkvpropedit
+            when possible
+
+        infer_layout:
+            Whether only the first episode of each track layout should
+            be probed
+
+        preflight:
+            Whether all problems of all episodes should be reported at
+            once before muxing anything
+
+        Returns
+        -------
+        Result of each command
+        """
+        assert jobs >= 1, '`jobs` should be a positive integer.'
+        plan = await asyncio.get_running_loop().run_in_executor(
+            None,
+            partial(
+                self._medicure.plan_media,
+                imdb_id,
+                file_search_patterns,
+                video_language_code,
+                video_source,
+                video_release_format,
+                dubbing_suppliers,
+                season_number,
+                recursive,
+                propedit,
+                infer_layout,
+                preflight,
+            ),
+        )
+        return await self._run_commands(plan, jobs, incremental, force)
+
+    async def treat_subtitle(
+        self,
+        imdb_id: str,
+        file_search_patterns: List[str],
+        language_code: str,
+        source: Optional[str] = None,
+        release_format: Optional[str] = None,
+        include_full_information: bool = False,
+        season_number: Optional[Union[int, Iterable[int], str]] = None,
+        jobs: int = 1,
+        incremental: bool = False,
+        force: bool = False,
+        recursive: bool = False,
+    ) -> List[MuxResult]:
+        """
+        Treats subtitles like `Medicure.treat_subtitle`.
+
+        Parameters
+        ----------
+        imdb_id:
+            IMDb id
+
+        file_search_patterns:
+            List of patterns for finding files
+
+        language_code:
+            3-letter language code for subtitle
+
+        source:
+            Source of the subtitle file
+
+        release_format:
+            Format of the video that the subtitle is sync with
+
+        include_full_information:
+            Whether the subtitle should be converted to mks format
+
+        season_number:
+            Season number, a list of season numbers or "all" if
+            `imdb_id` is a TV show
+
+        jobs:
+            Maximum number of mkvmerge processes to run concurrently
+
+        incremental:
+            Whether up-to-date files should be skipped
+
+        force:
+            Whether all files should be rebuilt in incremental mode
+
+        recursive:
+            Whether subdirectories should be searched for files too
+
+        Returns
+        -------
+        Result of each command
+        """
+        assert jobs >= 1, '`jobs` should be a positive integer.'
+        plan = await asyncio.get_running_loop().run_in_executor(
+            None,
+            partial(
+                self._medicure.plan_subtitle,
+                imdb_id,
+                file_search_patterns,
+                language_code,
+                source,
+                release_format,
+                include_full_information,
+                season_number,
+                recursive,
+            ),
+        )
+        return await self._run_commands(plan, jobs, incremental, force)
+
+    async def _run_commands(
+        self,
+        plan: Dict[str, Any],
+        jobs: int,
+        incremental: bool,
+        force: bool,
+    ) -> List[MuxResult]:
+        loop = asyncio.get_running_loop()
+        commands = [
+            MuxCommand.from_dict(command) for command in plan['commands']
+        ]
+        skipped_commands: List[MuxCommand] = []
+        if incremental:
+            commands, skipped_commands = await loop.run_in_executor(
+                None,
+                self._manifests.split_up_to_date_commands,
+                commands,
+                force,
+            )
+
+        semaphore = asyncio.Semaphore(jobs)
+        tasks = [
+            asyncio.ensure_future(self._mux(command, semaphore))
+            for command in commands
+        ]
+        try:
+            mux_results = await asyncio.gather(*tasks)
+        except BaseException:
+            # E.g. the treatment is cancelled or a command fails, other
+            # commands are cancelled and cleaned up before raising
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        if incremental:
+            await loop.run_in_executor(
+                None, self._manifests.save_fingerprints, commands, mux_results
+            )
+        report_mux_results(
+            mux_results, len(skipped_commands) if incremental else None
+        )
+        return mux_results
+
+    @staticmethod
+    async def _mux(
+        command: MuxCommand, semaphore: asyncio.Semaphore
+    ) -> MuxResult:
+        async with semaphore:
+            try:
+                # Copying, linking and editing in place are quick, they
+                # are run in the executor and waited for to finish
+                future = asyncio.get_running_loop().run_in_executor(
+                    None, mux_in_place, command
+                )
+                try:
+                    mux_result = await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    await asyncio.wait([future])
+                    raise
+
+                # E.g. mkvpropedit failed, it is remuxed instead
+                if mux_result is None:
+                    mux_result = await AsyncMedicure._run_mkvmerge(command)
+                return mux_result
+            except asyncio.CancelledError:
+                # The output is partial
+                if os.path.lexists(command.output):
+                    os.remove(command.output)
+                raise
+
+    @staticmethod
+    async def _run_mkvmerge(command: MuxCommand) -> MuxResult:
+        start = time.perf_counter()
+        option_file = write_option_file(command.arguments)
+        try:
+            process = await asyncio.create_subprocess_exec(
+                'mkvmerge',
+                f'@{option_file}',
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except OSError as e:
+            os.remove(option_file)
+            # E.g. it is not installed, the code a shell returns
+            return MuxResult(
+                command.output, 127, str(e), time.perf_counter() - start
+            )
+
+        try:
+            _, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            # It may have exited since it was last waited for
+            if process.returncode is None:
+                process.terminate()
+            await process.wait()
+            raise
+        finally:
+            os.remove(option_file)
+
+        return MuxResult(
+            command.output,
+            process.returncode,
+            stderr.decode(errors='replace'),
+            time.perf_counter() - start,
+        )
@@ -0,0 +1,555 @@
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from medicure.data_structures import TrackInfo
+
+DEFAULT_TMDB_CACHE_TTL = 7 * 24 * 60 * 60
+
+
+class _SQLiteCache:
+    _schema = ''
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            str(path), check_same_thread=False, isolation_level=None
+        )
+        self._connection.executescript(
+            '''
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            '''
+            + self._schema
+        )
+
+    def _get_counters(self) -> Dict[str, int]:
+        return dict(
+            self._connection.execute('SELECT name, value FROM counters')
+        )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        # The connection is in autocommit mode, so statements which are
+        # written together are committed at once explicitly
+        self._connection.execute('BEGIN')
+        try:
+            yield
+        except BaseException:
+            self._connection.execute('ROLLBACK')
+            raise
+        self._connection.execute('COMMIT')
+
+    def _increase_counter(self, name: str, value: int = 1) -> None:
+        _write_counters(self._connection, {name: value})
+
+    def _clear(self, table: str) -> None:
+        self._connection.execute(f'DELETE FROM {table}')
+        self._connection.execute('DELETE FROM counters')
+        self._connection.execute('VACUUM')
+
+
+def _write_counters(
+    connection: sqlite3.Connection, counters: Dict[str, int]
+) -> None:
+    for name, value in counters.items():
+        if value != 0:
+            connection.execute(
+                'INSERT INTO counters VALUES (?, ?) ON CONFLICT(name) '
+                'DO UPDATE SET value = value + excluded.value',
+                (name, value),
+            )
+
+
+class ProbeCache(_SQLiteCache):
+    """
+    A persistent cache for probed tracks info of media files
+    """
+
+    _schema = '''
+        CREATE TABLE IF NOT EXISTS probes (
+            path TEXT NOT NULL,
+            prober TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            inode INTEGER NOT NULL,
+            tracks TEXT NOT NULL,
+            tracks_size INTEGER NOT NULL,
+            accessed_at REAL NOT NULL,
+            PRIMARY KEY (path, prober)
+        );
+        CREATE INDEX IF NOT EXISTS probes_accessed_at
+            ON probes (accessed_at);
+    '''
+
+    def __init__(self, path: Path, max_size: int = 16 * 1024 * 1024) -> None:
+        """
+        Initializes probe cache.
+
+        Parameters
+        ----------
+        path:
+            Path of the SQLite database file which cache is stored in
+
+        max_size:
+            Maximum size of the stored tracks info in bytes, least
+            recently used files are evicted when this is exceeded.
+        """
+        assert max_size >= 1, '`max_size` should be a positive integer.'
+        super().__init__(path)
+        self._max_size = max_size
+        # Caches made before probe backends were a part of the key are
+        # dropped, their track ids may be of another backend
+        columns = [
+            row[1]
+            for row in self._connection.execute('PRAGMA table_info(probes)')
+        ]
+        if 'prober' not in columns or 'tracks_size' not in columns:
+            self._connection.executescript('DROP TABLE probes;' + self._schema)
+
+    def get(
+        self,
+        path: Path,
+        stat: Optional[os.stat_result] = None,
+        prober: str = '',
+    ) -> Optional[List[TrackInfo]]:
+        """
+        Gets the cached tracks info of a file.
+
+        Parameters
+        ----------
+        path:
+            The file path
+
+        stat:
+            Stat result of the file if it is already at hand, otherwise
+            the file is stat again
+
+        prober:
+            Name of the probe backend, backends may report different
+            track ids for the same file so they are cached separately
+
+        Returns
+        -------
+        Tracks info if the file is cached and has not been changed since
+        then, otherwise `None`
+        """
+        return self.get_many([path], [stat], prober)[0]
+
+    def get_many(
+        self,
+        paths: List[Path],
+        stats: Optional[List[Optional[os.stat_result]]] = None,
+        prober: str = '',
+    ) -> List[Optional[List[TrackInfo]]]:
+        """
+        Gets the cached tracks info of many files, accesses and
+        counters are written in one transaction.
+
+        Parameters
+        ----------
+        paths:
+            The file paths
+
+        stats:
+            Stat result of each file if they are already at hand
+
+        prober:
+            Name of the probe backend
+
+        Returns
+        -------
+        Tracks info of each file in order of paths, `None` for files
+        which are not cached or have been changed
+        """
+        identities = [
+            self._get_identity(path, stat)
+            for path, stat in zip(paths, stats or [None] * len(paths))
+        ]
+        with self._lock:
+            rows = [
+                self._connection.execute(
+                    'SELECT tracks FROM probes WHERE path = ? AND prober = ? '
+                    'AND size = ? AND mtime_ns = ? AND inode = ?',
+                    (key, prober, size, mtime_ns, inode),
+                ).fetchone()
+                for key, size, mtime_ns, inode in identities
+            ]
+            accessed_at = time.time()
+            accesses = [
+                (accessed_at, identity[0], prober)
+                for identity, row in zip(identities, rows)
+                if row is not None
+            ]
+            with self._transaction():
+                self._connection.executemany(
+                    'UPDATE probes SET accessed_at = ? '
+                    'WHERE path = ? AND prober = ?',
+                    accesses,
+                )
+                self._increase_counter('hits', len(accesses))
+                self._increase_counter('misses', len(rows) - len(accesses))
+
+        return [
+            None
+            if row is None
+            else [TrackInfo(**track) for track in json.loads(row[0])]
+            for row in rows
+        ]
+
+    def set(
+        self,
+        path: Path,
+        tracks: List[TrackInfo],
+        stat: Optional[os.stat_result] = None,
+        prober: str = '',
+    ) -> None:
+        """
+        Caches tracks info of a file.
+
+        Parameters
+        ----------
+        path:
+            The file path
+
+        tracks:
+            Tracks info of the file
+
+        stat:
+            Stat result of the file if it is already at hand, otherwise
+            the file is stat again
+
+        prober:
+            Name of the probe backend which has probed the file
+        """
+        self.set_many([path], [tracks], [stat], prober)
+
+    def set_many(
+        self,
+        paths: List[Path],
+        tracks: List[List[TrackInfo]],
+        stats: Optional[List[Optional[os.stat_result]]] = None,
+        prober: str = '',
+    ) -> None:
+        """
+        Caches tracks info of many files in one transaction.
+
+        Parameters
+        ----------
+        paths:
+            The file paths
+
+        tracks:
+            Tracks info of each file
+
+        stats:
+            Stat result of each file if they are already at hand
+
+        prober:
+            Name of the probe backend which has probed the files
+        """
+        stored_at = time.time()
+        entries = [
+            (
+                key,
+                prober,
+                size,
+                mtime_ns,
+                inode,
+                serialized_tracks,
+                len(serialized_tracks.encode()),
+                stored_at,
+            )
+            for (key, size, mtime_ns, inode), serialized_tracks in zip(
+                (
+                    self._get_identity(path, stat)
+                    for path, stat in zip(paths, stats or [None] * len(paths))
+                ),
+                (
+                    json.dumps([asdict(track) for track in file_tracks])
+                    for file_tracks in tracks
+                ),
+            )
+        ]
+        with self._lock, self._transaction():
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO probes '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                entries,
+            )
+            self._evict()
+
+    def clear(self) -> None:
+        """
+        Removes all cached tracks info and resets the counters.
+        """
+        with self._lock:
+            self._clear('probes')
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Gets cache statistics.
+
+        Returns
+        -------
+        Number of entries, hits, misses, evictions and size of the
+        database file in bytes
+        """
+        with self._lock:
+            counters = self._get_counters()
+            (entries,) = self._connection.execute(
+                'SELECT COUNT(*) FROM probes'
+            ).fetchone()
+
+        return {
+            'entries': entries,
+            'hits': counters.get('hits', 0),
+            'misses': counters.get('misses', 0),
+            'evictions': counters.get('evictions', 0),
+            'size': os.path.getsize(self._path),
+        }
+
+    def _evict(self) -> None:
+        # Files are kept from the most recently used one until their
+        # tracks info exceeds the maximum size
+        evicted = self._connection.execute(
+            'DELETE FROM probes WHERE rowid IN ('
+            'SELECT rowid FROM ('
+            'SELECT rowid, SUM(tracks_size) OVER ('
+            'ORDER BY accessed_at DESC, rowid DESC) AS kept_size '
+            'FROM probes) WHERE kept_size > ?)',
+            (self._max_size,),
+        ).rowcount
+        self._increase_counter('evictions', evicted)
+
+    @staticmethod
+    def _get_identity(
+        path: Path, stat: Optional[os.stat_result] = None
+    ) -> Tuple[str, int, int, int]:
+        if stat is None:
+            stat = os.stat(path)
+        return (
+            str(Path(path).resolve()),
+            stat.st_size,
+            stat.st_mtime_ns,
+            stat.st_ino,
+        )
+
+
+class TMDBCache(_SQLiteCache):
+    """
+    A cache for TMDB responses, an in-process LRU cache in front of a
+    persistent one
+    """
+
+    # Lookups are counted in memory and written in batches, so in-memory
+    # hits do not write to the database
+    _counter_batch_size = 100
+    _schema = '''
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            stored_at REAL NOT NULL
+        );
+    '''
+
+    def __init__(
+        self,
+        path: Path,
+        ttl: float = DEFAULT_TMDB_CACHE_TTL,
+        max_memory_entries: int = 256,
+        offline: bool = False,
+    ) -> None:
+        """
+        Initializes TMDB cache.
+
+        Parameters
+        ----------
+        path:
+            Path of the SQLite database file which cache is stored in
+
+        ttl:
+            Number of seconds that a response is considered fresh
+
+        max_memory_entries:
+            Maximum number of responses to keep in memory
+
+        offline:
+            If set to `True` TMDB won't be requested and only cached
+            responses will be used, even if they are expired.
+        """
+        assert (
+            max_memory_entries >= 1
+        ), '`max_memory_entries` should be a positive integer.'
+        super().__init__(path)
+        self._ttl = ttl
+        self._max_memory_entries = max_memory_entries
+        self._offline = offline
+        self._memory: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._pending_counters: 'Counter[str]' = Counter()
+        # Counts which are not written yet are written when the cache is
+        # garbage collected or the interpreter exits
+        weakref.finalize(
+            self, _write_counters, self._connection, self._pending_counters
+        )
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Gets a cached response.
+
+        Parameters
+        ----------
+        key:
+            The response key eg: TMDB path of the request
+
+        Returns
+        -------
+        The response if it is cached and is not expired, otherwise
+        `None`. In offline mode expired responses are returned too.
+        """
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is not None and (
+                self._offline or time.time() - entry[0] < self._ttl
+            ):
+                self._count('hits')
+                return copy.deepcopy(entry[1])
+
+            self._count('misses')
+            return None
+
+    def set(self, key: str, response: Any) -> None:
+        """
+        Caches a response.
+
+        Parameters
+        ----------
+        key:
+            The response key eg: TMDB path of the request
+
+        response:
+            The response
+        """
+        with self._lock, self._transaction():
+            stored_at = time.time()
+            self._connection.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?)',
+                (key, json.dumps(response), stored_at),
+            )
+            self._flush_counters()
+            # The caller may change its response afterwards
+            self._remember(key, stored_at, copy.deepcopy(response))
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Any]) -> Any:
+        """
+        Gets a cached response, fetches and caches it if it is not
+        cached or is expired.
+
+        Parameters
+        ----------
+        key:
+            The response key eg: TMDB path of the request
+
+        fetch:
+            A function which requests TMDB for the response
+
+        Returns
+        -------
+        The response
+        """
+        response = self.get(key)
+        if response is not None:
+            return response
+
+        if self._offline:
+            raise LookupError(
+                f'No cached TMDB response found for `{key}` in offline mode.'
+            )
+
+        response = fetch()
+        self.set(key, response)
+        return response
+
+    @property
+    def offline(self) -> bool:
+        """
+        Whether TMDB should not be requested
+        """
+        return self._offline
+
+    def clear(self) -> None:
+        """
+        Removes all cached responses and resets the counters.
+        """
+        with self._lock:
+            self._memory.clear()
+            self._pending_counters.clear()
+            self._clear('responses')
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Gets cache statistics.
+
+        Returns
+        -------
+        Number of entries, hits, misses and size of the database file
+        in bytes
+        """
+        with self._lock:
+            with self._transaction():
+                self._flush_counters()
+            counters = self._get_counters()
+            (entries,) = self._connection.execute(
+                'SELECT COUNT(*) FROM responses'
+            ).fetchone()
+
+        return {
+            'entries': entries,
+            'hits': counters.get('hits', 0),
+            'misses': counters.get('misses', 0),
+            'size': os.path.getsize(self._path),
+        }
+
+    def _count(self, name: str) -> None:
+        self._pending_counters[name] += 1
+        if sum(self._pending_counters.values()) >= self._counter_batch_size:
+            with self._transaction():
+                self._flush_counters()
+
+    def _flush_counters(self) -> None:
+        _write_counters(self._connection, self._pending_counters)
+        self._pending_counters.clear()
+
+    def _get_entry(self, key: str) -> Optional[Tuple[float, Any]]:
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+
+        row = self._connection.execute(
+            'SELECT stored_at, response FROM responses WHERE key = ?',
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        stored_at, response = row[0], json.loads(row[1])
+        self._remember(key, stored_at, response)
+        return stored_at, response
+
+    def _remember(self, key: str, stored_at: float, response: Any) -> None:
+        self._memory[key] = (stored_at, response)
+        self._memory.move_to_end(key)
+        if len(self._memory) > self._max_memory_entries:
+            self._memory.popitem(last=False)
@@ -3,6 +3,8 @@ from medicure.typer_patch.core import patch_param_type
 if True:
     patch_param_type()
 
+from medicure.cli.apply import apply_plan
 from medicure.cli.base import app
+from medicure.cli.cache import clear_cache, show_cache_stats, warm_cache
 from medicure.cli.save import save_collection_info, save_tmdb_info
-from medicure.cli.treat import treat_media, treat_subtitle
+from medicure.cli.treat import treat_batch, treat_media, treat_subtitle
@@ -0,0 +1,53 @@
+import json
+from typing import TextIO
+
+import click
+import rich_click.typer as typer
+
+from medicure.cli.base import app
+from medicure.cli.utils import create_error_message
+from medicure.core import Medicure
+
+
+@app.command('apply')
+def apply_plan(
+    plan: TextIO = typer.Argument(
+        ...,
+        param_type=click.File(encoding='utf-8'),
+        help=(
+            'A plan file written by `--plan-out` option of `medicure treat '
+            'media` or `medicure treat subtitle`, pass `-` to read from '
+            'stdin.'
+        ),
+    ),
+    jobs: int = typer.Option(
+        1,
+        '-j',
+        '--jobs',
+        min=1,
+        help='Maximum number of mkvmerge processes to run concurrently',
+    ),
+    incremental: bool = typer.Option(
+        False,
+        '--incremental',
+        help='Skip files which are up-to-date.',
+    ),
+    force: bool = typer.Option(
+        False,
+        '--force',
+        help='Rebuild all files in incremental mode.',
+    ),
+) -> None:
+    """
+    Applies a treatment plan.
+    """
+    # Applying a plan neither requests TMDB nor probes files, so it
+    # can be done on a host which has no TMDB info
+    medicure = Medicure(tmdb_api_key='')
+    try:
+        medicure.apply(json.load(plan), jobs, incremental, force)
+    except Exception as e:
+        typer.secho(
+            f'Error: {create_error_message(str(e))}', err=True, fg='red'
+        )
+        raise typer.Exit(code=1)
@@ -0,0 +1,72 @@
+from typing import Dict, List
+
+import rich_click.typer as typer
+
+from medicure.cli.base import app
+from medicure.cli.utils import (
+    create_error_message,
+    load_probe_cache,
+    load_tmdb_cache,
+    load_tmdb_info,
+)
+from medicure.tmdb_client import TMDBClient
+from medicure.utils import warm_tmdb_cache
+
+cache_app = typer.Typer()
+app.add_typer(cache_app, name='cache')
+
+
+@cache_app.command('clear')
+def clear_cache() -> None:
+    """
+    Clears cached data.
+    """
+    load_probe_cache().clear()
+    load_tmdb_cache().clear()
+    typer.secho('Your cache has been cleared successfully.', fg='green')
+
+
+@cache_app.command('stats')
+def show_cache_stats() -> None:
+    """
+    Shows cache statistics.
+    """
+    _echo_stats('Probe cache', load_probe_cache().stats())
+    _echo_stats('TMDB cache', load_tmdb_cache().stats())
+
+
+@cache_app.command('warm')
+def warm_cache(
+    imdb_ids: List[str] = typer.Argument(
+        ..., help='IMDb ids of movies or TV shows to cache TMDB info of'
+    ),
+) -> None:
+    """
+    Caches TMDB info ahead, so they can be treated offline.
+    """
+    tmdb_info = load_tmdb_info()
+    tmdb_client = TMDBClient(
+        tmdb_info['api_key'], load_tmdb_cache(tmdb_info['cache_ttl'])
+    )
+    try:
+        warm_tmdb_cache(imdb_ids, tmdb_client)
+    except Exception as e:
+        typer.secho(
+            f'Error: {create_error_message(str(e))}', err=True, fg='red'
+        )
+        raise typer.Exit(code=1)
+
+    typer.secho('TMDB info has been cached successfully.', fg='green')
+
+
+def _echo_stats(title: str, stats: Dict[str, int]) -> None:
+    lookups = stats['hits'] + stats['misses']
+    hit_rate = stats['hits'] / lookups if lookups > 0 else 0
+    typer.echo(f'{title}:')
+    typer.echo(f'  Entries: {stats["entries"]}')
+    typer.echo(f'  Hits: {stats["hits"]}')
+    typer.echo(f'  Misses: {stats["misses"]}')
+    typer.echo(f'  Hit rate: {hit_rate:.1%}')
+    if 'evictions' in stats:
+        typer.echo(f'  Evictions: {stats["evictions"]}')
+    typer.echo(f'  Size: {stats["size"]} bytes')
@@ -4,6 +4,7 @@ from typing import Optional
 
 import rich_click.typer as typer
 
+from medicure.cache import DEFAULT_TMDB_CACHE_TTL
 from medicure.cli.base import app
 from medicure.cli.utils import get_base_path
 
@@ -14,6 +15,12 @@ app.add_typer(save_app, name='save')
 @save_app.command('tmdb-info')
 def save_tmdb_info(
     api_key: str = typer.Argument(..., help='The TMDB API key'),
+    cache_ttl: float = typer.Option(
+        DEFAULT_TMDB_CACHE_TTL,
+        '--cache-ttl',
+        min=0,
+        help='Number of seconds that TMDB responses are cached for',
+    ),
 ) -> None:
     """
     Saves TMDB info on disk.
@@ -21,6 +28,7 @@ def save_tmdb_info(
     info_path = get_base_path() / 'tmdb_info.json'
     info = {
         'api_key': api_key,
+        'cache_ttl': cache_ttl,
     }
     with open(info_path, 'w') as f:
         json.dump(info, f, indent=4, sort_keys=True, ensure_ascii=False)
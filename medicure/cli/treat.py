@@ -1,17 +1,25 @@
-from typing import List, Optional
+import json
+from pathlib import Path
+from typing import List, Optional, TextIO
 
+import click
 import rich_click.typer as typer
 
 from medicure.cli.base import app
-from medicure.cli.types import DataList, StringList
+from medicure.cli.types import DataList, SeasonNumbers, StringList
 from medicure.cli.utils import (
     create_error_message,
     create_helps_from,
+    load_batch_manifest,
     load_collection_info,
+    load_probe_cache,
+    load_tmdb_cache,
     load_tmdb_info,
+    save_plan,
 )
 from medicure.core import Medicure
 from medicure.data_structures import DubbingSupplier
+from medicure.prober import get_prober
 
 treat_app = typer.Typer()
 app.add_typer(treat_app, name='treat')
@@ -38,22 +46,110 @@ def treat_media(
         ),
     ),
     season_number: Optional[int] = typer.Argument(None),
+    seasons: Optional[str] = typer.Option(
+        None,
+        '-s',
+        '--seasons',
+        param_type=SeasonNumbers,
+        help=(
+            'Season numbers of a TV show to treat together instead of '
+            '`SEASON_NUMBER`, e.g. `1-6`, `1,3,5-6` or `all` for all seasons '
+            'which have a directory.'
+        ),
+    ),
+    jobs: int = typer.Option(1, '-j', '--jobs', min=1),
+    incremental: bool = typer.Option(False, '--incremental'),
+    force: bool = typer.Option(False, '--force'),
+    recursive: bool = typer.Option(False, '-r', '--recursive'),
+    propedit: bool = typer.Option(False, '--propedit'),
+    infer_layout: bool = typer.Option(False, '--infer-layout'),
+    preflight: bool = typer.Option(False, '--preflight'),
+    plan_out: Optional[Path] = typer.Option(
+        None,
+        '--plan-out',
+        help=(
+            'Write the plan to a JSON file instead of running it, it can be '
+            'run later with `medicure apply` command.'
+        ),
+    ),
+    offline: bool = typer.Option(
+        False,
+        '--offline',
+        help=(
+            'Only use cached TMDB responses, they can be cached ahead with '
+            '`medicure cache warm` command.'
+        ),
+    ),
+    prober: str = typer.Option(
+        'native',
+        '--prober',
+        param_type=click.Choice(['native', 'mediainfo', 'mkvmerge']),
+        help=(
+            'Probe backend: `native` reads track headers of Matroska and MP4 '
+            'files and probes other files with MediaInfo, `mediainfo` probes '
+            'all files with MediaInfo and `mkvmerge` identifies them with '
+            '`mkvmerge -J` so track ids are exact.'
+        ),
+    ),
+    probe_jobs: Optional[int] = typer.Option(
+        None,
+        '--probe-jobs',
+        min=1,
+        help=(
+            'Maximum number of files to probe concurrently, all files of the '
+            'seasons are probed before planning, raise it for network '
+            'storage. Defaults to 8, or 4 for `mkvmerge` prober.'
+        ),
+    ),
 ) -> None:
     """
     Fixes video source, audio source, file name and language for
     all tracks.
     """
-    medicure = Medicure(load_tmdb_info()['api_key'], **load_collection_info())
+    tmdb_info = load_tmdb_info()
+    medicure = Medicure(
+        tmdb_info['api_key'],
+        **load_collection_info(),
+        probe_cache=load_probe_cache(),
+        tmdb_cache=load_tmdb_cache(tmdb_info['cache_ttl'], offline),
+        prober=get_prober(prober, probe_jobs),
+    )
     try:
-        medicure.treat_media(
-            imdb_id,
-            file_search_patterns,
-            video_language_code,
-            video_source,
-            video_release_format,
-            dubbing_suppliers,
-            season_number,
-        )
+        assert (
+            season_number is None or seasons is None
+        ), '`season_number` and `seasons` cannot be given together.'
+        if plan_out is not None:
+            plan = medicure.plan_media(
+                imdb_id,
+                file_search_patterns,
+                video_language_code,
+                video_source,
+                video_release_format,
+                dubbing_suppliers,
+                season_number if seasons is None else seasons,
+                recursive,
+                propedit,
+                infer_layout,
+                preflight,
+            )
+            save_plan(plan, plan_out)
+        else:
+            medicure.treat_media(
+                imdb_id,
+                file_search_patterns,
+                video_language_code,
+                video_source,
+                video_release_format,
+                dubbing_suppliers,
+                season_number if seasons is None else seasons,
+                jobs,
+                incremental,
+                force,
+                recursive,
+                propedit,
+                infer_layout,
+                preflight,
+            )
     except Exception as e:
         typer.secho(
             f'Error: {create_error_message(str(e))}', err=True, fg='red'
@@ -77,23 +173,163 @@ def treat_subtitle(
         '--include-full-information',
     ),
     season_number: Optional[int] = typer.Argument(None),
+    seasons: Optional[str] = typer.Option(
+        None,
+        '-s',
+        '--seasons',
+        param_type=SeasonNumbers,
+        help=(
+            'Season numbers of a TV show to treat together instead of '
+            '`SEASON_NUMBER`, e.g. `1-6`, `1,3,5-6` or `all` for all seasons '
+            'which have a directory.'
+        ),
+    ),
+    jobs: int = typer.Option(1, '-j', '--jobs', min=1),
+    incremental: bool = typer.Option(False, '--incremental'),
+    force: bool = typer.Option(False, '--force'),
+    recursive: bool = typer.Option(False, '-r', '--recursive'),
+    plan_out: Optional[Path] = typer.Option(
+        None,
+        '--plan-out',
+        help=(
+            'Write the plan to a JSON file instead of running it, it can be '
+            'run later with `medicure apply` command.'
+        ),
+    ),
+    offline: bool = typer.Option(
+        False,
+        '--offline',
+        help=(
+            'Only use cached TMDB responses, they can be cached ahead with '
+            '`medicure cache warm` command.'
+        ),
+    ),
 ) -> None:
     """
     Fixes subtitle source, file name and language.
     """
-    medicure = Medicure(load_tmdb_info()['api_key'], **load_collection_info())
+    tmdb_info = load_tmdb_info()
+    medicure = Medicure(
+        tmdb_info['api_key'],
+        **load_collection_info(),
+        probe_cache=load_probe_cache(),
+        tmdb_cache=load_tmdb_cache(tmdb_info['cache_ttl'], offline),
+    )
+    try:
+        assert (
+            season_number is None or seasons is None
+        ), '`season_number` and `seasons` cannot be given together.'
+        if plan_out is not None:
+            plan = medicure.plan_subtitle(
+                imdb_id,
+                file_search_patterns,
+                language_code,
+                source,
+                release_format,
+                include_full_information,
+                season_number if seasons is None else seasons,
+                recursive,
+            )
+            save_plan(plan, plan_out)
+        else:
+            medicure.treat_subtitle(
+                imdb_id,
+                file_search_patterns,
+                language_code,
+                source,
+                release_format,
+                include_full_information,
+                season_number if seasons is None else seasons,
+                jobs,
+                incremental,
+                force,
+                recursive,
+            )
+    except Exception as e:
+        typer.secho(
+            f'Error: {create_error_message(str(e))}', err=True, fg='red'
+        )
+        raise typer.Exit(code=1)
+
+
+@treat_app.command('batch')
+def treat_batch(
+    manifest: TextIO = typer.Argument(
+        ...,
+        param_type=click.File(),
+        help=(
+            'A JSON file containing list of entries or a JSON Lines file '
+            'containing an entry per line, pass `-` to read from stdin. Each '
+            'entry has the arguments and options of `medicure treat media` or '
+            '`medicure treat subtitle` in snake case e.g. `season_number` or '
+            '`seasons`, plus a `kind` key which is either `media` or '
+            '`subtitle`. `jobs`, `offline`, `prober` and `probe_jobs` are '
+            'options of the whole batch, and `plan_out` is not accepted.'
+        ),
+    ),
+    jobs: int = typer.Option(
+        1,
+        '-j',
+        '--jobs',
+        min=1,
+        help='Maximum number of mkvmerge processes to run concurrently',
+    ),
+    offline: bool = typer.Option(
+        False,
+        '--offline',
+        help=(
+            'Only use cached TMDB responses, they can be cached ahead with '
+            '`medicure cache warm` command.'
+        ),
+    ),
+    prober: str = typer.Option(
+        'native',
+        '--prober',
+        param_type=click.Choice(['native', 'mediainfo', 'mkvmerge']),
+        help='Probe backend, see `medicure treat media --help`.',
+    ),
+    probe_jobs: Optional[int] = typer.Option(
+        None,
+        '--probe-jobs',
+        min=1,
+        help=(
+            'Maximum number of files to probe concurrently, see `medicure '
+            'treat media --help`.'
+        ),
+    ),
+) -> None:
+    """
+    Treats a batch of media and subtitles in one process, prints result
+    of each entry as a JSON line.
+    """
+    tmdb_info = load_tmdb_info()
+    medicure = Medicure(
+        tmdb_info['api_key'],
+        **load_collection_info(),
+        probe_cache=load_probe_cache(),
+        tmdb_cache=load_tmdb_cache(tmdb_info['cache_ttl'], offline),
+        prober=get_prober(prober, probe_jobs),
+    )
     try:
-        medicure.treat_subtitle(
-            imdb_id,
-            file_search_patterns,
-            language_code,
-            source,
-            release_format,
-            include_full_information,
-            season_number,
+        entries = load_batch_manifest(manifest)
+    except Exception as e:
+        typer.secho(
+            f'Error: Bad batch manifest. {create_error_message(str(e))}',
+            err=True,
+            fg='red',
         )
+        raise typer.Exit(code=1)
+
+    succeeded = True
+    try:
+        for result in medicure.treat_batch(entries, jobs):
+            typer.echo(json.dumps(result.to_dict(), ensure_ascii=False))
+            succeeded = succeeded and result.succeeded
     except Exception as e:
         typer.secho(
             f'Error: {create_error_message(str(e))}', err=True, fg='red'
         )
         raise typer.Exit(code=1)
+
+    if not succeeded:
+        raise typer.Exit(code=1)
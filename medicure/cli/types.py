@@ -95,3 +95,51 @@ class DataList(click.ParamType):
                 err=True,
             )
             raise typer.Exit(code=1)
+
+
+class SeasonNumbersParamType(click.ParamType):
+    """
+    Represents season numbers param type, e.g. `1-6`, `1,3,5-6` or
+    `all`.
+    """
+
+    name = 'season_numbers'
+
+    def convert(
+        self,
+        value: Union[str, List[int]],
+        param: click.Parameter,
+        ctx: click.Context,
+    ) -> Union[str, List[int]]:
+        """
+        Convert the value to the correct type.
+        """
+        if not isinstance(value, str) or value == 'all':
+            return value
+
+        try:
+            return parse_season_numbers(value)
+        except ValueError:
+            typer.secho(
+                f'Error: Bad value for `{param.human_readable_name}`. '
+                f'`{value!r}` is neither a list of season numbers and '
+                f'ranges nor `all`.',
+                fg='red',
+                err=True,
+            )
+            raise typer.Exit(code=1)
+
+
+def parse_season_numbers(value: str) -> List[int]:
+    """
+    Parses a list of season numbers and ranges, e.g. `1-6` or
+    `1,3,5-6`, repeated seasons are dropped.
+    """
+    season_numbers = []
+    for part in value.split(','):
+        start, _, end = part.partition('-')
+        season_numbers.extend(range(int(start), int(end or start) + 1))
+    return list(dict.fromkeys(season_numbers))
+
+
+SeasonNumbers = SeasonNumbersParamType()
@@ -3,12 +3,18 @@ import platform
 import re
 from inspect import signature
 from pathlib import Path
-from typing import Callable, Dict
+from typing import Any, Callable, Dict, List, TextIO, Union
 
 import typer
 from docstring_parser import parse
 
-from medicure.cli.types import DataList, StringListParamType
+from medicure.cache import DEFAULT_TMDB_CACHE_TTL, ProbeCache, TMDBCache
+from medicure.cli.types import (
+    DataList,
+    StringListParamType,
+    parse_season_numbers,
+)
+from medicure.data_structures import DubbingSupplier
 
 
 def get_base_path() -> Path:
@@ -27,7 +33,7 @@ def get_base_path() -> Path:
     return base_path
 
 
-def load_tmdb_info() -> Dict[str, str]:
+def load_tmdb_info() -> Dict[str, Union[str, float]]:
     """
     Loads TMDB info from disk
     """
@@ -44,6 +50,7 @@ def load_tmdb_info() -> Dict[str, str]:
     with open(info_path) as f:
         info = json.load(f)
 
+    info.setdefault('cache_ttl', DEFAULT_TMDB_CACHE_TTL)
     return info
 
 
@@ -67,6 +74,66 @@ def load_collection_info() -> Dict[str, Path]:
     return info
 
 
+def load_probe_cache() -> ProbeCache:
+    """
+    Loads probe cache from disk.
+    """
+    return ProbeCache(get_base_path() / 'probe_cache.sqlite3')
+
+
+def load_tmdb_cache(
+    ttl: float = DEFAULT_TMDB_CACHE_TTL, offline: bool = False
+) -> TMDBCache:
+    """
+    Loads TMDB cache from disk.
+    """
+    return TMDBCache(
+        get_base_path() / 'tmdb_cache.sqlite3', ttl=ttl, offline=offline
+    )
+
+
+def load_batch_manifest(manifest: TextIO) -> List[Dict[str, Any]]:
+    """
+    Loads batch entries from a JSON list or JSON Lines manifest.
+    """
+    content = manifest.read()
+    try:
+        entries = json.loads(content)
+    except json.JSONDecodeError:
+        entries = [json.loads(line) for line in content.splitlines() if line]
+
+    if isinstance(entries, dict):
+        entries = [entries]
+
+    for entry in entries:
+        # Like the CLI, `seasons` is given instead of `season_number`
+        if 'seasons' in entry:
+            assert (
+                'season_number' not in entry
+            ), '`season_number` and `seasons` cannot be given together.'
+            seasons = entry.pop('seasons')
+            if isinstance(seasons, str) and seasons != 'all':
+                seasons = parse_season_numbers(seasons)
+            entry['season_number'] = seasons
+        if 'dubbing_suppliers' in entry:
+            entry['dubbing_suppliers'] = [
+                DubbingSupplier(*ds)
+                if isinstance(ds, list)
+                else DubbingSupplier(**ds)
+                for ds in entry['dubbing_suppliers']
+            ]
+
+    return entries
+
+
+def save_plan(plan: Dict[str, Any], path: Path) -> None:
+    """
+    Saves a treatment plan to a JSON file.
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(plan, f, ensure_ascii=False, indent=4)
+
+
 def collection_info_from_json(json_object: Dict[str, str]) -> Dict[str, Path]:
     """
     A from_json function for collection info
@@ -127,6 +194,10 @@ def create_helps_from(function: Callable) -> Callable:
             for parameter in parse(function.__doc__).params
         }
         for i, parameter in enumerate(signature(command).parameters.values()):
+            # CLI only parameters have their own helps
+            if parameter.name not in descriptions:
+                continue
+
             default_help = ''
             if isinstance(parameter.default.param_type, StringListParamType):
                 default_help = (
@@ -1,18 +1,47 @@
-import os
+import queue
 import re
-import shutil
-from collections import defaultdict
+from collections import Counter, defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import DefaultDict, List, Optional
-
-import tmdbsimple as tmdb
-from pymediainfo import MediaInfo, Track
+from typing import (
+    Any,
+    Callable,
+    DefaultDict,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
-from medicure.data_structures import DubbingSupplier, FileInfo
+from medicure.cache import ProbeCache, TMDBCache
+from medicure.data_structures import (
+    BatchResult,
+    DubbingSupplier,
+    FileInfo,
+    InputPlan,
+    MuxCommand,
+    MuxResult,
+    TrackInfo,
+    TrackKind,
+    TrackPlan,
+    TrackSelection,
+    TreatEvent,
+)
+from medicure.manifest import ManifestStore
+from medicure.matcher import SupplierMatcher
+from medicure.muxer import check_mux_results, mux, report_mux_results
+from medicure.prober import NativeProber, Prober, probe_tracks
+from medicure.scanner import PatternSet, scan_directory
+from medicure.tmdb_client import TMDBClient
 from medicure.utils import (
     extract_episode_number,
     get_movie_name,
-    get_tvshow_info,
+    get_tvshow_seasons_info,
 )
 
 
@@ -23,12 +52,23 @@ class Medicure:
 
     _media_suffix_pattern = r'\.(mkv|m4v|mp4|mka|mp3)$'
     _subtitle_suffix_pattern = r'\.(srt|mks|idx|sub)$'
+    _mediainfo_track_kinds = {
+        'Audio': TrackKind.AUDIO,
+        'Text': TrackKind.SUBTITLE,
+    }
+    # Indexed by track kind
+    _track_kinds = tuple(TrackKind)
+    _track_types = ('audio', 'subtitle')
+    _plan_version = 1
 
     def __init__(
         self,
         tmdb_api_key: str,
         movies_directory: Optional[Path] = None,
         tvshows_directory: Optional[Path] = None,
+        probe_cache: Optional[ProbeCache] = None,
+        tmdb_cache: Optional[TMDBCache] = None,
+        prober: Optional[Prober] = None,
     ) -> None:
         """
         Initializes Medicure.
@@ -45,16 +85,28 @@ class Medicure:
         tvshows_directory:
             Your TV shows' directory, this should be given for treating
             a TV show.
+
+        probe_cache:
+            The cache for probed tracks info of files, if given files
+            won't be probed again until they change.
+
+        tmdb_cache:
+            The cache for TMDB responses, if given TMDB won't be
+            requested again until cached responses expire.
+
+        prober:
+            The probe backend for finding tracks of files, by default
+            track headers of Matroska and MP4 files are read natively
+            and other files are probed with MediaInfo. Files of all
+            episodes are probed together before planning, as many
+            concurrently as the prober's `jobs`.
         """
-        tmdb.API_KEY = tmdb_api_key
+        self._tmdb_client = TMDBClient(tmdb_api_key, tmdb_cache)
         self._movies_directory = movies_directory
         self._tvshows_directory = tvshows_directory
-        self._dubbing_suppliers: Optional[List[DubbingSupplier]] = None
-        self._movie_file_infos: Optional[List[FileInfo]] = None
-        self._season_file_infos: Optional[
-            DefaultDict[int, List[FileInfo]]
-        ] = None
-        self._video_track_id: Optional[int] = None
+        self._probe_cache = probe_cache
+        self._prober = NativeProber() if prober is None else prober
+        self._manifests = ManifestStore()
 
     def treat_media(
         self,
@@ -64,8 +116,15 @@ class Medicure:
         video_source: str,
         video_release_format: str,
         dubbing_suppliers: List[DubbingSupplier],
-        season_number: Optional[int] = None,
-    ) -> None:
+        season_number: Optional[Union[int, Iterable[int], str]] = None,
+        jobs: int = 1,
+        incremental: bool = False,
+        force: bool = False,
+        recursive: bool = False,
+        propedit: bool = False,
+        infer_layout: bool = False,
+        preflight: bool = False,
+    ) -> List[MuxResult]:
         """
         Fixes video source, audio source, file name and language for
         all tracks.
@@ -97,11 +156,625 @@ class Medicure:
 
         season_number:
             If `imdb_id` is a TV show, season number should be given.
+            It can also be a list of season numbers or "all" for
+            all seasons which have a directory, episodes of all of them
+            are treated together.
+
+        jobs:
+            Maximum number of mkvmerge processes to run concurrently
+
+        incremental:
+            If set to `True` files whose inputs and track config have
+            not been changed since they were last created will be
+            skipped.
+
+        force:
+            If set to `True` in incremental mode, all files will be
+            rebuilt even if they are up-to-date.
+
+        recursive:
+            If set to `True` subdirectories e.g. Subs will be searched
+            for files too. Hidden and sample directories are skipped.
+
+        propedit:
+            If set to `True` files which need no track reordering,
+            removal or extra inputs will be cloned and their tracks
+            will be edited in place with mkvpropedit instead of being
+            remuxed.
+
+        infer_layout:
+            If set to `True` track headers of all episodes will be read
+            and only the first episode of each track layout will be
+            probed, tracks selected for it will be reused for other
+            episodes with the same track types, languages and titles.
+
+        preflight:
+            If set to `True` all problems of all episodes e.g. dubbing
+            suppliers which match no track or many tracks, or episode
+            files which are not in the TMDB season, will be reported at
+            once before muxing anything.
+
+        Returns
+        -------
+        Result of each command, including its kind, exit code,
+        standard error and wall time
+        """
+        assert jobs >= 1, '`jobs` should be a positive integer.'
+        return self._run_commands(
+            self._plan_media(
+                imdb_id,
+                file_search_patterns,
+                video_language_code,
+                video_source,
+                video_release_format,
+                dubbing_suppliers,
+                season_number,
+                recursive,
+                propedit,
+                infer_layout,
+                preflight,
+            ),
+            jobs,
+            incremental,
+            force,
+        )
+
+    def treat_subtitle(
+        self,
+        imdb_id: str,
+        file_search_patterns: List[str],
+        language_code: str,
+        source: Optional[str] = None,
+        release_format: Optional[str] = None,
+        include_full_information: bool = False,
+        season_number: Optional[Union[int, Iterable[int], str]] = None,
+        jobs: int = 1,
+        incremental: bool = False,
+        force: bool = False,
+        recursive: bool = False,
+    ) -> List[MuxResult]:
+        """
+        Fixes subtitle source, file name and language.
+
+        Parameters
+        ----------
+        imdb_id:
+            IMDb id
+
+        file_search_patterns:
+            List of patterns for finding files
+
+        language_code:
+            3-letter language code for subtitle
+            See https://en.wikipedia.org/wiki/List_of_ISO_639-2_codes
+            for available langauge codes.
+
+        source:
+            Source of the subtitle file: name of author or the website
+            which subtitle is downloaded from. This should be given only
+            when `include_full_information` is `True`.
+
+        release_format:
+            Format of the video that the subtitle is sync with eg:
+            Blu-ray, WEBRip, etc. See
+            https://en.wikipedia.org/wiki/Pirated_movie_release_types
+            for available formats. This should be given only
+            when `include_full_information` is `True`.
+
+        include_full_information:
+            If set to `True` the subtitle will be converted to mks
+            format inorder to save all subtitle information. If set to
+            `True`, `source` and `release_format`
+            should also be given.
+
+        season_number:
+            If `imdb_id` is a TV show season number should be given.
+            It can also be a list of season numbers or "all" for
+            all seasons which have a directory, episodes of all of them
+            are treated together.
+
+        jobs:
+            Maximum number of mkvmerge processes to run concurrently
+
+        incremental:
+            If set to `True` files whose inputs and track config have
+            not been changed since they were last created will be
+            skipped.
+
+        force:
+            If set to `True` in incremental mode, all files will be
+            rebuilt even if they are up-to-date.
+
+        recursive:
+            If set to `True` subdirectories e.g. Subs will be searched
+            for files too. Hidden and sample directories are skipped.
+
+        Returns
+        -------
+        Result of each mkvmerge run, including its exit code, standard
+        error and wall time
+        """
+        assert jobs >= 1, '`jobs` should be a positive integer.'
+        return self._run_commands(
+            self._plan_subtitle(
+                imdb_id,
+                file_search_patterns,
+                language_code,
+                source,
+                release_format,
+                include_full_information,
+                season_number,
+                recursive,
+            ),
+            jobs,
+            incremental,
+            force,
+        )
+
+    def iter_treat_media(
+        self,
+        imdb_id: str,
+        file_search_patterns: List[str],
+        video_language_code: str,
+        video_source: str,
+        video_release_format: str,
+        dubbing_suppliers: List[DubbingSupplier],
+        season_number: Optional[Union[int, Iterable[int], str]] = None,
+        jobs: int = 1,
+        incremental: bool = False,
+        force: bool = False,
+        recursive: bool = False,
+        propedit: bool = False,
+        infer_layout: bool = False,
+        preflight: bool = False,
+    ) -> Iterator[TreatEvent]:
+        """
+        Treats media like `treat_media`, but yields events of each
+        episode as soon as they happen, so later steps can be started
+        episode by episode.
+
+        Parameters
+        ----------
+        imdb_id:
+            IMDb id
+
+        file_search_patterns:
+            List of patterns for finding files
+
+        video_language_code:
+            3-letter language code for video track
+
+        video_source:
+            Source of the video file
+
+        video_release_format:
+            Format of the video file eg: Blu-ray, WEBRip, etc.
+
+        dubbing_suppliers:
+            List of possible dubbing suppliers
+
+        season_number:
+            Season number, a list of season numbers or "all" if
+            `imdb_id` is a TV show
+
+        jobs:
+            Maximum number of mkvmerge processes to run concurrently
+
+        incremental:
+            Whether up-to-date files should be skipped
+
+        force:
+            Whether all files should be rebuilt in incremental mode
+
+        recursive:
+            Whether subdirectories should be searched for files too
+
+        propedit:
+            Whether files should be edited in place with mkvpropedit
+            when possible
+
+        infer_layout:
+            Whether only the first episode of each track layout should
+            be probed
+
+        preflight:
+            Whether all problems of all episodes should be reported at
+            once before muxing anything
+
+        Yields
+        ------
+        Events of the treatment, a failed command fails the treatment
+        after all events have been yielded
+        """
+        assert jobs >= 1, '`jobs` should be a positive integer.'
+        yield from self._iter_treat(
+            partial(
+                self._plan_media,
+                imdb_id,
+                file_search_patterns,
+                video_language_code,
+                video_source,
+                video_release_format,
+                dubbing_suppliers,
+                season_number,
+                recursive,
+                propedit,
+                infer_layout,
+                preflight,
+            ),
+            jobs,
+            incremental,
+            force,
+        )
+
+    def iter_treat_subtitle(
+        self,
+        imdb_id: str,
+        file_search_patterns: List[str],
+        language_code: str,
+        source: Optional[str] = None,
+        release_format: Optional[str] = None,
+        include_full_information: bool = False,
+        season_number: Optional[Union[int, Iterable[int], str]] = None,
+        jobs: int = 1,
+        incremental: bool = False,
+        force: bool = False,
+        recursive: bool = False,
+    ) -> Iterator[TreatEvent]:
+        """
+        Treats subtitles like `treat_subtitle`, but yields events of
+        each episode as soon as they happen.
+
+        Parameters
+        ----------
+        imdb_id:
+            IMDb id
+
+        file_search_patterns:
+            List of patterns for finding files
+
+        language_code:
+            3-letter language code for subtitle
+
+        source:
+            Source of the subtitle file
+
+        release_format:
+            Format of the video that the subtitle is sync with
+
+        include_full_information:
+            Whether the subtitle should be converted to mks format
+
+        season_number:
+            Season number, a list of season numbers or "all" if
+            `imdb_id` is a TV show
+
+        jobs:
+            Maximum number of mkvmerge processes to run concurrently
+
+        incremental:
+            Whether up-to-date files should be skipped
+
+        force:
+            Whether all files should be rebuilt in incremental mode
+
+        recursive:
+            Whether subdirectories should be searched for files too
+
+        Yields
+        ------
+        Events of the treatment, a failed command fails the treatment
+        after all events have been yielded
+        """
+        assert jobs >= 1, '`jobs` should be a positive integer.'
+        yield from self._iter_treat(
+            partial(
+                self._plan_subtitle,
+                imdb_id,
+                file_search_patterns,
+                language_code,
+                source,
+                release_format,
+                include_full_information,
+                season_number,
+                recursive,
+            ),
+            jobs,
+            incremental,
+            force,
+        )
+
+    def plan_media(
+        self,
+        imdb_id: str,
+        file_search_patterns: List[str],
+        video_language_code: str,
+        video_source: str,
+        video_release_format: str,
+        dubbing_suppliers: List[DubbingSupplier],
+        season_number: Optional[Union[int, Iterable[int], str]] = None,
+        recursive: bool = False,
+        propedit: bool = False,
+        infer_layout: bool = False,
+        preflight: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Plans `treat_media` without running anything, so the plan can
+        be reviewed, saved and applied later with `apply`.
+
+        Parameters
+        ----------
+        imdb_id:
+            IMDb id
+
+        file_search_patterns:
+            List of patterns for finding files
+
+        video_language_code:
+            3-letter language code for video track
+
+        video_source:
+            Source of the video file
+
+        video_release_format:
+            Format of the video file eg: Blu-ray, WEBRip, etc.
+
+        dubbing_suppliers:
+            List of possible dubbing suppliers
+
+        season_number:
+            Season number, a list of season numbers or "all" if
+            `imdb_id` is a TV show
+
+        recursive:
+            Whether subdirectories should be searched for files too
+
+        propedit:
+            Whether files should be edited in place with mkvpropedit
+            when possible
+
+        infer_layout:
+            Whether only the first episode of each track layout should
+            be probed
+
+        preflight:
+            Whether all problems of all episodes should be reported at
+            once instead of being planned
+
+        Returns
+        -------
+        A JSON serializable plan, containing output, inputs and
+        planned tracks of each command
+        """
+        return self._dump_plan(
+            self._plan_media(
+                imdb_id,
+                file_search_patterns,
+                video_language_code,
+                video_source,
+                video_release_format,
+                dubbing_suppliers,
+                season_number,
+                recursive,
+                propedit,
+                infer_layout,
+                preflight,
+            )
+        )
+
+    def plan_subtitle(
+        self,
+        imdb_id: str,
+        file_search_patterns: List[str],
+        language_code: str,
+        source: Optional[str] = None,
+        release_format: Optional[str] = None,
+        include_full_information: bool = False,
+        season_number: Optional[Union[int, Iterable[int], str]] = None,
+        recursive: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Plans `treat_subtitle` without running anything, so the plan
+        can be reviewed, saved and applied later with `apply`.
+
+        Parameters
+        ----------
+        imdb_id:
+            IMDb id
+
+        file_search_patterns:
+            List of patterns for finding files
+
+        language_code:
+            3-letter language code for subtitle
+
+        source:
+            Source of the subtitle file
+
+        release_format:
+            Format of the video that the subtitle is sync with
+
+        include_full_information:
+            Whether the subtitle should be converted to mks format
+
+        season_number:
+            Season number, a list of season numbers or "all" if
+            `imdb_id` is a TV show
+
+        recursive:
+            Whether subdirectories should be searched for files too
+
+        Returns
+        -------
+        A JSON serializable plan, containing output, inputs and
+        planned tracks of each command
+        """
+        return self._dump_plan(
+            self._plan_subtitle(
+                imdb_id,
+                file_search_patterns,
+                language_code,
+                source,
+                release_format,
+                include_full_information,
+                season_number,
+                recursive,
+            )
+        )
+
+    def apply(
+        self,
+        plan: Dict[str, Any],
+        jobs: int = 1,
+        incremental: bool = False,
+        force: bool = False,
+    ) -> List[MuxResult]:
+        """
+        Runs commands of a plan made by `plan_media` or `plan_subtitle`.
+
+        Parameters
+        ----------
+        plan:
+            The plan, possibly loaded from a JSON file
+
+        jobs:
+            Maximum number of mkvmerge processes to run concurrently
+
+        incremental:
+            If set to `True` files which are up-to-date will be skipped.
+
+        force:
+            If set to `True` in incremental mode, all files will be
+            rebuilt even if they are up-to-date.
+
+        Returns
+        -------
+        Result of each command
         """
-        self._dubbing_suppliers = dubbing_suppliers
+        assert jobs >= 1, '`jobs` should be a positive integer.'
+        assert (
+            plan.get('version') == self._plan_version
+        ), f'`plan` version should be {self._plan_version}.'
+        return self._run_commands(
+            [MuxCommand.from_dict(command) for command in plan['commands']],
+            jobs,
+            incremental,
+            force,
+        )
+
+    def treat_batch(
+        self,
+        entries: List[Dict[str, Any]],
+        jobs: int = 1,
+    ) -> Iterator[BatchResult]:
+        """
+        Treats a batch of media and subtitles, mkvmerge processes of all
+        entries share the same pool.
+
+        Parameters
+        ----------
+        entries:
+            List of entries, each entry is a dictionary of keyword
+            arguments of `treat_media` or `treat_subtitle` except
+            `jobs`, plus a `kind` key which is either `'media'` or
+            `'subtitle'`.
+
+        jobs:
+            Maximum number of mkvmerge processes to run concurrently
+
+        Yields
+        ------
+        Result of each entry in order of entries, as soon as the entry
+        and all entries before it have been treated
+        """
+        assert jobs >= 1, '`jobs` should be a positive integer.'
+        pending: Deque[
+            Tuple[BatchResult, List[MuxCommand], List[Future], bool]
+        ] = deque()
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            for i, entry in enumerate(entries):
+                arguments = dict(entry)
+                kind = arguments.pop('kind', None)
+                incremental = arguments.pop('incremental', False)
+                force = arguments.pop('force', False)
+                result = BatchResult(i, kind, arguments.get('imdb_id'))
+                commands, futures = [], []
+                try:
+                    assert kind in (
+                        'media',
+                        'subtitle',
+                    ), '`kind` should be either `media` or `subtitle`.'
+                    plan = (
+                        self._plan_media
+                        if kind == 'media'
+                        else self._plan_subtitle
+                    )
+                    commands = plan(**arguments)
+                    if incremental:
+                        (
+                            commands,
+                            skipped_commands,
+                        ) = self._manifests.split_up_to_date_commands(
+                            commands, force
+                        )
+                        result.skipped = [c.output for c in skipped_commands]
+                    futures = [
+                        executor.submit(mux, command) for command in commands
+                    ]
+                except Exception as e:
+                    result.error = str(e)
+                pending.append((result, commands, futures, incremental))
+
+                # Streams results of finished entries while planning
+                while pending and all(f.done() for f in pending[0][2]):
+                    yield self._get_batch_result(*pending.popleft())
+
+            while pending:
+                yield self._get_batch_result(*pending.popleft())
+
+    def _get_batch_result(
+        self,
+        result: BatchResult,
+        commands: List[MuxCommand],
+        futures: List[Future],
+        incremental: bool,
+    ) -> BatchResult:
+        result.outputs = [command.output for command in commands]
+        # E.g. copying an input fails, only this entry fails
+        try:
+            mux_results = [future.result() for future in futures]
+            if incremental:
+                self._manifests.save_fingerprints(commands, mux_results)
+            check_mux_results(mux_results)
+        except Exception as e:
+            result.error = str(e)
+
+        return result
+
+    def _plan_media(
+        self,
+        imdb_id: str,
+        file_search_patterns: List[str],
+        video_language_code: str,
+        video_source: str,
+        video_release_format: str,
+        dubbing_suppliers: List[DubbingSupplier],
+        season_number: Optional[Union[int, Iterable[int], str]] = None,
+        recursive: bool = False,
+        propedit: bool = False,
+        infer_layout: bool = False,
+        preflight: bool = False,
+        on_event: Optional[Callable[[TreatEvent], None]] = None,
+    ) -> List[MuxCommand]:
+        # All mkvmerge commands are planned first, then run in a pool
+        commands: List[MuxCommand] = []
 
         # Getting info from TMDB
-        info = tmdb.Find(imdb_id).info(external_source='imdb_id')
+        info = self._tmdb_client.find(imdb_id)
+        # Dubbing suppliers are indexed once for all files of the job
+        matcher = SupplierMatcher(dubbing_suppliers)
+        # Problems found in preflight, all are reported at once
+        problems: List[str] = []
 
         # If id is a movie
         if info['movie_results']:
@@ -111,32 +784,43 @@ class Medicure:
 
             movie_name = get_movie_name(info)
             movie_directory = self._movies_directory / movie_name
-            self._scan_directory(
+            file_infos = self._scan_directory(
                 movie_directory,
                 file_search_patterns,
                 'movie',
                 rf'({self._media_suffix_pattern})'
                 rf'|({self._subtitle_suffix_pattern})',
+                recursive=recursive,
             )
-            self._reset_tracks_info()
-            for file_info in self._movie_file_infos:
-                self._save_file_tracks_info(file_info)
+            selection = TrackSelection()
+            for file_info, tracks in zip(
+                file_infos, self._probe(file_infos, on_event)
+            ):
+                self._save_file_tracks_info(
+                    file_info, tracks, matcher, selection
+                )
 
             destination_directory = self._get_destination_directory(
                 movie_directory
             )
-            os.system(
-                'mkvmerge -o "{output}" {track_config}'
-                ''.format(
-                    output=destination_directory / f'{movie_name}.mkv',
-                    track_config=self._get_track_config(
-                        'movie',
-                        video_language_code,
-                        video_source,
-                        video_release_format,
-                    ),
-                )
+            command = MuxCommand(
+                destination_directory / f'{movie_name}.mkv',
+                self._get_input_plans(
+                    file_infos,
+                    matcher,
+                    selection,
+                    video_language_code,
+                    video_source,
+                    video_release_format,
+                ),
+                self._get_track_order(dubbing_suppliers, selection),
             )
+            command.kind = self._choose_kind(command, file_infos, propedit)
+            self._add_commands(commands, [command], on_event)
+            if preflight:
+                problems += self._check_preflight(
+                    movie_name, file_infos, matcher, selection
+                )
 
         # If id is a TV show
         elif info['tv_results']:
@@ -147,51 +831,105 @@ class Medicure:
                 season_number is not None
             ), '`season_number` has not been given for a TV show.'
 
-            name, season_name, season = get_tvshow_info(season_number, info)
-            season_directory = self._tvshows_directory / name / season_name
-            self._scan_directory(
-                season_directory,
-                file_search_patterns,
-                'season',
-                rf'({self._media_suffix_pattern})'
-                rf'|({self._subtitle_suffix_pattern})',
-            )
+            seasons = self._get_tvshow_seasons(info, season_number)
+            seasons_file_infos = []
+            for _, name, season_name, _ in seasons:
+                seasons_file_infos.append(
+                    self._scan_directory(
+                        self._tvshows_directory / name / season_name,
+                        file_search_patterns,
+                        'season',
+                        rf'({self._media_suffix_pattern})'
+                        rf'|({self._subtitle_suffix_pattern})',
+                        recursive=recursive,
+                    )
+                )
 
-            destination_directory = self._get_destination_directory(
-                season_directory
+            # Files of all episodes are probed together before planning,
+            # so probing is not interleaved with planning each episode
+            file_selections = self._select_file_tracks(
+                [
+                    file_info
+                    for season_file_infos in seasons_file_infos
+                    for file_infos in season_file_infos.values()
+                    for file_info in file_infos
+                ],
+                matcher,
+                infer_layout,
+                on_event,
             )
 
-            for episode in season['episodes']:
-                self._reset_tracks_info()
-                ename = episode['name']
-                enumber = episode['episode_number']
-
-                # If episode file does not exist
-                if enumber not in self._season_file_infos:
-                    continue
-
-                for file_info in self._season_file_infos[enumber]:
-                    self._save_file_tracks_info(file_info)
-
-                os.system(
-                    'mkvmerge -o "{output}" {track_config}'
-                    ''.format(
-                        output=destination_directory.joinpath(
-                            f'{name} '
-                            f'- S{season_number:02d}E{enumber:02d} '
-                            f'- {ename}.mkv',
-                        ),
-                        track_config=self._get_track_config(
-                            'tvshow',
+            for (
+                season_number,
+                name,
+                season_name,
+                season,
+            ), season_file_infos in zip(seasons, seasons_file_infos):
+                destination_directory = self._get_destination_directory(
+                    self._tvshows_directory / name / season_name
+                )
+                if preflight:
+                    enumbers = {
+                        e['episode_number'] for e in season['episodes']
+                    }
+                    problems += [
+                        f'S{season_number:02d}E{enumber:02d}: Not an episode '
+                        f'of season {season_number} on TMDB.'
+                        for enumber in sorted(season_file_infos)
+                        if enumber not in enumbers
+                    ]
+
+                for episode in season['episodes']:
+                    ename = episode['name']
+                    enumber = episode['episode_number']
+
+                    # If episode file does not exist
+                    if enumber not in season_file_infos:
+                        continue
+
+                    file_infos = season_file_infos[enumber]
+                    selection = self._merge_selections(
+                        [file_selections[f.path] for f in file_infos]
+                    )
+
+                    output = destination_directory.joinpath(
+                        f'{name} - S{season_number:02d}E{enumber:02d} - '
+                        f'{ename}.mkv',
+                    )
+                    command = MuxCommand(
+                        output,
+                        self._get_input_plans(
+                            file_infos,
+                            matcher,
+                            selection,
                             video_language_code,
                             video_source,
                             video_release_format,
-                            enumber,
                         ),
+                        self._get_track_order(dubbing_suppliers, selection),
                     )
+                    command.kind = self._choose_kind(
+                        command, file_infos, propedit
+                    )
+                    self._add_commands(commands, [command], on_event)
+                    if preflight:
+                        problems += self._check_preflight(
+                            f'S{season_number:02d}E{enumber:02d}',
+                            file_infos,
+                            matcher,
+                            selection,
+                        )
+
+        if problems:
+            raise ValueError(
+                'Preflight found {} problem(s):\n{}'.format(
+                    len(problems), '\n'.join(problems)
                 )
+            )
 
-    def treat_subtitle(
+        return commands
+
+    def _plan_subtitle(
         self,
         imdb_id: str,
         file_search_patterns: List[str],
@@ -199,45 +937,10 @@ class Medicure:
         source: Optional[str] = None,
         release_format: Optional[str] = None,
         include_full_information: bool = False,
-        season_number: Optional[int] = None,
-    ) -> None:
-        """
-        Fixes subtitle source, file name and language.
-
-        Parameters
-        ----------
-        imdb_id:
-            IMDb id
-
-        file_search_patterns:
-            List of patterns for finding files
-
-        language_code:
-            3-letter language code for subtitle
-            See https://en.wikipedia.org/wiki/List_of_ISO_639-2_codes
-            for available langauge codes.
-
-        source:
-            Source of the subtitle file: name of author or the website
-            which subtitle is downloaded from. This should be given only
-            when `include_full_information` is `True`.
-
-        release_format:
-            Format of the video that the subtitle is sync with eg:
-            Blu-ray, WEBRip, etc. See
-            https://en.wikipedia.org/wiki/Pirated_movie_release_types
-            for available formats. This should be given only
-            when `include_full_information` is `True`.
-
-        include_full_information:
-            If set to `True` the subtitle will be converted to mks
-            format inorder to save all subtitle information. If set to
-            `True`, `source` and `release_format`
-            should also be given.
-
-        season_number:
-            If `imdb_id` is a TV show season number should be given.
-        """
+        season_number: Optional[Union[int, Iterable[int], str]] = None,
+        recursive: bool = False,
+        on_event: Optional[Callable[[TreatEvent], None]] = None,
+    ) -> List[MuxCommand]:
         if include_full_information:
             assert source is not None and release_format is not None, (
                 'When `include_full_information` is `True`, '
@@ -245,18 +948,19 @@ class Medicure:
             )
 
         # Getting info from TMDB
-        info = tmdb.Find(imdb_id).info(external_source='imdb_id')
-
-        track_config = (
-            '--language 0:{lc} '
-            '--track-name 0:"{tn}" '
-            '--sub-charset 0:WINDOWS-1256 '
-            '--default-track 0 '
-            '--forced-track 0:0 '
-        ).format(
-            lc=language_code,
-            tn=f'{source} {release_format}',
+        info = self._tmdb_client.find(imdb_id)
+
+        track_plan = TrackPlan(
+            0,
+            'subtitle',
+            language_code,
+            f'{source} {release_format}',
+            default=True,
+            forced=False,
+            charset='WINDOWS-1256',
         )
+        # All mkvmerge commands are planned first, then run in a pool
+        commands: List[MuxCommand] = []
 
         # If id is a movie
         if info['movie_results']:
@@ -266,39 +970,29 @@ class Medicure:
 
             movie_name = get_movie_name(info)
             movie_directory = self._movies_directory / movie_name
-            self._scan_directory(
+            file_infos = self._scan_directory(
                 movie_directory,
                 file_search_patterns,
                 'movie',
                 self._subtitle_suffix_pattern,
                 include_full_information,
+                recursive=recursive,
             )
             destination_directory = self._get_destination_directory(
                 movie_directory
             )
             output = destination_directory / f'{movie_name}.{language_code}'
 
-            if include_full_information:
-                os.system(
-                    'mkvmerge -o "{output}" {track_config}"{input}"'
-                    ''.format(
-                        output=f'{output}.mks',
-                        track_config=track_config,
-                        input=self._movie_file_infos[0].path,
-                    )
-                )
-            else:
-                for file_info in self._movie_file_infos:
-                    original_file_path = file_info.path
-                    final_file_path = '{output}{ext}'.format(
-                        output=output,
-                        ext=original_file_path.suffix,
-                    )
-                    shutil.copyfile(original_file_path, final_file_path)
-                    print(
-                        f'The file: {original_file_path} '
-                        f'copied and renamed to: {final_file_path}.',
-                    )
+            self._add_commands(
+                commands,
+                self._get_subtitle_commands(
+                    output,
+                    file_infos,
+                    track_plan,
+                    include_full_information,
+                ),
+                on_event,
+            )
 
         # If id is a TV show
         elif info['tv_results']:
@@ -309,53 +1003,109 @@ class Medicure:
                 season_number is not None
             ), '`season_number` has not been given for a TV show.'
 
-            name, season_name, season = get_tvshow_info(season_number, info)
-            season_directory = self._tvshows_directory / name / season_name
-            self._scan_directory(
-                season_directory,
-                file_search_patterns,
-                'season',
-                self._subtitle_suffix_pattern,
-                include_full_information,
-            )
-            destination_directory = self._get_destination_directory(
-                season_directory
-            )
+            for (
+                season_number,
+                name,
+                season_name,
+                season,
+            ) in self._get_tvshow_seasons(info, season_number):
+                season_directory = self._tvshows_directory / name / season_name
+                season_file_infos = self._scan_directory(
+                    season_directory,
+                    file_search_patterns,
+                    'season',
+                    self._subtitle_suffix_pattern,
+                    include_full_information,
+                    recursive=recursive,
+                )
+                destination_directory = self._get_destination_directory(
+                    season_directory
+                )
 
-            for episode in season['episodes']:
-                ename = episode['name']
-                enumber = episode['episode_number']
+                for episode in season['episodes']:
+                    ename = episode['name']
+                    enumber = episode['episode_number']
 
-                # If episode file exists
-                if enumber not in self._season_file_infos:
-                    continue
+                    # If episode file exists
+                    if enumber not in season_file_infos:
+                        continue
 
-                output = destination_directory.joinpath(
-                    f'{name} - S{season_number:02d}E{enumber:02d} - {ename}'
-                    f'.{language_code}',
-                )
+                    file_infos = season_file_infos[enumber]
+                    output = destination_directory.joinpath(
+                        f'{name} - S{season_number:02d}E{enumber:02d} - '
+                        f'{ename}.{language_code}',
+                    )
 
-                if include_full_information:
-                    os.system(
-                        'mkvmerge -o "{output}" {track_config}"{input}"'
-                        ''.format(
-                            output=f'{output}.mks',
-                            track_config=track_config,
-                            input=self._season_file_infos[enumber][0].path,
-                        )
+                    self._add_commands(
+                        commands,
+                        self._get_subtitle_commands(
+                            output,
+                            file_infos,
+                            track_plan,
+                            include_full_information,
+                        ),
+                        on_event,
                     )
-                else:
-                    for file_info in self._season_file_infos[enumber]:
-                        original_file_path = file_info.path
-                        final_file_path = '{output}{ext}'.format(
-                            output=output,
-                            ext=original_file_path.suffix,
-                        )
-                        shutil.copyfile(original_file_path, final_file_path)
-                        print(
-                            f'The file: {original_file_path} '
-                            f'copied and renamed to : {final_file_path}.',
-                        )
+
+        return commands
+
+    @staticmethod
+    def _add_commands(
+        commands: List[MuxCommand],
+        new_commands: List[MuxCommand],
+        on_event: Optional[Callable[[TreatEvent], None]],
+    ) -> None:
+        for command in new_commands:
+            commands.append(command)
+            if on_event is not None:
+                on_event(TreatEvent('planned', command.output, command))
+
+    def _dump_plan(self, commands: List[MuxCommand]) -> Dict[str, Any]:
+        return {
+            'version': self._plan_version,
+            'commands': [command.to_dict() for command in commands],
+        }
+
+    def _get_tvshow_seasons(
+        self,
+        info: Dict[str, Any],
+        season_number: Union[int, Iterable[int], str],
+    ) -> List[Tuple[int, str, str, Dict[str, Any]]]:
+        if season_number == 'all':
+            tv_id = info['tv_results'][0]['id']
+            season_numbers = [
+                season['season_number']
+                for season in self._tmdb_client.tvshow(tv_id)['seasons']
+            ]
+        elif isinstance(season_number, int):
+            season_numbers = [season_number]
+        else:
+            assert not isinstance(
+                season_number, str
+            ), '`season_number` should be an integer, a list or "all".'
+            # Repeated seasons would be muxed to the same outputs twice
+            season_numbers = list(dict.fromkeys(season_number))
+        assert season_numbers, '`season_number` should not be empty.'
+
+        seasons = [
+            (n, *tvshow_info)
+            for n, tvshow_info in zip(
+                season_numbers,
+                get_tvshow_seasons_info(
+                    season_numbers, self._tmdb_client, info
+                ),
+            )
+        ]
+
+        if season_number == 'all':
+            seasons = [
+                season
+                for season in seasons
+                if (self._tvshows_directory / season[1] / season[2]).is_dir()
+            ]
+            assert seasons, 'No season directory has been found.'
+
+        return seasons
 
     def _scan_directory(
         self,
@@ -364,211 +1114,552 @@ class Medicure:
         directory_type: str,
         file_suffix_pattern: str,
         include_full_information: bool = True,
-    ) -> None:
-        setattr(
-            self,
-            f'_{directory_type}_file_infos',
-            list() if directory_type == 'movie' else defaultdict(list),
-        )
-
-        for file_name in directory.iterdir():
-            if re.search(file_suffix_pattern, file_name.suffix) is None:
-                continue
+        recursive: bool = False,
+    ) -> Union[List[FileInfo], DefaultDict[int, List[FileInfo]]]:
+        all_file_infos: Union[
+            List[FileInfo], DefaultDict[int, List[FileInfo]]
+        ] = (list() if directory_type == 'movie' else defaultdict(list))
+
+        for entry, i in scan_directory(
+            directory,
+            PatternSet(file_search_patterns),
+            re.compile(file_suffix_pattern),
+            recursive,
+        ):
+            path = Path(entry.path)
+            assert (
+                not include_full_information or path.suffix != '.sub'
+            ), 'Files with .sub suffix does not contain any information.'
 
-            file_infos = getattr(self, f'_{directory_type}_file_infos')
+            file_infos = all_file_infos
+            # Episode number is only parsed for matched files
             if directory_type == 'season':
-                file_infos = file_infos[extract_episode_number(file_name)]
+                file_infos = file_infos[extract_episode_number(path)]
+
+            file_infos.append(FileInfo(path=path, id=i, stat=entry.stat()))
+
+        if directory_type == 'movie':
+            all_file_infos.sort(key=lambda file: file.id)
+        # season
+        else:
+            for enumber in all_file_infos:
+                all_file_infos[enumber].sort(key=lambda file: file.id)
+
+        return all_file_infos
+
+    def _select_file_tracks(
+        self,
+        file_infos: List[FileInfo],
+        matcher: SupplierMatcher,
+        infer_layout: bool,
+        on_event: Optional[Callable[[TreatEvent], None]] = None,
+    ) -> Dict[Path, TrackSelection]:
+        if not infer_layout:
+            file_selections = {}
+            for file_info, tracks in zip(
+                file_infos, self._probe(file_infos, on_event)
+            ):
+                selection = TrackSelection()
+                self._save_file_tracks_info(
+                    file_info, tracks, matcher, selection
+                )
+                file_selections[file_info.path] = selection
+            return file_selections
+
+        # Track headers are read cheaply, files with a layout which has
+        # already been seen for the same file id are not probed
+        with ThreadPoolExecutor(max_workers=self._prober.jobs) as executor:
+            all_header_tracks = list(
+                executor.map(
+                    probe_tracks, [file_info.path for file_info in file_infos]
+                )
+            )
+        layout_keys: List[Optional[Tuple[int, Tuple[Any, ...]]]] = []
+        probed_indices, seen_layout_keys = [], set()
+        for i, (file_info, header_tracks) in enumerate(
+            zip(file_infos, all_header_tracks)
+        ):
+            layout_key = None
+            if header_tracks is not None:
+                layout_key = (
+                    file_info.id,
+                    self._get_layout_signature(header_tracks),
+                )
+            layout_keys.append(layout_key)
+            if layout_key is None or layout_key not in seen_layout_keys:
+                seen_layout_keys.add(layout_key)
+                probed_indices.append(i)
+
+        all_tracks = dict(
+            zip(
+                probed_indices,
+                self._probe([file_infos[i] for i in probed_indices], on_event),
+            )
+        )
+        file_selections, layouts = {}, {}
+        for i, (file_info, layout_key) in enumerate(
+            zip(file_infos, layout_keys)
+        ):
+            if i in all_tracks:
+                selection = TrackSelection()
+                self._save_file_tracks_info(
+                    file_info, all_tracks[i], matcher, selection
+                )
+                if layout_key is not None:
+                    layouts[layout_key] = selection
+            else:
+                file_info.tracks = self._filter_tracks(all_header_tracks[i])
+                selection = layouts[layout_key]
+            file_selections[file_info.path] = selection
 
-            for i, pattern in enumerate(file_search_patterns):
-                if re.search(pattern, str(file_name)) is None:
-                    continue
+        return file_selections
 
-                assert (
-                    not include_full_information or file_name.suffix != '.sub'
-                ), 'Files with .sub suffix does not contain any information.'
+    def _check_preflight(
+        self,
+        label: str,
+        file_infos: List[FileInfo],
+        matcher: SupplierMatcher,
+        selection: TrackSelection,
+    ) -> List[str]:
+        problems = []
+        file_counts = Counter(file_info.id for file_info in file_infos)
+        for file_id, count in sorted(file_counts.items()):
+            if count > 1:
+                problems.append(
+                    f'{label}: {count} files match file search pattern '
+                    f'{file_id}.'
+                )
+        if selection.video_track_id is None:
+            problems.append(f'{label}: No video track has been found.')
 
-                file_infos.append(
-                    FileInfo(
-                        path=directory / file_name,
-                        id=i,
+        match_counts: Counter = Counter()
+        for file_info in file_infos:
+            for track in file_info.tracks or []:
+                kind = self._mediainfo_track_kinds.get(track.track_type)
+                if kind is not None:
+                    match_counts.update(
+                        (i, kind)
+                        for i in matcher.match_all(file_info.id, kind, track)
+                    )
+        for i, ds in enumerate(matcher.dubbing_suppliers):
+            # Each kind a language or a pattern is given for should be
+            # found, otherwise a track of any kind
+            declared_kinds = [
+                kind
+                for kind, language_code, search_pattern in (
+                    (
+                        TrackKind.AUDIO,
+                        ds.audio_language_code,
+                        ds.audio_search_pattern,
+                    ),
+                    (
+                        TrackKind.SUBTITLE,
+                        ds.subtitle_language_code,
+                        ds.subtitle_search_pattern,
                     ),
                 )
-                break
+                if language_code is not None or search_pattern is not None
+            ]
+            if not declared_kinds:
+                if all(i not in ids for ids in selection.track_ids):
+                    problems.append(
+                        f'{label}: Dubbing supplier {ds.name} matches no '
+                        'track.'
+                    )
+            for kind in declared_kinds:
+                if i not in selection.track_ids[kind]:
+                    problems.append(
+                        f'{label}: Dubbing supplier {ds.name} matches no '
+                        f'{self._track_types[kind]} track.'
+                    )
+            for kind in self._track_kinds:
+                count = match_counts[i, kind]
+                if count > 1:
+                    problems.append(
+                        f'{label}: Dubbing supplier {ds.name} matches '
+                        f'{count} {self._track_types[kind]} tracks.'
+                    )
 
-        if directory_type == 'movie':
-            self._movie_file_infos.sort(key=lambda file: file.id)
-        # season
-        else:
-            for enumber in self._season_file_infos:
-                self._season_file_infos[enumber].sort(key=lambda file: file.id)
+        return problems
+
+    @staticmethod
+    def _get_layout_signature(tracks: List[TrackInfo]) -> Tuple[Any, ...]:
+        # Titles are a part of layouts since dubbing suppliers' search
+        # patterns match them
+        return tuple(
+            (track.track_type, track.track_id, track.language, track.title)
+            for track in Medicure._filter_tracks(tracks)
+        )
+
+    @staticmethod
+    def _merge_selections(selections: List[TrackSelection]) -> TrackSelection:
+        merged_selection = TrackSelection()
+        for selection in selections:
+            if selection.video_track_id is not None:
+                merged_selection.video_track_id = selection.video_track_id
+            for merged_track_ids, track_ids in zip(
+                merged_selection.track_ids, selection.track_ids
+            ):
+                # Tracks of earlier files are selected first
+                for i, track_id in track_ids.items():
+                    merged_track_ids.setdefault(i, track_id)
+
+        return merged_selection
 
-    def _save_file_tracks_info(self, file_info: FileInfo) -> None:
-        media_info = MediaInfo.parse(file_info.path)
-        for track in media_info.tracks:
+    @staticmethod
+    def _filter_tracks(tracks: List[TrackInfo]) -> List[TrackInfo]:
+        return [
+            track
+            for track in tracks
+            if track.track_type in ('Video', 'Audio', 'Text')
+            and track.track_id is not None
+        ]
+
+    def _save_file_tracks_info(
+        self,
+        file_info: FileInfo,
+        tracks: List[TrackInfo],
+        matcher: SupplierMatcher,
+        selection: TrackSelection,
+    ) -> None:
+        file_info.tracks = self._filter_tracks(tracks)
+        for track in tracks:
             if file_info.id == 0 and track.track_type == 'Video':
-                self._video_track_id = track.track_id - 1
+                selection.video_track_id = track.track_id - 1
                 continue
 
-            track_type_to_mediainfo_track_type = {
-                'audio': 'Audio',
-                'subtitle': 'Text',
-            }
-            for tt, mitt in track_type_to_mediainfo_track_type.items():
-                if track.track_type == mitt:
-                    for ds in self._dubbing_suppliers:
-                        if (
-                            not getattr(ds, f'_has_{tt}')
-                            and file_info.id == ds.file_id
-                            and self._track_title_match(
-                                track, getattr(ds, f'{tt}_search_pattern')
-                            )
-                            and self._track_language_match(
-                                track, getattr(ds, f'{tt}_language_code')
-                            )
-                        ):
-                            setattr(
-                                ds,
-                                f'_{tt}_track_id',
-                                (track.track_id or 1) - 1,
-                            )
-                            break
-                    break
+            kind = self._mediainfo_track_kinds.get(track.track_type)
+            if kind is None:
+                continue
 
-    def _reset_tracks_info(self) -> None:
-        for ds in self._dubbing_suppliers:
-            ds._audio_track_id = None
-            ds._subtitle_track_id = None
+            track_ids = selection.track_ids[kind]
+            i = matcher.match(file_info.id, kind, track, track_ids)
+            if i is not None:
+                track_ids[i] = (track.track_id or 1) - 1
 
-    def _get_track_config(
+    def _probe(
         self,
-        id_type: str,
+        file_infos: List[FileInfo],
+        on_event: Optional[Callable[[TreatEvent], None]] = None,
+    ) -> List[List[TrackInfo]]:
+        tracks: List[Optional[List[TrackInfo]]] = [None] * len(file_infos)
+        if self._probe_cache is not None:
+            tracks = self._probe_cache.get_many(
+                [file_info.path for file_info in file_infos],
+                [file_info.stat for file_info in file_infos],
+                self._prober.name,
+            )
+
+        if on_event is not None:
+            for file_info, file_tracks in zip(file_infos, tracks):
+                if file_tracks is not None:
+                    on_event(TreatEvent('probed', file_info.path, cached=True))
+
+        def on_probe(path: Path, file_tracks: List[TrackInfo]) -> None:
+            if on_event is not None:
+                on_event(TreatEvent('probed', path))
+
+        # Files which are not cached are probed together
+        indices = [i for i, t in enumerate(tracks) if t is None]
+        probed_tracks = self._prober.probe_many(
+            [file_infos[i].path for i in indices], on_probe
+        )
+        for i, file_tracks in zip(indices, probed_tracks):
+            tracks[i] = file_tracks
+        if self._probe_cache is not None and indices:
+            self._probe_cache.set_many(
+                [file_infos[i].path for i in indices],
+                probed_tracks,
+                [file_infos[i].stat for i in indices],
+                self._prober.name,
+            )
+
+        return tracks
+
+    @staticmethod
+    def _get_input_plans(
+        file_infos: List[FileInfo],
+        matcher: SupplierMatcher,
+        selection: TrackSelection,
         video_language_code: str,
         video_source: str,
         video_release_format: str,
-        episode_number: int = None,
-    ) -> str:
-        track_config = '--track-order {track_order} '.format(
-            track_order=self._get_track_order(),
-        )
-        file_infos = []
-        if id_type == 'movie':
-            file_infos = self._movie_file_infos
-        elif id_type == 'tvshow':
-            file_infos = self._season_file_infos[episode_number]
-
+    ) -> List[InputPlan]:
+        input_plans = []
         for file_info in file_infos:
-            file_tracks_ids = {
-                'audio': [],
-                'subtitle': [],
-            }
-
+            input_plan = InputPlan(file_info.path, file_info.id)
             if file_info.id == 0:
-                track_config += '--language {tid}:{lc} '.format(
-                    tid=self._video_track_id,
-                    lc=video_language_code,
-                )
-                track_config += '--default-track {tid} '.format(
-                    tid=self._video_track_id,
-                )
-                track_config += '--forced-track {tid}:0 '.format(
-                    tid=self._video_track_id
-                )
-                track_config += '--track-name {tid}:"{tn}" '.format(
-                    tid=self._video_track_id,
-                    tn=f'{video_source} {video_release_format}',
+                input_plan.tracks.append(
+                    TrackPlan(
+                        selection.video_track_id,
+                        'video',
+                        video_language_code,
+                        f'{video_source} {video_release_format}',
+                        default=True,
+                        forced=False,
+                    )
                 )
 
-            for ds in self._dubbing_suppliers:
-                if ds.file_id == file_info.id:
-                    for tt in ['audio', 'subtitle']:
-                        if getattr(ds, f'_has_{tt}'):
-                            track_config += self._make_language_code(ds, tt)
-                            track_config += self._make_default_or_forced(
-                                ds, tt, 'default-track'
-                            )
-                            track_config += self._make_default_or_forced(
-                                ds, tt, 'forced-track'
-                            )
-                            track_config += self._make_name(ds, tt)
-                            file_tracks_ids[tt].append(
-                                getattr(ds, f'_{tt}_track_id'),
+            dubbing_suppliers = matcher.dubbing_suppliers
+            for i in matcher.get_file_suppliers(file_info.id):
+                ds = dubbing_suppliers[i]
+                for kind, track_ids in zip(
+                    Medicure._track_kinds, selection.track_ids
+                ):
+                    if i in track_ids:
+                        input_plan.tracks.append(
+                            Medicure._make_track(
+                                ds,
+                                kind,
+                                track_ids[i],
+                                dubbing_suppliers[0].name == ds.name,
                             )
+                        )
 
-            for i, tt in enumerate(['audio', 'subtitle']):
-                if len(file_tracks_ids[tt]) > 0:
-                    track_config += '--{tt}-tracks {ts} '.format(
-                        tt=tt,
-                        ts=','.join([str(tid) for tid in file_tracks_ids[tt]]),
-                    )
-                else:
-                    track_config += f'--no-{tt}{"s" * i} '
+            input_plans.append(input_plan)
 
-            track_config += f'"{file_info.path}" '
+        return input_plans
 
-        return track_config
+    @staticmethod
+    def _get_subtitle_commands(
+        output: Path,
+        file_infos: List[FileInfo],
+        track_plan: TrackPlan,
+        include_full_information: bool,
+    ) -> List[MuxCommand]:
+        if include_full_information:
+            return [
+                MuxCommand(
+                    Path(f'{output}.mks'),
+                    [
+                        InputPlan(
+                            file_infos[0].path,
+                            file_infos[0].id,
+                            [track_plan],
+                            select_tracks=False,
+                        )
+                    ],
+                )
+            ]
 
-    def _get_track_order(self) -> str:
-        track_order = f'0:{self._video_track_id}'
+        return [
+            MuxCommand(
+                Path(f'{output}{file_info.path.suffix}'),
+                [InputPlan(file_info.path, file_info.id, select_tracks=False)],
+                kind='copy',
+            )
+            for file_info in file_infos
+        ]
 
-        for tt in ['audio', 'subtitle']:
-            for ds in self._dubbing_suppliers:
-                if getattr(ds, f'_has_{tt}'):
-                    track_order += self._make_order(ds, tt)
+    @staticmethod
+    def _choose_kind(
+        command: MuxCommand, file_infos: List[FileInfo], propedit: bool
+    ) -> str:
+        if Medicure._can_link(command, file_infos):
+            return 'link'
+        if propedit and Medicure._can_propedit(command, file_infos):
+            return 'propedit'
+        return 'mux'
 
-        return track_order
+    @staticmethod
+    def _can_link(command: MuxCommand, file_infos: List[FileInfo]) -> bool:
+        # Nothing but the file name differs, if the only input could be
+        # edited in place and its tracks already have the planned
+        # languages, names and flags
+        if not Medicure._can_propedit(command, file_infos):
+            return False
+
+        tracks = {track.track_id - 1: track for track in file_infos[0].tracks}
+        for track_plan in command.inputs[0].tracks:
+            track = tracks[track_plan.id]
+            if (
+                (track.title or '') != track_plan.name
+                or not Medicure._track_language_match(
+                    track, track_plan.language
+                )
+                or track.default != ('Yes' if track_plan.default else 'No')
+                or track.forced != ('Yes' if track_plan.forced else 'No')
+            ):
+                return False
+
+        return True
 
     @staticmethod
-    def _make_order(ds: DubbingSupplier, sa: str) -> str:
-        return ',{fid}:{tid}'.format(
-            fid=ds.file_id,
-            tid=getattr(ds, f'_{sa}_track_id'),
-        )
+    def _can_propedit(command: MuxCommand, file_infos: List[FileInfo]) -> bool:
+        # Only header fields of a single Matroska file can be edited in
+        # place, no track may be reordered or removed
+        if len(file_infos) != 1 or file_infos[0].id != 0:
+            return False
 
-    def _make_name(self, ds: DubbingSupplier, sa: str) -> str:
-        return '--track-name {tid}:"{tn}" '.format(
-            tid=getattr(ds, f'_{sa}_track_id'),
-            tn=ds.name if self._dubbing_suppliers[0].name != ds.name else '',
+        file_info = file_infos[0]
+        return (
+            file_info.path.suffix.lower() == '.mkv'
+            and file_info.tracks is not None
+            and command.track_order.split(',')
+            == [f'0:{track.track_id - 1}' for track in file_info.tracks]
         )
 
-    def _make_default_or_forced(
-        self,
-        ds: DubbingSupplier,
-        sa: str,
-        df: str,
+    @staticmethod
+    def _get_track_order(
+        dubbing_suppliers: List[DubbingSupplier], selection: TrackSelection
     ) -> str:
-        flag = 0
-        if df == 'default-track' and sa == 'audio':
-            if self._dubbing_suppliers[0].name == ds.name:
-                flag = 1
-        return '--{df} {tid}:{flag} '.format(
-            df=df, tid=getattr(ds, f'_{sa}_track_id'), flag=flag
-        )
+        track_order = f'0:{selection.video_track_id}'
 
-    @staticmethod
-    def _get_destination_directory(directory: Path) -> Path:
-        destination_directory = Path(f'{directory} Edited')
-        if not destination_directory.exists():
-            destination_directory.mkdir()
+        for track_ids in selection.track_ids:
+            # In order of dubbing suppliers
+            for i in sorted(track_ids):
+                track_order += Medicure._make_order(
+                    dubbing_suppliers[i], track_ids[i]
+                )
+
+        return track_order
 
-        return destination_directory
+    @staticmethod
+    def _make_order(ds: DubbingSupplier, track_id: int) -> str:
+        return ',{fid}:{tid}'.format(fid=ds.file_id, tid=track_id)
 
     @staticmethod
-    def _make_language_code(ds: DubbingSupplier, sa: str) -> str:
-        return '--language {tid}:{lc} '.format(
-            tid=getattr(ds, f'_{sa}_track_id'), lc=ds.correct_language_code
+    def _make_track(
+        ds: DubbingSupplier, kind: TrackKind, track_id: int, is_original: bool
+    ) -> TrackPlan:
+        return TrackPlan(
+            track_id,
+            Medicure._track_types[kind],
+            ds.correct_language_code,
+            '' if is_original else ds.name,
+            default=kind == TrackKind.AUDIO and is_original,
+            forced=False,
+        )
+
+    def _run_commands(
+        self,
+        commands: List[MuxCommand],
+        jobs: int,
+        incremental: bool = False,
+        force: bool = False,
+    ) -> List[MuxResult]:
+        indices = {id(command): i for i, command in enumerate(commands)}
+        indexed_results, skipped_count = [], 0
+        for event in self._iter_run_commands(
+            commands, jobs, incremental, force
+        ):
+            if event.kind == 'skipped':
+                skipped_count += 1
+            elif event.kind == 'finished':
+                indexed_results.append(
+                    (indices[id(event.command)], event.result)
+                )
+        # Results are in order of commands, not in order of finishing
+        mux_results = [r for _, r in sorted(indexed_results)]
+        report_mux_results(mux_results, skipped_count if incremental else None)
+        return mux_results
+
+    def _iter_treat(
+        self,
+        plan: Callable[..., List[MuxCommand]],
+        jobs: int,
+        incremental: bool,
+        force: bool,
+    ) -> Iterator[TreatEvent]:
+        # Planning is run in another thread, so events of probing and
+        # planning are yielded as they happen
+        events: 'queue.Queue[Union[TreatEvent, Future]]' = queue.Queue()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(plan, on_event=events.put)
+            future.add_done_callback(events.put)
+            event = events.get()
+            while event is not future:
+                yield event
+                event = events.get()
+
+        yield from self._iter_run_commands(
+            future.result(), jobs, incremental, force, True
         )
 
+    def _iter_run_commands(
+        self,
+        commands: List[MuxCommand],
+        jobs: int,
+        incremental: bool = False,
+        force: bool = False,
+        streaming: bool = False,
+    ) -> Iterator[TreatEvent]:
+        if incremental:
+            (
+                commands,
+                skipped_commands,
+            ) = self._manifests.split_up_to_date_commands(commands, force)
+            for command in skipped_commands:
+                yield TreatEvent('skipped', command.output, command)
+
+        # Workers put events of their commands in the queue, and then
+        # their futures when the commands have been run
+        events: 'queue.Queue[Union[TreatEvent, Future]]' = queue.Queue()
+
+        def put_progress(command: MuxCommand, progress: int) -> None:
+            events.put(
+                TreatEvent(
+                    'progress', command.output, command, progress=progress
+                )
+            )
+
+        def run(command: MuxCommand) -> MuxResult:
+            events.put(TreatEvent('started', command.output, command))
+            return mux(
+                command, partial(put_progress, command) if streaming else None
+            )
+
+        mux_results = []
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures: Dict[Future, MuxCommand] = {}
+            for command in commands:
+                future = executor.submit(run, command)
+                futures[future] = command
+                future.add_done_callback(events.put)
+
+            try:
+                remaining = len(futures)
+                while remaining:
+                    event = events.get()
+                    if isinstance(event, TreatEvent):
+                        yield event
+                        continue
+
+                    remaining -= 1
+                    command = futures[event]
+                    mux_result = event.result()
+                    if incremental:
+                        self._manifests.save_fingerprints(
+                            [command], [mux_result]
+                        )
+                    mux_results.append(mux_result)
+                    size = None
+                    if mux_result.succeeded and command.output.exists():
+                        size = command.output.stat().st_size
+                    yield TreatEvent(
+                        'finished',
+                        command.output,
+                        command,
+                        result=mux_result,
+                        size=size,
+                    )
+            finally:
+                # E.g. the generator has been closed, so commands which
+                # have not been started are not run
+                for future in futures:
+                    future.cancel()
+
+        if streaming:
+            check_mux_results(mux_results)
+
     @staticmethod
-    def _track_title_match(track: Track, pattern: str) -> bool:
-        title = track.title
-        if pattern is None and title is None:
-            return True
-        if pattern is None or title is None:
-            return False
-        return re.search(pattern, title) is not None
+    def _get_destination_directory(directory: Path) -> Path:
+        # It is created when the first command is applied, so planning
+        # does not touch the file system
+        return Path(f'{directory} Edited')
 
     @staticmethod
-    def _track_language_match(track: Track, language_code: str) -> bool:
+    def _track_language_match(track: TrackInfo, language_code: str) -> bool:
         language = track.language
         if language_code is None and language is None:
             return True
@@ -1,7 +1,26 @@
-from dataclasses import MISSING, dataclass, fields
+import os
+import sys
+from dataclasses import MISSING, asdict, dataclass
+from dataclasses import field as dataclass_field
+from dataclasses import fields
+from enum import IntEnum
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+# Plan data structures are made for every file, track and episode, so
+# they have slots where dataclasses support them
+_slots = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+class TrackKind(IntEnum):
+    """
+    Kinds of tracks which dubbing suppliers select, they index
+    per-kind sequences e.g. `TrackSelection.track_ids`.
+    """
+
+    AUDIO = 0
+    SUBTITLE = 1
+
 
 @dataclass
 class DubbingSupplier:
@@ -48,14 +67,6 @@ class DubbingSupplier:
     audio_search_pattern: Optional[str] = None
     subtitle_search_pattern: Optional[str] = None
 
-    _audio_track_id: int = None
-    _subtitle_track_id: int = None
-
-    def __getattr__(self, item: str) -> Any:
-        if item in ('_has_audio', '_has_subtitle'):
-            tt = item.split('_')[-1]
-            return self.__getattribute__(f'_{tt}_track_id') is not None
-
     def to_list(self) -> List[Any]:
         """
         Converts dubbing supplier to a minimal list so can be easily in
@@ -101,7 +112,7 @@ class DubbingSupplier:
         return ds_dict
 
 
-@dataclass
+@dataclass(**_slots)
 class FileInfo:
     """
     Represents a file info data structure.
@@ -112,7 +123,480 @@ class FileInfo:
         The file path
     id:
         The file id
+
+    stat:
+        The file stat result recorded while scanning, if any
+
+    tracks:
+        Probed video, audio and subtitle tracks of the file in order
+    """
+
+    path: Path
+    id: int
+    stat: Optional[os.stat_result] = None
+    tracks: Optional[List['TrackInfo']] = None
+
+
+@dataclass(**_slots)
+class TrackSelection:
+    """
+    Represents tracks of an output's inputs which have been selected,
+    it is made for each movie or episode so dubbing suppliers are never
+    mutated.
+
+    Attributes
+    ----------
+    video_track_id:
+        The video track id of the file with id 0, starting from 0
+
+    track_ids:
+        Selected audio and subtitle track ids, starting from 0, indexed
+        by `TrackKind` and keyed by index of their dubbing supplier
+    """
+
+    video_track_id: Optional[int] = None
+    track_ids: List[Dict[int, int]] = dataclass_field(
+        default_factory=lambda: [{}, {}]
+    )
+
+
+@dataclass(**_slots)
+class TrackInfo:
+    """
+    Represents the probed info of a track which Medicure needs.
+
+    Attributes
+    ----------
+    track_type:
+        MediaInfo's track type eg: General, Video, Audio, Text, etc.
+
+    track_id:
+        MediaInfo's track id
+
+    title:
+        The track title
+
+    language:
+        The track language
+
+    other_language:
+        Other representations of the track language eg: English name
+        and ISO 639 codes
+
+    default:
+        MediaInfo's default flag of the track, either `'Yes'` or `'No'`
+
+    forced:
+        MediaInfo's forced flag of the track, either `'Yes'` or `'No'`
+    """
+
+    track_type: str
+    track_id: Optional[int] = None
+    title: Optional[str] = None
+    language: Optional[str] = None
+    other_language: Optional[List[str]] = None
+    default: Optional[str] = None
+    forced: Optional[str] = None
+
+
+@dataclass
+class BatchResult:
+    """
+    Represents result of treating an entry of a batch.
+
+    Attributes
+    ----------
+    index:
+        Index of the entry in the batch
+
+    kind:
+        Kind of the entry, either `'media'` or `'subtitle'`
+
+    imdb_id:
+        IMDb id of the entry
+
+    outputs:
+        Paths of the files created by mkvmerge
+
+    skipped:
+        Paths of the up-to-date files skipped in incremental mode
+
+    error:
+        The error message if treating the entry failed
+    """
+
+    index: int
+    kind: Optional[str]
+    imdb_id: Optional[str]
+    outputs: List[Path] = dataclass_field(default_factory=list)
+    skipped: List[Path] = dataclass_field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def succeeded(self) -> bool:
+        """
+        Whether treating the entry succeeded
+        """
+        return self.error is None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Converts batch result to a JSON serializable dictionary.
+
+        Returns
+        -------
+        Dictionary batch result
+        """
+        return {
+            'index': self.index,
+            'kind': self.kind,
+            'imdb_id': self.imdb_id,
+            'succeeded': self.succeeded,
+            'outputs': [str(output) for output in self.outputs],
+            'skipped': [str(output) for output in self.skipped],
+            'error': self.error,
+        }
+
+
+@dataclass(**_slots)
+class TrackPlan:
+    """
+    Represents planned properties of a track.
+
+    Attributes
+    ----------
+    id:
+        The track id in its file
+
+    type:
+        The track type, either `'video'`, `'audio'` or `'subtitle'`
+
+    language:
+        3-letter language code of the track
+
+    name:
+        The track name
+
+    default:
+        Whether the track is a default track
+
+    forced:
+        Whether the track is a forced track
+
+    charset:
+        Character set of a text subtitle track
+    """
+
+    id: int
+    type: str
+    language: str
+    name: str
+    default: bool
+    forced: bool
+    charset: Optional[str] = None
+
+    def to_arguments(self) -> List[str]:
+        """
+        Converts track plan to mkvmerge arguments.
+
+        Returns
+        -------
+        List of mkvmerge arguments
+        """
+        arguments = [
+            '--language',
+            f'{self.id}:{self.language}',
+            '--default-track',
+            f'{self.id}:{int(self.default)}',
+            '--forced-track',
+            f'{self.id}:{int(self.forced)}',
+            '--track-name',
+            f'{self.id}:{self.name}',
+        ]
+        if self.charset is not None:
+            arguments += ['--sub-charset', f'{self.id}:{self.charset}']
+        return arguments
+
+    def to_propedit_arguments(self) -> List[str]:
+        """
+        Converts track plan to mkvpropedit arguments, which edit the
+        track in place. Track ids should be in order of tracks in the
+        file.
+
+        Returns
+        -------
+        List of mkvpropedit arguments
+        """
+        arguments = [
+            '--edit',
+            f'track:{self.id + 1}',
+            '--set',
+            f'language={self.language}',
+            '--set',
+            f'flag-default={int(self.default)}',
+            '--set',
+            f'flag-forced={int(self.forced)}',
+        ]
+        if self.name:
+            arguments += ['--set', f'name={self.name}']
+        else:
+            arguments += ['--delete', 'name']
+        return arguments
+
+
+@dataclass(**_slots)
+class InputPlan:
+    """
+    Represents a planned input file.
+
+    Attributes
+    ----------
+    path:
+        The file path
+
+    id:
+        The file id
+
+    tracks:
+        Planned tracks of the file
+
+    select_tracks:
+        Whether audio and subtitle tracks which are not planned should
+        be dropped
     """
 
     path: Path
     id: int
+    tracks: List[TrackPlan] = dataclass_field(default_factory=list)
+    select_tracks: bool = True
+
+    def to_arguments(self) -> List[str]:
+        """
+        Converts input plan to mkvmerge arguments.
+
+        Returns
+        -------
+        List of mkvmerge arguments
+        """
+        arguments = []
+        for track in self.tracks:
+            arguments += track.to_arguments()
+
+        if self.select_tracks:
+            for i, tt in enumerate(['audio', 'subtitle']):
+                track_ids = [str(t.id) for t in self.tracks if t.type == tt]
+                if track_ids:
+                    arguments += [f'--{tt}-tracks', ','.join(track_ids)]
+                else:
+                    arguments.append(f'--no-{tt}{"s" * i}')
+
+        arguments.append(str(self.path))
+        return arguments
+
+
+@dataclass(**_slots)
+class MuxCommand:
+    """
+    Represents a planned command, which is either muxing the inputs
+    with mkvmerge or copying the only input.
+
+    Attributes
+    ----------
+    output:
+        The output file path
+
+    inputs:
+        The planned input files
+
+    track_order:
+        Order of tracks in the output, a comma separated list of
+        `file_id:track_id`s
+
+    kind:
+        Kind of the command, either `'mux'`, `'copy'`, `'propedit'`
+        which means the only input is cloned and its tracks are edited
+        in place with mkvpropedit or `'link'` which means the only input
+        already has the planned tracks and is linked to the output
+
+    fingerprint:
+        Fingerprint of the inputs and the arguments, which is used to
+        detect up-to-date outputs
+    """
+
+    output: Path
+    inputs: List[InputPlan]
+    track_order: Optional[str] = None
+    kind: str = 'mux'
+    fingerprint: Optional[str] = None
+
+    @property
+    def arguments(self) -> List[str]:
+        """
+        The mkvmerge arguments
+        """
+        if self.kind == 'copy':
+            return []
+
+        arguments = ['--output', str(self.output)]
+        if self.track_order is not None:
+            arguments += ['--track-order', self.track_order]
+        for input_plan in self.inputs:
+            arguments += input_plan.to_arguments()
+        return arguments
+
+    @property
+    def propedit_arguments(self) -> List[str]:
+        """
+        The mkvpropedit arguments for editing the output
+        """
+        arguments = [str(self.output)]
+        for track in self.inputs[0].tracks:
+            arguments += track.to_propedit_arguments()
+        return arguments
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Converts command to a JSON serializable dictionary.
+
+        Returns
+        -------
+        Dictionary command
+        """
+        return {
+            'kind': self.kind,
+            'output': str(self.output),
+            'track_order': self.track_order,
+            'inputs': [
+                {
+                    'path': str(input_plan.path),
+                    'id': input_plan.id,
+                    'select_tracks': input_plan.select_tracks,
+                    'tracks': [asdict(track) for track in input_plan.tracks],
+                }
+                for input_plan in self.inputs
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, command: Dict[str, Any]) -> 'MuxCommand':
+        """
+        Creates a command from a dictionary.
+
+        Parameters
+        ----------
+        command:
+            Dictionary command
+
+        Returns
+        -------
+        The command
+        """
+        return cls(
+            Path(command['output']),
+            [
+                InputPlan(
+                    Path(input_plan['path']),
+                    input_plan['id'],
+                    [TrackPlan(**track) for track in input_plan['tracks']],
+                    input_plan['select_tracks'],
+                )
+                for input_plan in command['inputs']
+            ],
+            command['track_order'],
+            command['kind'],
+        )
+
+
+@dataclass
+class MuxResult:
+    """
+    Represents result of running a command.
+
+    Attributes
+    ----------
+    output:
+        The output file path
+
+    exit_code:
+        Exit code of mkvmerge or mkvpropedit, 1 means there were
+        warnings and 2 means there were errors. It is 0 for a copied
+        file.
+
+    stderr:
+        Standard error of mkvmerge or mkvpropedit
+
+    wall_time:
+        Number of seconds the command took to run
+
+    kind:
+        Kind of the command which has been run, a `'propedit'` command
+        is run as `'mux'` if mkvpropedit fails and a `'link'` command
+        is run as `'copy'` if the input can not be linked
+
+    saved_bytes:
+        Number of bytes which have not been written since the output
+        has been linked to the input
+    """
+
+    output: Path
+    exit_code: int
+    stderr: str = ''
+    wall_time: float = 0
+    kind: str = 'mux'
+    saved_bytes: int = 0
+
+    @property
+    def succeeded(self) -> bool:
+        """
+        Whether mkvmerge succeeded, possibly with warnings
+        """
+        return self.exit_code in (0, 1)
+
+
+@dataclass
+class TreatEvent:
+    """
+    Represents an event of a treatment, which is yielded as soon as it
+    happens.
+
+    Attributes
+    ----------
+    kind:
+        Kind of the event, either `'probed'` when tracks of an input
+        file have been probed or found in the probe cache, `'planned'`
+        when a command has been planned, `'skipped'` when an up-to-date
+        output has been skipped in incremental mode, `'started'` when
+        running a command has been started, `'progress'` when mkvmerge
+        has reported progress of a command or `'finished'` when a
+        command has been run
+
+    path:
+        The input file path of a `'probed'` event, otherwise the output
+        file path
+
+    command:
+        The command, it is `None` for a `'probed'` event.
+
+    progress:
+        Percentage of the command which has been done, only for a
+        `'progress'` event
+
+    result:
+        Result of the command, only for a `'finished'` event
+
+    size:
+        Size of the output file in bytes, only for a `'finished'` event
+        whose command succeeded
+
+    cached:
+        Whether tracks of a `'probed'` event have been found in the
+        probe cache
+    """
+
+    kind: str
+    path: Path
+    command: Optional[MuxCommand] = None
+    progress: Optional[int] = None
+    result: Optional[MuxResult] = None
+    size: Optional[int] = None
+    cached: bool = False
@@ -0,0 +1,271 @@
+from typing import Dict, List, Optional, Tuple
+
+# ISO 639-1 code, ISO 639-2/B code, ISO 639-2/T code and English name of
+# languages which have an ISO 639-1 code
+_languages = [
+    ('aa', 'aar', 'aar', 'Afar'),
+    ('ab', 'abk', 'abk', 'Abkhazian'),
+    ('ae', 'ave', 'ave', 'Avestan'),
+    ('af', 'afr', 'afr', 'Afrikaans'),
+    ('ak', 'aka', 'aka', 'Akan'),
+    ('am', 'amh', 'amh', 'Amharic'),
+    ('an', 'arg', 'arg', 'Aragonese'),
+    ('ar', 'ara', 'ara', 'Arabic'),
+    ('as', 'asm', 'asm', 'Assamese'),
+    ('av', 'ava', 'ava', 'Avaric'),
+    ('ay', 'aym', 'aym', 'Aymara'),
+    ('az', 'aze', 'aze', 'Azerbaijani'),
+    ('ba', 'bak', 'bak', 'Bashkir'),
+    ('be', 'bel', 'bel', 'Belarusian'),
+    ('bg', 'bul', 'bul', 'Bulgarian'),
+    ('bh', 'bih', 'bih', 'Bihari'),
+    ('bi', 'bis', 'bis', 'Bislama'),
+    ('bm', 'bam', 'bam', 'Bambara'),
+    ('bn', 'ben', 'ben', 'Bengali'),
+    ('bo', 'tib', 'bod', 'Tibetan'),
+    ('br', 'bre', 'bre', 'Breton'),
+    ('bs', 'bos', 'bos', 'Bosnian'),
+    ('ca', 'cat', 'cat', 'Catalan'),
+    ('ce', 'che', 'che', 'Chechen'),
+    ('ch', 'cha', 'cha', 'Chamorro'),
+    ('co', 'cos', 'cos', 'Corsican'),
+    ('cr', 'cre', 'cre', 'Cree'),
+    ('cs', 'cze', 'ces', 'Czech'),
+    ('cu', 'chu', 'chu', 'Church Slavic'),
+    ('cv', 'chv', 'chv', 'Chuvash'),
+    ('cy', 'wel', 'cym', 'Welsh'),
+    ('da', 'dan', 'dan', 'Danish'),
+    ('de', 'ger', 'deu', 'German'),
+    ('dv', 'div', 'div', 'Divehi'),
+    ('dz', 'dzo', 'dzo', 'Dzongkha'),
+    ('ee', 'ewe', 'ewe', 'Ewe'),
+    ('el', 'gre', 'ell', 'Greek'),
+    ('en', 'eng', 'eng', 'English'),
+    ('eo', 'epo', 'epo', 'Esperanto'),
+    ('es', 'spa', 'spa', 'Spanish'),
+    ('et', 'est', 'est', 'Estonian'),
+    ('eu', 'baq', 'eus', 'Basque'),
+    ('fa', 'per', 'fas', 'Persian'),
+    ('ff', 'ful', 'ful', 'Fulah'),
+    ('fi', 'fin', 'fin', 'Finnish'),
+    ('fj', 'fij', 'fij', 'Fijian'),
+    ('fo', 'fao', 'fao', 'Faroese'),
+    ('fr', 'fre', 'fra', 'French'),
+    ('fy', 'fry', 'fry', 'Western Frisian'),
+    ('ga', 'gle', 'gle', 'Irish'),
+    ('gd', 'gla', 'gla', 'Gaelic'),
+    ('gl', 'glg', 'glg', 'Galician'),
+    ('gn', 'grn', 'grn', 'Guarani'),
+    ('gu', 'guj', 'guj', 'Gujarati'),
+    ('gv', 'glv', 'glv', 'Manx'),
+    ('ha', 'hau', 'hau', 'Hausa'),
+    ('he', 'heb', 'heb', 'Hebrew'),
+    ('hi', 'hin', 'hin', 'Hindi'),
+    ('ho', 'hmo', 'hmo', 'Hiri Motu'),
+    ('hr', 'hrv', 'hrv', 'Croatian'),
+    ('ht', 'hat', 'hat', 'Haitian'),
+    ('hu', 'hun', 'hun', 'Hungarian'),
+    ('hy', 'arm', 'hye', 'Armenian'),
+    ('hz', 'her', 'her', 'Herero'),
+    ('ia', 'ina', 'ina', 'Interlingua'),
+    ('id', 'ind', 'ind', 'Indonesian'),
+    ('ie', 'ile', 'ile', 'Interlingue'),
+    ('ig', 'ibo', 'ibo', 'Igbo'),
+    ('ii', 'iii', 'iii', 'Sichuan Yi'),
+    ('ik', 'ipk', 'ipk', 'Inupiaq'),
+    ('io', 'ido', 'ido', 'Ido'),
+    ('is', 'ice', 'isl', 'Icelandic'),
+    ('it', 'ita', 'ita', 'Italian'),
+    ('iu', 'iku', 'iku', 'Inuktitut'),
+    ('ja', 'jpn', 'jpn', 'Japanese'),
+    ('jv', 'jav', 'jav', 'Javanese'),
+    ('ka', 'geo', 'kat', 'Georgian'),
+    ('kg', 'kon', 'kon', 'Kongo'),
+    ('ki', 'kik', 'kik', 'Kikuyu'),
+    ('kj', 'kua', 'kua', 'Kuanyama'),
+    ('kk', 'kaz', 'kaz', 'Kazakh'),
+    ('kl', 'kal', 'kal', 'Kalaallisut'),
+    ('km', 'khm', 'khm', 'Khmer'),
+    ('kn', 'kan', 'kan', 'Kannada'),
+    ('ko', 'kor', 'kor', 'Korean'),
+    ('kr', 'kau', 'kau', 'Kanuri'),
+    ('ks', 'kas', 'kas', 'Kashmiri'),
+    ('ku', 'kur', 'kur', 'Kurdish'),
+    ('kv', 'kom', 'kom', 'Komi'),
+    ('kw', 'cor', 'cor', 'Cornish'),
+    ('ky', 'kir', 'kir', 'Kirghiz'),
+    ('la', 'lat', 'lat', 'Latin'),
+    ('lb', 'ltz', 'ltz', 'Luxembourgish'),
+    ('lg', 'lug', 'lug', 'Ganda'),
+    ('li', 'lim', 'lim', 'Limburgan'),
+    ('ln', 'lin', 'lin', 'Lingala'),
+    ('lo', 'lao', 'lao', 'Lao'),
+    ('lt', 'lit', 'lit', 'Lithuanian'),
+    ('lu', 'lub', 'lub', 'Luba-Katanga'),
+    ('lv', 'lav', 'lav', 'Latvian'),
+    ('mg', 'mlg', 'mlg', 'Malagasy'),
+    ('mh', 'mah', 'mah', 'Marshallese'),
+    ('mi', 'mao', 'mri', 'Maori'),
+    ('mk', 'mac', 'mkd', 'Macedonian'),
+    ('ml', 'mal', 'mal', 'Malayalam'),
+    ('mn', 'mon', 'mon', 'Mongolian'),
+    ('mr', 'mar', 'mar', 'Marathi'),
+    ('ms', 'may', 'msa', 'Malay'),
+    ('mt', 'mlt', 'mlt', 'Maltese'),
+    ('my', 'bur', 'mya', 'Burmese'),
+    ('na', 'nau', 'nau', 'Nauru'),
+    ('nb', 'nob', 'nob', 'Norwegian Bokmal'),
+    ('nd', 'nde', 'nde', 'North Ndebele'),
+    ('ne', 'nep', 'nep', 'Nepali'),
+    ('ng', 'ndo', 'ndo', 'Ndonga'),
+    ('nl', 'dut', 'nld', 'Dutch'),
+    ('nn', 'nno', 'nno', 'Norwegian Nynorsk'),
+    ('no', 'nor', 'nor', 'Norwegian'),
+    ('nr', 'nbl', 'nbl', 'South Ndebele'),
+    ('nv', 'nav', 'nav', 'Navajo'),
+    ('ny', 'nya', 'nya', 'Chichewa'),
+    ('oc', 'oci', 'oci', 'Occitan'),
+    ('oj', 'oji', 'oji', 'Ojibwa'),
+    ('om', 'orm', 'orm', 'Oromo'),
+    ('or', 'ori', 'ori', 'Oriya'),
+    ('os', 'oss', 'oss', 'Ossetian'),
+    ('pa', 'pan', 'pan', 'Panjabi'),
+    ('pi', 'pli', 'pli', 'Pali'),
+    ('pl', 'pol', 'pol', 'Polish'),
+    ('ps', 'pus', 'pus', 'Pushto'),
+    ('pt', 'por', 'por', 'Portuguese'),
+    ('qu', 'que', 'que', 'Quechua'),
+    ('rm', 'roh', 'roh', 'Romansh'),
+    ('rn', 'run', 'run', 'Rundi'),
+    ('ro', 'rum', 'ron', 'Romanian'),
+    ('ru', 'rus', 'rus', 'Russian'),
+    ('rw', 'kin', 'kin', 'Kinyarwanda'),
+    ('sa', 'san', 'san', 'Sanskrit'),
+    ('sc', 'srd', 'srd', 'Sardinian'),
+    ('sd', 'snd', 'snd', 'Sindhi'),
+    ('se', 'sme', 'sme', 'Northern Sami'),
+    ('sg', 'sag', 'sag', 'Sango'),
+    ('si', 'sin', 'sin', 'Sinhala'),
+    ('sk', 'slo', 'slk', 'Slovak'),
+    ('sl', 'slv', 'slv', 'Slovenian'),
+    ('sm', 'smo', 'smo', 'Samoan'),
+    ('sn', 'sna', 'sna', 'Shona'),
+    ('so', 'som', 'som', 'Somali'),
+    ('sq', 'alb', 'sqi', 'Albanian'),
+    ('sr', 'srp', 'srp', 'Serbian'),
+    ('ss', 'ssw', 'ssw', 'Swati'),
+    ('st', 'sot', 'sot', 'Southern Sotho'),
+    ('su', 'sun', 'sun', 'Sundanese'),
+    ('sv', 'swe', 'swe', 'Swedish'),
+    ('sw', 'swa', 'swa', 'Swahili'),
+    ('ta', 'tam', 'tam', 'Tamil'),
+    ('te', 'tel', 'tel', 'Telugu'),
+    ('tg', 'tgk', 'tgk', 'Tajik'),
+    ('th', 'tha', 'tha', 'Thai'),
+    ('ti', 'tir', 'tir', 'Tigrinya'),
+    ('tk', 'tuk', 'tuk', 'Turkmen'),
+    ('tl', 'tgl', 'tgl', 'Tagalog'),
+    ('tn', 'tsn', 'tsn', 'Tswana'),
+    ('to', 'ton', 'ton', 'Tonga'),
+    ('tr', 'tur', 'tur', 'Turkish'),
+    ('ts', 'tso', 'tso', 'Tsonga'),
+    ('tt', 'tat', 'tat', 'Tatar'),
+    ('tw', 'twi', 'twi', 'Twi'),
+    ('ty', 'tah', 'tah', 'Tahitian'),
+    ('ug', 'uig', 'uig', 'Uighur'),
+    ('uk', 'ukr', 'ukr', 'Ukrainian'),
+    ('ur', 'urd', 'urd', 'Urdu'),
+    ('uz', 'uzb', 'uzb', 'Uzbek'),
+    ('ve', 'ven', 'ven', 'Venda'),
+    ('vi', 'vie', 'vie', 'Vietnamese'),
+    ('vo', 'vol', 'vol', 'Volapuk'),
+    ('wa', 'wln', 'wln', 'Walloon'),
+    ('wo', 'wol', 'wol', 'Wolof'),
+    ('xh', 'xho', 'xho', 'Xhosa'),
+    ('yi', 'yid', 'yid', 'Yiddish'),
+    ('yo', 'yor', 'yor', 'Yoruba'),
+    ('za', 'zha', 'zha', 'Zhuang'),
+    ('zh', 'chi', 'zho', 'Chinese'),
+    ('zu', 'zul', 'zul', 'Zulu'),
+]
+_languages_by_code: Dict[str, Tuple[str, str, str, str]] = {}
+for _language in _languages:
+    for _code in _language[:3]:
+        _languages_by_code[_code] = _language
+# Lower case codes and English names mapped to ISO 639-1 codes
+_alpha2_codes: Dict[str, str] = {}
+for _language in _languages:
+    for _code in _language:
+        _alpha2_codes[_code.lower()] = _language[0]
+
+# Codes which mean the language is not known
+_undetermined_codes = ('', 'und', 'mis', 'mul', 'zxx')
+
+
+def describe_language(
+    code: Optional[str],
+) -> Tuple[Optional[str], Optional[List[str]]]:
+    """
+    Describes a language code the way MediaInfo does.
+
+    Parameters
+    ----------
+    code:
+        An ISO 639-1, ISO 639-2 or BCP 47 language code e.g. `'en'`,
+        `'eng'` or `'en-US'`
+
+    Returns
+    -------
+    The language, which is the ISO 639-1 code if it has one, and other
+    representations of the language: its English name and ISO 639
+    codes. Both are `None` if the language is undetermined.
+    """
+    if code is None:
+        return None, None
+
+    primary_code = code.split('-')[0].lower()
+    if primary_code in _undetermined_codes:
+        return None, None
+
+    language = _languages_by_code.get(primary_code)
+    if language is None:
+        return code, [code]
+
+    alpha2, alpha3_b, alpha3_t, name = language
+    other_language = [name, alpha2, alpha3_b]
+    if alpha3_t != alpha3_b:
+        other_language.append(alpha3_t)
+    if code != primary_code:
+        other_language.append(code)
+    return alpha2, other_language
+
+
+def normalize_language(language: str) -> Optional[str]:
+    """
+    Normalizes a language code or name, so all representations of a
+    language are equal.
+
+    Parameters
+    ----------
+    language:
+        An ISO 639-1, ISO 639-2/B, ISO 639-2/T or BCP 47 language code,
+        or English name of a language e.g. `'fa'`, `'per'`, `'fas'`,
+        `'Persian'` or `'fa-IR'`
+
+    Returns
+    -------
+    The lower case ISO 639-1 code of the language, followed by the rest
+    of its BCP 47 code if any e.g. `'fa'` or `'fa-ir'`. `None` if the
+    language is not known.
+    """
+    language = language.lower()
+    # Some English names contain a hyphen e.g. Luba-Katanga
+    alpha2 = _alpha2_codes.get(language)
+    if alpha2 is not None:
+        return alpha2
+
+    primary_code, _, rest = language.partition('-')
+    alpha2 = _alpha2_codes.get(primary_code)
+    if alpha2 is None or not rest:
+        return None
+    return f'{alpha2}-{rest}'
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from medicure.data_structures import MuxCommand, MuxResult
+
+
+class ManifestStore:
+    """
+    Fingerprints of outputs, saved in a manifest file of each output
+    directory, so up-to-date outputs can be skipped in incremental mode
+    """
+
+    _manifest_name = '.medicure.json'
+    # Guards reading and writing manifests of concurrent jobs, it is
+    # shared by all stores since treatments of `Medicure` and
+    # `AsyncMedicure` may write to the same directories
+    _lock = threading.Lock()
+
+    def split_up_to_date_commands(
+        self, commands: List[MuxCommand], force: bool
+    ) -> Tuple[List[MuxCommand], List[MuxCommand]]:
+        """
+        Fingerprints commands and splits them by whether their outputs
+        are up-to-date.
+
+        Parameters
+        ----------
+        commands:
+            The commands
+
+        force:
+            Whether all commands should be considered outdated
+
+        Returns
+        -------
+        Outdated commands and up-to-date commands
+        """
+        outdated_commands, up_to_date_commands = [], []
+        for command in commands:
+            command.fingerprint = self._get_fingerprint(command)
+        # Other jobs may be rewriting the manifests
+        with self._lock:
+            manifests = {
+                directory: self._load_manifest(directory)
+                for directory in {
+                    command.output.parent for command in commands
+                }
+            }
+
+        for command in commands:
+            directory = command.output.parent
+            if (
+                not force
+                and command.output.exists()
+                and manifests[directory].get(command.output.name)
+                == command.fingerprint
+            ):
+                up_to_date_commands.append(command)
+            else:
+                outdated_commands.append(command)
+
+        return outdated_commands, up_to_date_commands
+
+    def save_fingerprints(
+        self, commands: List[MuxCommand], mux_results: List[MuxResult]
+    ) -> None:
+        """
+        Saves fingerprints of commands which succeeded.
+
+        Parameters
+        ----------
+        commands:
+            The commands, fingerprinted by `split_up_to_date_commands`
+
+        mux_results:
+            Result of each command
+        """
+        manifests: Dict[Path, Dict[str, str]] = {}
+        with self._lock:
+            for command, mux_result in zip(commands, mux_results):
+                if not mux_result.succeeded:
+                    continue
+
+                directory = command.output.parent
+                if directory not in manifests:
+                    manifests[directory] = self._load_manifest(directory)
+                manifests[directory][command.output.name] = command.fingerprint
+
+            for directory, manifest in manifests.items():
+                # A temporary file replaces it, so an interrupted write
+                # does not leave a truncated manifest
+                with tempfile.NamedTemporaryFile(
+                    'w', dir=directory, suffix='.tmp', delete=False
+                ) as f:
+                    json.dump(manifest, f, indent=4, sort_keys=True)
+                os.replace(f.name, directory / self._manifest_name)
+
+    def _load_manifest(self, directory: Path) -> Dict[str, str]:
+        manifest_path = directory / self._manifest_name
+        if not manifest_path.exists():
+            return {}
+
+        # An unreadable manifest is treated as empty, so its outputs are
+        # rebuilt
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        return manifest if isinstance(manifest, dict) else {}
+
+    @staticmethod
+    def _get_fingerprint(command: MuxCommand) -> str:
+        fingerprint = hashlib.sha256()
+        for input_plan in command.inputs:
+            path = input_plan.path
+            stat = os.stat(path)
+            fingerprint.update(
+                f'{path}\0{stat.st_size}\0{stat.st_mtime_ns}\0'.encode()
+            )
+        fingerprint.update(
+            json.dumps([command.kind, command.arguments]).encode()
+        )
+        return fingerprint.hexdigest()
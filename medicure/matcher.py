@@ -0,0 +1,212 @@
+import heapq
+import re
+from collections import defaultdict
+from typing import (
+    DefaultDict,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    Tuple,
+)
+
+from medicure.data_structures import DubbingSupplier, TrackInfo, TrackKind
+from medicure.languages import normalize_language
+
+# A dubbing supplier in a bucket: its index, compiled search pattern and
+# its language code if it is not known, buckets are in order of indices
+_Entry = Tuple[int, Optional[Pattern], Optional[str]]
+
+
+class SupplierMatcher:
+    """
+    An index of dubbing suppliers, finds the first dubbing supplier
+    whose search pattern and language code match a track.
+
+    Dubbing suppliers are bucketed by their file id, track kind and
+    normalized language code, and their search patterns are compiled
+    once, so matching a track only checks dubbing suppliers of its
+    file, kind and language.
+    """
+
+    def __init__(self, dubbing_suppliers: List[DubbingSupplier]) -> None:
+        """
+        Initializes SupplierMatcher.
+
+        Parameters
+        ----------
+        dubbing_suppliers:
+            Dubbing suppliers in order of priority
+        """
+        self.dubbing_suppliers = dubbing_suppliers
+        self._file_suppliers: DefaultDict[int, List[int]] = defaultdict(list)
+        self._buckets: Dict[
+            Tuple[int, TrackKind], DefaultDict[Optional[str], List[_Entry]]
+        ] = {}
+        # Dubbing suppliers whose language codes are not known are
+        # matched against all representations of track languages
+        self._unknown_language_buckets: DefaultDict[
+            Tuple[int, TrackKind], List[_Entry]
+        ] = defaultdict(list)
+        # Candidates of each file id, track kind and track language,
+        # tracks of a job have a few distinct languages
+        self._candidates: Dict[
+            Tuple[int, TrackKind, Optional[str]], List[_Entry]
+        ] = {}
+
+        for i, ds in enumerate(dubbing_suppliers):
+            self._file_suppliers[ds.file_id].append(i)
+            for kind, search_pattern, language_code in (
+                (
+                    TrackKind.AUDIO,
+                    ds.audio_search_pattern,
+                    ds.audio_language_code,
+                ),
+                (
+                    TrackKind.SUBTITLE,
+                    ds.subtitle_search_pattern,
+                    ds.subtitle_language_code,
+                ),
+            ):
+                title_pattern = None
+                if search_pattern is not None:
+                    title_pattern = re.compile(search_pattern)
+                key = (ds.file_id, kind)
+                language = None
+                if language_code is not None:
+                    language = normalize_language(language_code)
+                    if language is None:
+                        self._unknown_language_buckets[key].append(
+                            (i, title_pattern, language_code)
+                        )
+                        continue
+
+                self._buckets.setdefault(key, defaultdict(list))[
+                    language
+                ].append((i, title_pattern, None))
+
+    def get_file_suppliers(self, file_id: int) -> List[int]:
+        """
+        Gets dubbing suppliers of a file.
+
+        Parameters
+        ----------
+        file_id:
+            The file id
+
+        Returns
+        -------
+        Indices of dubbing suppliers whose file id is `file_id`, in
+        order of priority
+        """
+        return self._file_suppliers.get(file_id, [])
+
+    def match(
+        self,
+        file_id: int,
+        kind: TrackKind,
+        track: TrackInfo,
+        selected: Dict[int, int],
+    ) -> Optional[int]:
+        """
+        Finds the first dubbing supplier which matches a track.
+
+        Parameters
+        ----------
+        file_id:
+            Id of the file which contains the track
+
+        kind:
+            Kind of the track
+
+        track:
+            The probed track
+
+        selected:
+            Track ids selected so far, keyed by index of their dubbing
+            supplier, these dubbing suppliers are skipped
+
+        Returns
+        -------
+        Index of the matched dubbing supplier, or `None` if none of
+        them match
+        """
+        for i in self._iter_matches(file_id, kind, track, selected):
+            return i
+        return None
+
+    def match_all(
+        self, file_id: int, kind: TrackKind, track: TrackInfo
+    ) -> List[int]:
+        """
+        Finds all dubbing suppliers which match a track.
+
+        Parameters
+        ----------
+        file_id:
+            Id of the file which contains the track
+
+        kind:
+            Kind of the track
+
+        track:
+            The probed track
+
+        Returns
+        -------
+        Indices of the matched dubbing suppliers in order of priority
+        """
+        return list(self._iter_matches(file_id, kind, track, {}))
+
+    def _iter_matches(
+        self,
+        file_id: int,
+        kind: TrackKind,
+        track: TrackInfo,
+        selected: Dict[int, int],
+    ) -> Iterator[int]:
+        key = (file_id, kind, track.language)
+        candidates = self._candidates.get(key)
+        if candidates is None:
+            candidates = list(self._get_candidates(*key))
+            self._candidates[key] = candidates
+
+        for i, title_pattern, unknown_language_code in candidates:
+            if i in selected:
+                continue
+
+            if (
+                unknown_language_code is not None
+                and unknown_language_code not in (track.other_language or [])
+            ):
+                continue
+
+            title = track.title
+            if title_pattern is None or title is None:
+                if title_pattern is None and title is None:
+                    yield i
+            elif title_pattern.search(title) is not None:
+                yield i
+
+    def _get_candidates(
+        self, file_id: int, kind: TrackKind, track_language: Optional[str]
+    ) -> Iterable[_Entry]:
+        key = (file_id, kind)
+        buckets = self._buckets.get(key)
+        if track_language is None:
+            # Only dubbing suppliers without a language code match
+            return buckets.get(None, []) if buckets else []
+
+        candidates = []
+        if buckets:
+            language = normalize_language(track_language)
+            if language is not None:
+                candidates.append(buckets.get(language))
+                # Dubbing suppliers without a region match all regions
+                primary_language = language.partition('-')[0]
+                if primary_language != language:
+                    candidates.append(buckets.get(primary_language))
+        candidates.append(self._unknown_language_buckets.get(key))
+        return heapq.merge(*(c for c in candidates if c))
@@ -0,0 +1,255 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from typing import Callable, List, Optional, Tuple
+
+from medicure.data_structures import MuxCommand, MuxResult
+from medicure.utils import clone_file, link_file
+
+# Progress lines mkvmerge writes in GUI mode
+_progress_pattern = re.compile(r'#GUI#progress (\d+)%')
+
+
+def mux(
+    command: MuxCommand,
+    on_progress: Optional[Callable[[int], None]] = None,
+) -> MuxResult:
+    """
+    Runs a command.
+
+    Parameters
+    ----------
+    command:
+        The command
+
+    on_progress:
+        A function which is called with the percentage of progress of
+        mkvmerge
+
+    Returns
+    -------
+    Result of the command
+    """
+    start = time.perf_counter()
+    mux_result = mux_in_place(command)
+    if mux_result is not None:
+        return mux_result
+
+    exit_code, stderr = run_mkvtoolnix(
+        'mkvmerge', command.arguments, on_progress
+    )
+    return MuxResult(
+        command.output,
+        exit_code,
+        stderr,
+        time.perf_counter() - start,
+    )
+
+
+def mux_in_place(command: MuxCommand) -> Optional[MuxResult]:
+    """
+    Prepares the output of a command, and then links, copies or edits
+    it in place if the command allows it.
+
+    Parameters
+    ----------
+    command:
+        The command
+
+    Returns
+    -------
+    Result of the command, or `None` if it should be muxed with
+    mkvmerge
+    """
+    command.output.parent.mkdir(parents=True, exist_ok=True)
+    # The output may be linked to an input by a previous run, so it is
+    # replaced rather than written to
+    if os.path.lexists(command.output):
+        os.remove(command.output)
+
+    start = time.perf_counter()
+    original_file_path = command.inputs[0].path
+    if command.kind == 'link' and link_file(
+        original_file_path, command.output
+    ):
+        print(f'The file: {original_file_path} linked to: {command.output}.')
+        return MuxResult(
+            command.output,
+            0,
+            wall_time=time.perf_counter() - start,
+            kind='link',
+            saved_bytes=os.path.getsize(original_file_path),
+        )
+
+    if command.kind in ('copy', 'link'):
+        shutil.copyfile(original_file_path, command.output)
+        print(
+            f'The file: {original_file_path} '
+            f'copied and renamed to: {command.output}.',
+        )
+        return MuxResult(
+            command.output,
+            0,
+            wall_time=time.perf_counter() - start,
+            kind='copy',
+        )
+
+    if command.kind == 'propedit':
+        clone_file(original_file_path, command.output)
+        exit_code, stderr = run_mkvtoolnix(
+            'mkvpropedit', command.propedit_arguments
+        )
+        if exit_code in (0, 1):
+            print(
+                f'The file: {original_file_path} cloned to: '
+                f'{command.output} and edited with mkvpropedit.',
+            )
+            return MuxResult(
+                command.output,
+                exit_code,
+                stderr,
+                time.perf_counter() - start,
+                'propedit',
+            )
+
+        # Falls back to remuxing, e.g. mkvpropedit is not installed
+        os.remove(command.output)
+
+    return None
+
+
+def run_mkvtoolnix(
+    program: str,
+    arguments: List[str],
+    on_progress: Optional[Callable[[int], None]] = None,
+) -> Tuple[int, str]:
+    """
+    Runs a MKVToolNix program.
+
+    Parameters
+    ----------
+    program:
+        The program, e.g. `'mkvmerge'`
+
+    arguments:
+        Arguments of the program
+
+    on_progress:
+        A function which is called with the percentage of progress
+
+    Returns
+    -------
+    Exit code and standard error of the program
+    """
+    option_file = write_option_file(arguments)
+    try:
+        if on_progress is not None:
+            return _run_with_progress(
+                [program, '--gui-mode', f'@{option_file}'], on_progress
+            )
+
+        process = subprocess.run(
+            [program, f'@{option_file}'],
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        return process.returncode, process.stderr
+    except OSError as e:
+        # E.g. it is not installed, the code a shell returns
+        return 127, str(e)
+    finally:
+        os.remove(option_file)
+
+
+def write_option_file(arguments: List[str]) -> str:
+    """
+    Writes arguments of a MKVToolNix program to an option file, which
+    should be removed after running the program.
+
+    Returns
+    -------
+    Path of the option file
+    """
+    # Arguments are passed in a JSON option file and the program is run
+    # without a shell, so no quoting is needed
+    with tempfile.NamedTemporaryFile(
+        'w', suffix='.json', encoding='utf-8', delete=False
+    ) as f:
+        json.dump(arguments, f, ensure_ascii=False)
+    return f.name
+
+
+def _run_with_progress(
+    args: List[str], on_progress: Callable[[int], None]
+) -> Tuple[int, str]:
+    # Standard error is spooled to a file, so standard output can be
+    # read line by line without filling the other pipe
+    with tempfile.TemporaryFile('w+') as stderr:
+        with subprocess.Popen(
+            args, stdout=subprocess.PIPE, stderr=stderr, text=True
+        ) as process:
+            for line in process.stdout:
+                match = _progress_pattern.match(line)
+                if match is not None:
+                    on_progress(int(match[1]))
+                else:
+                    print(line, end='')
+
+        stderr.seek(0)
+        return process.returncode, stderr.read()
+
+
+def report_mux_results(
+    mux_results: List[MuxResult], skipped_count: Optional[int]
+) -> None:
+    """
+    Prints a summary of results of commands, and then raises if any of
+    them failed.
+
+    Parameters
+    ----------
+    mux_results:
+        Result of each command
+
+    skipped_count:
+        Number of up-to-date commands which have been skipped, only in
+        incremental mode
+    """
+    # The number of skipped files is only known in incremental mode
+    if skipped_count is not None:
+        print(
+            f'{skipped_count} up-to-date file(s) skipped, '
+            f'{len(mux_results)} file(s) rebuilt.'
+        )
+    linked_results = [r for r in mux_results if r.kind == 'link']
+    if linked_results:
+        print(
+            f'{len(linked_results)} file(s) linked to their inputs, '
+            f'{sum(r.saved_bytes for r in linked_results)} bytes of '
+            'writes avoided.'
+        )
+    check_mux_results(mux_results)
+
+
+def check_mux_results(mux_results: List[MuxResult]) -> None:
+    """
+    Raises if any of the commands failed.
+
+    Parameters
+    ----------
+    mux_results:
+        Result of each command
+    """
+    failures = [
+        f'{mux_result.output.name} (exit code {mux_result.exit_code})'
+        for mux_result in mux_results
+        if not mux_result.succeeded
+    ]
+    if failures:
+        raise RuntimeError(
+            'mkvmerge failed for: {}.'.format(', '.join(failures))
+        )
@@ -0,0 +1,657 @@
+import json
+import mmap
+import struct
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from pymediainfo import MediaInfo
+
+from medicure.data_structures import TrackInfo
+from medicure.languages import describe_language
+
+# Matroska element ids, see
+# https://www.matroska.org/technical/elements.html
+_ebml_id = 0x1A45DFA3
+_doc_type_id = 0x4282
+_segment_id = 0x18538067
+_seek_head_id = 0x114D9B74
+_seek_id = 0x4DBB
+_seek_id_id = 0x53AB
+_seek_position_id = 0x53AC
+_tracks_id = 0x1654AE6B
+_track_entry_id = 0xAE
+_track_number_id = 0xD7
+_track_type_id = 0x83
+_name_id = 0x536E
+_language_id = 0x22B59C
+_language_bcp47_id = 0x22B59D
+_flag_default_id = 0x88
+_flag_forced_id = 0x55AA
+
+_matroska_track_types = {1: 'Video', 2: 'Audio', 0x11: 'Text'}
+_mkvmerge_track_types = {
+    'video': 'Video',
+    'audio': 'Audio',
+    'subtitles': 'Text',
+}
+_mp4_track_types = {
+    b'vide': 'Video',
+    b'soun': 'Audio',
+    b'sbtl': 'Text',
+    b'subt': 'Text',
+    b'text': 'Text',
+    b'clcp': 'Text',
+}
+
+# Fields of each track which Medicure reads from MediaInfo
+_mediainfo_fields = [
+    'ID',
+    'Title',
+    'Language',
+    'Language/String',
+    'Language/String1',
+    'Language/String2',
+    'Language/String3',
+    'Language/String4',
+    'Default',
+    'Forced',
+]
+# An Inform template of the fields, values are separated by unit
+# separators and tracks by record separators, which are not expected in
+# titles
+_mediainfo_inform = '\r\n'.join(
+    f'{track_type};{track_type}'
+    + ''.join(f'\x1f%{field}%' for field in _mediainfo_fields)
+    + '\x1e'
+    for track_type in ('Video', 'Audio', 'Text')
+)
+
+# An element and its data range: id, start and end, end is `None` if
+# its size is unknown
+_Element = Tuple[int, int, Optional[int]]
+
+
+class Prober:
+    """
+    Base class of probe backends, which find tracks of media files.
+    """
+
+    #: Name of the backend, which selects it in the CLI
+    name = ''
+
+    def __init__(self, jobs: int = 8) -> None:
+        """
+        Initializes prober.
+
+        Parameters
+        ----------
+        jobs:
+            Maximum number of files to probe concurrently, probing is
+            mostly waiting for reads so a higher number hides latency
+            of network storage.
+        """
+        assert jobs >= 1, '`jobs` should be a positive integer.'
+        self._jobs = jobs
+
+    @property
+    def jobs(self) -> int:
+        """
+        Maximum number of files to probe concurrently.
+        """
+        return self._jobs
+
+    def probe(self, path: Path) -> List[TrackInfo]:
+        """
+        Probes tracks of a file.
+
+        Parameters
+        ----------
+        path:
+            The file path
+
+        Returns
+        -------
+        Tracks of the file in the shape MediaInfo reports them, track
+        ids start from 1
+        """
+        raise NotImplementedError
+
+    def probe_many(
+        self,
+        paths: List[Path],
+        on_probe: Optional[Callable[[Path, List[TrackInfo]], None]] = None,
+    ) -> List[List[TrackInfo]]:
+        """
+        Probes tracks of many files concurrently.
+
+        Parameters
+        ----------
+        paths:
+            The file paths
+
+        on_probe:
+            A function which is called with path and tracks of each
+            file as soon as it is probed, possibly from another thread
+
+        Returns
+        -------
+        Tracks of each file in order of paths
+        """
+
+        def probe(path: Path) -> List[TrackInfo]:
+            tracks = self.probe(path)
+            if on_probe is not None:
+                on_probe(path, tracks)
+            return tracks
+
+        if self._jobs == 1 or len(paths) <= 1:
+            return [probe(path) for path in paths]
+
+        with ThreadPoolExecutor(
+            max_workers=min(self._jobs, len(paths))
+        ) as executor:
+            return list(executor.map(probe, paths))
+
+
+class MediaInfoProber(Prober):
+    """
+    Probes files with MediaInfo.
+    """
+
+    name = 'mediainfo'
+
+    def __init__(self, minimal: bool = True, jobs: int = 8) -> None:
+        """
+        Initializes MediaInfo prober.
+
+        Parameters
+        ----------
+        minimal:
+            If set to `True` only the fields Medicure reads of video,
+            audio and subtitle tracks are asked from MediaInfo through
+            an Inform template, otherwise whole MediaInfo output of the
+            file is parsed.
+
+        jobs:
+            Maximum number of files to probe concurrently
+        """
+        super().__init__(jobs)
+        self._minimal = minimal
+
+    def probe(self, path: Path) -> List[TrackInfo]:
+        """
+        Probes tracks of a file.
+
+        Parameters
+        ----------
+        path:
+            The file path
+
+        Returns
+        -------
+        Tracks of the file
+        """
+        if not self._minimal:
+            return [
+                TrackInfo(
+                    track.track_type,
+                    track.track_id,
+                    track.title,
+                    track.language,
+                    track.other_language,
+                    track.default,
+                    track.forced,
+                )
+                for track in MediaInfo.parse(path).tracks
+            ]
+
+        tracks = []
+        output = MediaInfo.parse(path, output=_mediainfo_inform, full=False)
+        for record in output.split('\x1e'):
+            values = [v or None for v in record.strip('\r\n').split('\x1f')]
+            if len(values) != len(_mediainfo_fields) + 1:
+                continue
+
+            track_type, track_id, title, language = values[:4]
+            other_language = [v for v in values[4:-2] if v is not None]
+            default, forced = values[-2:]
+            if track_id is not None:
+                track_id = int(track_id) if track_id.isdigit() else None
+            tracks.append(
+                TrackInfo(
+                    track_type,
+                    track_id,
+                    title,
+                    language,
+                    other_language or None,
+                    default,
+                    forced,
+                )
+            )
+
+        return tracks
+
+
+class NativeProber(MediaInfoProber):
+    """
+    Reads track headers of Matroska and MP4 files only, other files e.g.
+    mp3 and srt are probed with MediaInfo.
+    """
+
+    name = 'native'
+
+    def probe(self, path: Path) -> List[TrackInfo]:
+        """
+        Probes tracks of a file.
+
+        Parameters
+        ----------
+        path:
+            The file path
+
+        Returns
+        -------
+        Tracks of the file
+        """
+        tracks = probe_tracks(path)
+        if tracks is None:
+            return super().probe(path)
+        return tracks
+
+
+class MkvmergeProber(Prober):
+    """
+    Identifies files with `mkvmerge -J`, so track ids are exactly the
+    ones mkvmerge uses. Many files are identified concurrently.
+    """
+
+    name = 'mkvmerge'
+
+    def __init__(self, jobs: int = 4) -> None:
+        """
+        Initializes mkvmerge prober.
+
+        Parameters
+        ----------
+        jobs:
+            Maximum number of mkvmerge processes to run concurrently
+        """
+        super().__init__(jobs)
+
+    def probe(self, path: Path) -> List[TrackInfo]:
+        """
+        Probes tracks of a file.
+
+        Parameters
+        ----------
+        path:
+            The file path
+
+        Returns
+        -------
+        Tracks of the file
+        """
+        process = subprocess.run(
+            ['mkvmerge', '-J', str(path)],
+            stdout=subprocess.PIPE,
+            encoding='utf-8',
+        )
+        identification = json.loads(process.stdout)
+        if not identification['container'].get('recognized'):
+            raise RuntimeError(
+                f'mkvmerge could not identify the file: {path.name}.'
+            )
+
+        tracks = []
+        for track in identification['tracks']:
+            properties = track.get('properties', {})
+            language, other_language = describe_language(
+                properties.get('language_ietf') or properties.get('language')
+            )
+            tracks.append(
+                TrackInfo(
+                    _mkvmerge_track_types.get(track['type'], 'Other'),
+                    # mkvmerge track ids start from 0
+                    track['id'] + 1,
+                    properties.get('track_name'),
+                    language,
+                    other_language,
+                    'Yes' if properties.get('default_track') else 'No',
+                    'Yes' if properties.get('forced_track') else 'No',
+                )
+            )
+
+        return tracks
+
+
+def get_prober(name: str, jobs: Optional[int] = None) -> Prober:
+    """
+    Gets a probe backend by its name.
+
+    Parameters
+    ----------
+    name:
+        Name of the backend, either `'native'`, `'mediainfo'` or
+        `'mkvmerge'`
+
+    jobs:
+        Maximum number of files to probe concurrently, by default the
+        backend's own default is used.
+
+    Returns
+    -------
+    The probe backend
+    """
+    probers = {
+        prober.name: prober
+        for prober in (NativeProber, MediaInfoProber, MkvmergeProber)
+    }
+    assert (
+        name in probers
+    ), '`prober` should be either `native`, `mediainfo` or `mkvmerge`.'
+    return probers[name]() if jobs is None else probers[name](jobs=jobs)
+
+
+def probe_tracks(path: Path) -> Optional[List[TrackInfo]]:
+    """
+    Probes tracks of a Matroska or MP4 file by reading its track headers
+    only, the file is memory-mapped so the media data is never read.
+
+    Parameters
+    ----------
+    path:
+        The file path
+
+    Returns
+    -------
+    Video, audio and subtitle tracks of the file in the shape MediaInfo
+    reports them, or `None` if the file is not a Matroska or MP4 file
+    or it can not be probed
+    """
+    probe = _probes.get(path.suffix.lower())
+    if probe is None:
+        return None
+
+    try:
+        with open(path, 'rb') as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as data:
+            return probe(data)
+    except (ValueError, IndexError, struct.error):
+        # E.g. an empty, truncated or malformed file, which is left to
+        # MediaInfo
+        return None
+
+
+def _probe_matroska(data: mmap.mmap) -> List[TrackInfo]:
+    elements = _iter_elements(data, 0, len(data))
+    element_id, start, end = next(elements)
+    if element_id != _ebml_id or end is None:
+        raise ValueError('Not a Matroska file.')
+
+    doc_type = _find_child(data, start, end, _doc_type_id)
+    if doc_type not in (b'matroska', b'webm'):
+        raise ValueError('Not a Matroska file.')
+
+    for element_id, start, end in elements:
+        if element_id == _segment_id:
+            break
+    else:
+        raise ValueError('No Segment element has been found.')
+
+    segment_start, segment_end = start, min(end or len(data), len(data))
+    for element_id, start, end in _iter_elements(
+        data, segment_start, segment_end
+    ):
+        if element_id == _tracks_id and end is not None:
+            return _parse_matroska_tracks(data, start, end)
+
+        if element_id == _seek_head_id and end is not None:
+            # Jumps over clusters to the Tracks element, if the seek
+            # head points to it
+            position = _find_seek_position(data, start, end, _tracks_id)
+            if position is not None:
+                element_id, start, end = next(
+                    _iter_elements(data, segment_start + position, segment_end)
+                )
+                if element_id == _tracks_id and end is not None:
+                    return _parse_matroska_tracks(data, start, end)
+
+        if end is None:
+            break
+
+    raise ValueError('No Tracks element has been found.')
+
+
+def _parse_matroska_tracks(
+    data: mmap.mmap, start: int, end: int
+) -> List[TrackInfo]:
+    tracks = []
+    for element_id, entry_start, entry_end in _iter_elements(data, start, end):
+        if element_id != _track_entry_id or entry_end is None:
+            continue
+
+        fields = {
+            child_id: data[child_start:child_end]
+            for child_id, child_start, child_end in _iter_elements(
+                data, entry_start, entry_end
+            )
+            if child_end is not None
+        }
+        # Language is English if it is not written, see Matroska specs
+        language_code = _decode_string(
+            fields.get(_language_bcp47_id)
+        ) or _decode_string(fields.get(_language_id), 'eng')
+        language, other_language = describe_language(language_code)
+        tracks.append(
+            TrackInfo(
+                _matroska_track_types.get(
+                    _decode_uint(fields.get(_track_type_id)), 'Other'
+                ),
+                _decode_uint(fields.get(_track_number_id)),
+                _decode_string(fields.get(_name_id)),
+                language,
+                other_language,
+                _decode_flag(fields.get(_flag_default_id), True),
+                _decode_flag(fields.get(_flag_forced_id), False),
+            )
+        )
+
+    return tracks
+
+
+def _find_seek_position(
+    data: mmap.mmap, start: int, end: int, element_id: int
+) -> Optional[int]:
+    target_id = element_id.to_bytes(4, 'big')
+    for child_id, seek_start, seek_end in _iter_elements(data, start, end):
+        if child_id != _seek_id or seek_end is None:
+            continue
+
+        seek_id = _find_child(data, seek_start, seek_end, _seek_id_id)
+        if seek_id is not None and seek_id.lstrip(b'\0') == target_id:
+            return _decode_uint(
+                _find_child(data, seek_start, seek_end, _seek_position_id)
+            )
+
+    return None
+
+
+def _find_child(
+    data: mmap.mmap, start: int, end: int, element_id: int
+) -> Optional[bytes]:
+    for child_id, child_start, child_end in _iter_elements(data, start, end):
+        if child_id == element_id and child_end is not None:
+            return data[child_start:child_end]
+
+    return None
+
+
+def _iter_elements(
+    data: mmap.mmap, start: int, end: int
+) -> Iterator[_Element]:
+    position = start
+    while position < end:
+        element_id, length = _read_vint(data, position)
+        position += length
+        size, length = _read_vint(data, position)
+        position += length
+        # Size with all of its value bits set is unknown
+        value_mask = (1 << (7 * length)) - 1
+        size &= value_mask
+        if size == value_mask:
+            yield element_id, position, None
+            return
+
+        if position + size > end:
+            raise ValueError('Element exceeds its parent.')
+
+        yield element_id, position, position + size
+        position += size
+
+
+def _read_vint(data: mmap.mmap, position: int) -> Tuple[int, int]:
+    # Returns the integer with its length marker bit, and its length
+    first_byte = data[position]
+    if first_byte == 0:
+        raise ValueError('Invalid variable size integer.')
+
+    length = 9 - first_byte.bit_length()
+    if position + length > len(data):
+        raise ValueError('Variable size integer exceeds the file.')
+
+    end = position + length
+    return int.from_bytes(data[position:end], 'big'), length
+
+
+def _decode_uint(value: Optional[bytes]) -> Optional[int]:
+    if value is None:
+        return None
+    return int.from_bytes(value, 'big')
+
+
+def _decode_flag(value: Optional[bytes], default: bool) -> str:
+    flag = default if value is None else bool(_decode_uint(value))
+    return 'Yes' if flag else 'No'
+
+
+def _decode_string(
+    value: Optional[bytes], default: Optional[str] = None
+) -> Optional[str]:
+    if value is None:
+        return default
+    return value.rstrip(b'\0').decode('utf-8', errors='replace') or default
+
+
+def _probe_mp4(data: mmap.mmap) -> List[TrackInfo]:
+    for box_type, start, end in _iter_boxes(data, 0, len(data)):
+        if box_type == b'moov':
+            return [
+                _parse_mp4_track(data, trak_start, trak_end)
+                for trak_type, trak_start, trak_end in _iter_boxes(
+                    data, start, end
+                )
+                if trak_type == b'trak'
+            ]
+
+    raise ValueError('No moov box has been found.')
+
+
+def _parse_mp4_track(data: mmap.mmap, start: int, end: int) -> TrackInfo:
+    boxes = _get_boxes(data, start, end)
+    tkhd_start = boxes[b'tkhd'][0]
+    version = data[tkhd_start]
+    (enabled,) = struct.unpack_from('>I', data, tkhd_start)
+    (track_id,) = struct.unpack_from(
+        '>I', data, tkhd_start + (20 if version == 1 else 12)
+    )
+
+    mdia_boxes = _get_boxes(data, *boxes[b'mdia'])
+    mdhd_start = mdia_boxes[b'mdhd'][0]
+    (packed_language,) = struct.unpack_from(
+        '>H',
+        data,
+        mdhd_start + (32 if data[mdhd_start] == 1 else 20),
+    )
+    # Packed ISO 639-2/T code, each letter in 5 bits
+    language_code = ''.join(
+        chr(((packed_language >> shift) & 0x1F) + 0x60) for shift in (10, 5, 0)
+    )
+    if b'elng' in mdia_boxes:
+        # A full box, its version and flags are skipped
+        elng_start, elng_end = mdia_boxes[b'elng']
+        elng_start += 4
+        language_code = (
+            _decode_string(data[elng_start:elng_end]) or language_code
+        )
+    language, other_language = describe_language(language_code)
+
+    (handler_type,) = struct.unpack_from(
+        '>4s', data, mdia_boxes[b'hdlr'][0] + 8
+    )
+
+    title = None
+    if b'udta' in boxes:
+        udta_boxes = _get_boxes(data, *boxes[b'udta'])
+        if b'name' in udta_boxes:
+            title = _decode_string(data[slice(*udta_boxes[b'name'])])
+
+    track_type = _mp4_track_types.get(handler_type, 'Other')
+    default, forced = None, None
+    # Like MediaInfo, flags are only reported for subtitle tracks, which
+    # are not shown by default if they are disabled
+    if track_type == 'Text':
+        default, forced = 'Yes' if enabled & 1 else 'No', 'No'
+
+    return TrackInfo(
+        track_type,
+        track_id,
+        title,
+        language,
+        other_language,
+        default,
+        forced,
+    )
+
+
+def _get_boxes(
+    data: mmap.mmap, start: int, end: int
+) -> Dict[bytes, Tuple[int, int]]:
+    boxes = {}
+    for box_type, box_start, box_end in _iter_boxes(data, start, end):
+        boxes.setdefault(box_type, (box_start, box_end))
+    return boxes
+
+
+def _iter_boxes(
+    data: mmap.mmap, start: int, end: int
+) -> Iterator[Tuple[bytes, int, int]]:
+    position = start
+    while position + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, position)
+        header_size = 8
+        if size == 1:
+            (size,) = struct.unpack_from('>Q', data, position + 8)
+            header_size = 16
+        elif size == 0:
+            # The box extends to the end of its parent
+            size = end - position
+
+        if size < header_size or position + size > end:
+            raise ValueError('Invalid box size.')
+
+        yield box_type, position + header_size, position + size
+        position += size
+
+
+_probes: Dict[str, Callable[[mmap.mmap], List[TrackInfo]]] = {
+    '.mkv': _probe_matroska,
+    '.mka': _probe_matroska,
+    '.mks': _probe_matroska,
+    '.webm': _probe_matroska,
+    '.mp4': _probe_mp4,
+    '.m4v': _probe_mp4,
+    '.m4a': _probe_mp4,
+}
@@ -0,0 +1,145 @@
+import os
+import re
+from pathlib import Path
+from typing import Iterator, List, Optional, Pattern, Tuple, Union
+
+# A pattern made of plain characters and escaped punctuation only, e.g.
+# `PSA` or `\.mkv`, which can be searched as a plain substring
+_literal_pattern = re.compile(r'(?:[^.^$*+?{}\[\]\\|()]|\\[^\w\s])*')
+_sample_directory_pattern = re.compile(r'^samples?$', re.IGNORECASE)
+_sample_file_pattern = re.compile(r'(?:^|[\W_])sample$', re.IGNORECASE)
+
+
+class PatternSet:
+    """
+    A precompiled set of file search patterns, finds the index of the
+    first pattern which matches a text.
+
+    Plain string patterns are searched as substrings, other ones are
+    compiled once and also combined into a single pattern which rejects
+    texts matching none of them in one pass.
+    """
+
+    def __init__(self, patterns: List[str]) -> None:
+        """
+        Initializes PatternSet.
+
+        Parameters
+        ----------
+        patterns:
+            Regular expression patterns in order of priority
+        """
+        self._matchers: List[Union[str, Pattern]] = []
+        for pattern in patterns:
+            if _literal_pattern.fullmatch(pattern) is not None:
+                self._matchers.append(re.sub(r'\\(.)', r'\1', pattern))
+            else:
+                self._matchers.append(re.compile(pattern))
+
+        regex_patterns = [
+            m.pattern for m in self._matchers if not isinstance(m, str)
+        ]
+        self._combined_pattern: Optional[Pattern] = None
+        # Only plain string patterns, or a single regex one, would not
+        # benefit from a combined pattern
+        if len(regex_patterns) > 1:
+            try:
+                self._combined_pattern = re.compile(
+                    '|'.join(f'(?:{p})' for p in regex_patterns)
+                )
+            except re.error:
+                # Patterns with group references or global flags can not
+                # be combined
+                pass
+
+    def match(self, text: str) -> Optional[int]:
+        """
+        Finds the first pattern which matches a text.
+
+        Parameters
+        ----------
+        text:
+            The text to search patterns in
+
+        Returns
+        -------
+        Index of the first matching pattern, or `None` if none of them
+        match
+        """
+        regex_may_match = (
+            self._combined_pattern is None
+            or self._combined_pattern.search(text) is not None
+        )
+        for i, matcher in enumerate(self._matchers):
+            if isinstance(matcher, str):
+                if matcher in text:
+                    return i
+            elif regex_may_match and matcher.search(text) is not None:
+                return i
+
+        return None
+
+
+def scan_directory(
+    directory: Path,
+    pattern_set: PatternSet,
+    suffix_pattern: Pattern,
+    recursive: bool = False,
+) -> Iterator[Tuple[os.DirEntry, int]]:
+    """
+    Scans a directory for files which match a pattern set.
+
+    Parameters
+    ----------
+    directory:
+        The directory to scan
+
+    pattern_set:
+        File search patterns, searched in the whole file path
+
+    suffix_pattern:
+        Pattern of acceptable file suffixes
+
+    recursive:
+        Whether to scan subdirectories too, e.g. `Subs`. Hidden, sample
+        and edited directories are skipped.
+
+    Returns
+    -------
+    An iterator of matched directory entries, each with its stat result
+    cached, along with index of the matched pattern. Sample files, e.g.
+    `sample.mkv`, are skipped.
+    """
+    with os.scandir(directory) as entries:
+        subdirectories = []
+        for entry in entries:
+            if entry.is_dir():
+                if recursive and not _is_pruned(entry.name):
+                    subdirectories.append(entry.path)
+                continue
+
+            if suffix_pattern.search(entry.name) is None:
+                continue
+
+            stem = os.path.splitext(entry.name)[0]
+            if _sample_file_pattern.search(stem) is not None:
+                continue
+
+            i = pattern_set.match(entry.path)
+            if i is not None:
+                # Caches stat result on the entry
+                entry.stat()
+                yield entry, i
+
+    for subdirectory in sorted(subdirectories):
+        yield from scan_directory(
+            Path(subdirectory), pattern_set, suffix_pattern, recursive
+        )
+
+
+def _is_pruned(directory_name: str) -> bool:
+    return (
+        directory_name.startswith('.')
+        or directory_name.endswith(' Edited')
+        or _sample_directory_pattern.match(directory_name) is not None
+    )
@@ -0,0 +1,359 @@
+import copy
+import random
+import threading
+import time
+from concurrent.futures import Future
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from medicure.cache import TMDBCache
+
+
+class RateLimiter:
+    """
+    A thread-safe token bucket rate limiter
+    """
+
+    def __init__(self, rate: float = 40, capacity: float = 40) -> None:
+        """
+        Initializes rate limiter.
+
+        Parameters
+        ----------
+        rate:
+            Number of requests allowed per second
+
+        capacity:
+            Maximum number of requests allowed in a burst
+        """
+        assert rate > 0, '`rate` should be a positive number.'
+        assert capacity >= 1, '`capacity` should be at least 1.'
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._throttled = 0
+        self._retried = 0
+        self._wait_time = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Blocks until a request is allowed.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self._capacity,
+                self._tokens + (now - self._updated_at) * self._rate,
+            )
+            self._updated_at = now
+            # Tokens are reserved, so waiting callers are served in turn
+            self._tokens -= 1
+            wait = max(-self._tokens / self._rate, self._paused_until - now, 0)
+            self._wait_time += wait
+
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds: float, throttled: bool = True) -> None:
+        """
+        Stops allowing requests for a while, eg: when TMDB throttles.
+
+        Parameters
+        ----------
+        seconds:
+            Number of seconds to stop allowing requests
+
+        throttled:
+            Whether TMDB has throttled a request, otherwise a failed
+            request is backed off before being retried
+        """
+        with self._lock:
+            if throttled:
+                self._throttled += 1
+            else:
+                self._retried += 1
+            self._paused_until = max(
+                self._paused_until, time.monotonic() + seconds
+            )
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Gets rate limiter statistics.
+
+        Returns
+        -------
+        Number of throttled requests, number of other failed requests
+        which have been retried and total seconds waited
+        """
+        with self._lock:
+            return {
+                'throttled': self._throttled,
+                'retried': self._retried,
+                'wait_time': self._wait_time,
+            }
+
+
+# Shared by all TMDB clients, since TMDB limits requests per IP address
+_rate_limiter = RateLimiter()
+
+
+class TMDBClient:
+    """
+    A TMDB API client bound to an API key, which keeps connections
+    alive and coalesces identical in-flight requests.
+    """
+
+    base_url = 'https://api.themoviedb.org/3'
+    _retry_status_codes = (429, 500, 502, 503, 504)
+    # Maximum number of appended responses TMDB returns in a request
+    _max_appended_responses = 20
+
+    def __init__(
+        self,
+        api_key: str,
+        cache: Optional[TMDBCache] = None,
+        pool_size: int = 10,
+        timeout: float = 10,
+        rate_limiter: Optional[RateLimiter] = None,
+        max_retries: int = 5,
+        backoff: float = 0.5,
+    ) -> None:
+        """
+        Initializes TMDB client.
+
+        Parameters
+        ----------
+        api_key:
+            Your TMDB API key
+
+        cache:
+            The cache for TMDB responses
+
+        pool_size:
+            Maximum number of connections to keep alive
+
+        timeout:
+            Number of seconds to wait for TMDB to respond
+
+        rate_limiter:
+            The rate limiter for requests, if not given a rate limiter
+            shared by all clients is used.
+
+        max_retries:
+            Maximum number of retries for a throttled or failed request
+
+        backoff:
+            Base number of seconds to wait before retrying, it is
+            doubled and jittered for each retry unless TMDB gives a
+            `Retry-After` header.
+        """
+        self._api_key = api_key
+        self._cache = cache
+        self._timeout = timeout
+        self._rate_limiter = rate_limiter or _rate_limiter
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._session = requests.Session()
+        self._session.mount(
+            'https://',
+            HTTPAdapter(pool_connections=1, pool_maxsize=pool_size),
+        )
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+
+    def find(self, imdb_id: str) -> Dict[str, Any]:
+        """
+        Finds TMDB info by IMDb id.
+        """
+        return self.get(f'find/{imdb_id}', external_source='imdb_id')
+
+    def tvshow(self, tv_id: int) -> Dict[str, Any]:
+        """
+        Gets TMDB info of a TV show.
+        """
+        return self.get(f'tv/{tv_id}')
+
+    def season(self, tv_id: int, season_number: int) -> Dict[str, Any]:
+        """
+        Gets TMDB info of a TV show season.
+        """
+        return self.get(f'tv/{tv_id}/season/{season_number}')
+
+    def seasons(
+        self, tv_id: int, season_numbers: List[int]
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        Gets TMDB info of many seasons of a TV show, uncached seasons
+        are appended to TV show info requests, 20 seasons per request.
+
+        Parameters
+        ----------
+        tv_id:
+            TMDB id of the TV show
+
+        season_numbers:
+            The season numbers
+
+        Returns
+        -------
+        Info of each season by its number
+        """
+        seasons = {}
+        uncached_season_numbers = []
+        for season_number in dict.fromkeys(season_numbers):
+            season = None
+            if self._cache is not None:
+                season = self._cache.get(f'tv/{tv_id}/season/{season_number}')
+            if season is None:
+                uncached_season_numbers.append(season_number)
+            else:
+                seasons[season_number] = season
+
+        # Cache raises a proper error for seasons which are not cached
+        if self._cache is not None and self._cache.offline:
+            for season_number in uncached_season_numbers:
+                seasons[season_number] = self.season(tv_id, season_number)
+            return seasons
+
+        while uncached_season_numbers:
+            chunk = uncached_season_numbers[: self._max_appended_responses]
+            del uncached_season_numbers[: self._max_appended_responses]
+            params = {
+                'append_to_response': ','.join(f'season/{n}' for n in chunk)
+            }
+            appended_keys = {f'season/{n}' for n in chunk}
+            key = f'tv/{tv_id}?{urlencode(params)}'
+            tvshow = self._coalesce(
+                key, lambda: self._request(f'tv/{tv_id}', params)
+            )
+            for season_number in chunk:
+                # TMDB leaves out appended seasons which do not exist
+                if f'season/{season_number}' not in tvshow:
+                    raise LookupError(
+                        f'Season {season_number} of TV show {tv_id} was not '
+                        'found on TMDB.'
+                    )
+
+                season = tvshow[f'season/{season_number}']
+                seasons[season_number] = season
+                if self._cache is not None:
+                    self._cache.set(
+                        f'tv/{tv_id}/season/{season_number}', season
+                    )
+
+            # The rest is the TV show info itself
+            if self._cache is not None:
+                self._cache.set(
+                    f'tv/{tv_id}',
+                    {
+                        k: v
+                        for k, v in tvshow.items()
+                        if k not in appended_keys
+                    },
+                )
+
+        return seasons
+
+    def get(self, path: str, **params: Any) -> Dict[str, Any]:
+        """
+        Requests TMDB or its cache for a path.
+
+        Parameters
+        ----------
+        path:
+            The TMDB API path eg: `tv/60574`
+
+        params:
+            Query parameters of the request
+
+        Returns
+        -------
+        The response
+        """
+        key = f'{path}?{urlencode(sorted(params.items()))}' if params else path
+
+        def fetch() -> Dict[str, Any]:
+            return self._coalesce(key, lambda: self._request(path, params))
+
+        if self._cache is None:
+            return fetch()
+        return self._cache.get_or_fetch(key, fetch)
+
+    def _coalesce(
+        self, key: str, fetch: Callable[[], Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        with self._lock:
+            future = self._in_flight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = self._in_flight[key] = Future()
+
+        # Another thread is requesting the same thing, waits for it.
+        # Each caller gets its own copy of the shared response.
+        if not is_leader:
+            return copy.deepcopy(future.result())
+
+        try:
+            response = fetch()
+            future.set_result(response)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+        return copy.deepcopy(response)
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        """
+        The rate limiter of requests
+        """
+        return self._rate_limiter
+
+    def _request(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        for retry in range(self._max_retries + 1):
+            self._rate_limiter.acquire()
+            response = self._session.get(
+                f'{self.base_url}/{path}',
+                params={**params, 'api_key': self._api_key},
+                timeout=self._timeout,
+            )
+            if (
+                response.status_code not in self._retry_status_codes
+                or retry == self._max_retries
+            ):
+                break
+
+            delay = self._get_retry_after(response)
+            if delay is None:
+                delay = random.uniform(0, self._backoff * 2**retry)
+            self._rate_limiter.pause(delay, response.status_code == 429)
+
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    def _get_retry_after(response: requests.Response) -> Optional[float]:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is None:
+            return None
+        try:
+            return max(float(retry_after), 0)
+        except ValueError:
+            pass
+        try:
+            return max(
+                parsedate_to_datetime(retry_after).timestamp() - time.time(),
+                0,
+            )
+        except (TypeError, ValueError):
+            return None
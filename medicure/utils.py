@@ -1,8 +1,69 @@
+import os
 import re
+import shutil
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
-import tmdbsimple as tmdb
+from medicure.tmdb_client import TMDBClient
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows
+    fcntl = None
+
+_nonpath_translation = str.maketrans(':/', '  ')
+# Linux ioctl request for cloning a file, see ioctl_ficlone(2)
+_ficlone = 0x40049409
+
+
+def clone_file(source: Path, destination: Path) -> bool:
+    """
+    Clones a file with copy-on-write if the file system supports it
+    e.g. Btrfs and XFS, otherwise copies it.
+
+    Returns
+    -------
+    Whether the file has been cloned without copying its data
+    """
+    if _reflink(source, destination):
+        return True
+
+    shutil.copyfile(source, destination)
+    return False
+
+
+def link_file(source: Path, destination: Path) -> bool:
+    """
+    Clones a file with copy-on-write if the file system supports it,
+    otherwise hardlinks it.
+
+    Returns
+    -------
+    Whether the file has been cloned or hardlinked, nothing is created
+    if neither is possible
+    """
+    if _reflink(source, destination):
+        return True
+
+    os.remove(destination)
+    try:
+        os.link(source, destination)
+        return True
+    except OSError:
+        return False
+
+
+def _reflink(source: Path, destination: Path) -> bool:
+    with open(source, 'rb') as sf, open(destination, 'wb') as df:
+        if fcntl is None:
+            return False
+
+        try:
+            fcntl.ioctl(df.fileno(), _ficlone, sf.fileno())
+            return True
+        except OSError:
+            return False
 
 
 def extract_episode_number(file_name: Path) -> int:
@@ -20,49 +81,77 @@ def extract_episode_number(file_name: Path) -> int:
 def get_movie_name(
     tmdb_find_info: Optional[Dict[str, Any]] = None,
     imdb_id: Optional[str] = None,
+    tmdb_client: Optional[TMDBClient] = None,
 ) -> str:
     """
     Gets correct movie name
     """
-    tmdb_find_info = _validate_tmdb_info(tmdb_find_info, imdb_id)
+    tmdb_find_info = _validate_tmdb_info(tmdb_find_info, imdb_id, tmdb_client)
     movie = tmdb_find_info['movie_results'][0]
     title = _escape_nonpath_characters(movie['title'])
     release_year = movie['release_date'][:4]
     return f'{title} - {release_year}'
 
 
-def get_tvshow_info(
-    season_number: int,
+def get_tvshow_seasons_info(
+    season_numbers: List[int],
+    tmdb_client: TMDBClient,
     tmdb_find_info: Optional[Dict[str, Any]] = None,
     imdb_id: Optional[str] = None,
-) -> Tuple[str, str, Dict[str, Any]]:
+) -> List[Tuple[str, str, Dict[str, Any]]]:
     """
-    Gets correct TV show info
+    Gets correct TV show info of many seasons with as few requests as
+    possible
     """
-    tmdb_find_info = _validate_tmdb_info(tmdb_find_info, imdb_id)
+    tmdb_find_info = _validate_tmdb_info(tmdb_find_info, imdb_id, tmdb_client)
     tvshow = tmdb_find_info['tv_results'][0]
     name = _escape_nonpath_characters(tvshow['name'])
-    season = tmdb.TV_Seasons(tvshow['id'], season_number).info()
-    season_name = _escape_nonpath_characters(season['name'])
-    for episode in season['episodes']:
-        episode['name'] = _escape_nonpath_characters(episode['name'])
+    seasons = tmdb_client.seasons(tvshow['id'], season_numbers)
+    tvshow_infos = []
+    for season_number in season_numbers:
+        season = seasons[season_number]
+        season_name = _escape_nonpath_characters(season['name'])
+        for episode in season['episodes']:
+            episode['name'] = _escape_nonpath_characters(episode['name'])
+        tvshow_infos.append((name, season_name, season))
+
+    return tvshow_infos
+
 
-    return name, season_name, season
+def warm_tmdb_cache(imdb_ids: List[str], tmdb_client: TMDBClient) -> None:
+    """
+    Caches TMDB info needed for treating the given IMDb ids, for TV
+    shows info of all seasons are cached.
+    """
+    for imdb_id in imdb_ids:
+        tmdb_find_info = tmdb_client.find(imdb_id)
+        if tmdb_find_info['tv_results']:
+            tv_id = tmdb_find_info['tv_results'][0]['id']
+            tmdb_client.seasons(
+                tv_id,
+                [
+                    season['season_number']
+                    for season in tmdb_client.tvshow(tv_id)['seasons']
+                ],
+            )
 
 
 def _validate_tmdb_info(
     tmdb_find_info: Optional[Dict[str, Any]],
     imdb_id: Optional[str],
+    tmdb_client: Optional[TMDBClient] = None,
 ) -> Dict[str, Any]:
     assert (
         tmdb_find_info is not None or imdb_id is not None
     ), 'Both `tmdb_find_info` and `imdb_id` cannot ne `None`.'
 
     if tmdb_find_info is None:
-        tmdb_find_info = tmdb.Find(imdb_id).info(external_source='imdb_id')
+        if tmdb_client is None:
+            raise ValueError('`tmdb_client` is needed for finding `imdb_id`.')
+        tmdb_find_info = tmdb_client.find(imdb_id)
 
     return tmdb_find_info
 
 
 def _escape_nonpath_characters(string: str) -> str:
-    return string.translate(str.maketrans(':/', '  '))
+    return string.translate(_nonpath_translation)
@@ -0,0 +1,46 @@
+from pathlib import Path
+
+from typer.testing import CliRunner
+
+from medicure.cli.base import app
+from medicure.cli.utils import load_probe_cache, load_tmdb_cache
+from medicure.data_structures import TrackInfo
+from tests.parameterize import *
+
+
+def test_cache_stats(cli_runner: CliRunner, tmp_path: Path) -> None:
+    path = tmp_path / 'file.mkv'
+    path.write_bytes(b'')
+    probe_cache = load_probe_cache()
+    probe_cache.get(path)
+    probe_cache.set(path, [TrackInfo('General')])
+    probe_cache.get(path)
+
+    result = cli_runner.invoke(app, ('cache', 'stats'))
+    assert result.exit_code == 0
+    assert 'Entries: 1' in result.output
+    assert 'Hits: 1' in result.output
+    assert 'Misses: 1' in result.output
+    assert 'Hit rate: 50.0%' in result.output
+
+
+def test_cache_clear(cli_runner: CliRunner, tmp_path: Path) -> None:
+    path = tmp_path / 'file.mkv'
+    path.write_bytes(b'')
+    load_probe_cache().set(path, [TrackInfo('General')])
+
+    result = cli_runner.invoke(app, ('cache', 'clear'))
+    assert result.exit_code == 0
+    assert 'Your cache has been cleared successfully.' in result.output
+    assert load_probe_cache().stats()['entries'] == 0
+
+
+def test_cache_warm(cli_runner: CliRunner) -> None:
+    cli_runner.invoke(app, ('save', 'tmdb-info', tmdb_api_key))
+    result = cli_runner.invoke(
+        app, ('cache', 'warm', movie_imdb_id, tvshow_imdb_id)
+    )
+    assert result.exit_code == 0
+    assert 'TMDB info has been cached successfully.' in result.output
+    # Find info of both, TV show info and its three seasons
+    assert load_tmdb_cache().stats()['entries'] == 6
@@ -1,4 +1,5 @@
 import json
+from pathlib import Path
 from typing import Any, List, Tuple
 
 import pytest
@@ -6,9 +7,11 @@ from typer.testing import CliRunner
 from varname import nameof
 
 from medicure.cli.base import app
+from medicure.core import Medicure
 from tests.cli.utils import get_flag_args
 from tests.parameterize import *
 from tests.utils import (
+    mock_mkvmerge,
     validate_movie_media_file,
     validate_movie_subtitle_file,
     validate_tvshow_media_files,
@@ -385,3 +388,149 @@ def test_treat_media_with_invalid_dubbing_suppliers(
     # rich-click affects the exit codes
     assert result.exit_code == 0
     assert output in result.output
+
+
+def test_treat_batch(
+    cli_runner: CliRunner, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    mock_mkvmerge(monkeypatch)
+    entries = [
+        {
+            'kind': 'media',
+            'imdb_id': movie_imdb_id,
+            'file_search_patterns': media_file_search_patterns,
+            'video_language_code': video_language_code,
+            'video_source': video_source,
+            'video_release_format': video_release_format,
+            'dubbing_suppliers': [['original', 0, video_language_code]],
+        },
+        {
+            'kind': 'subtitle',
+            'imdb_id': tvshow_imdb_id,
+            'file_search_patterns': subtitle_file_search_patterns,
+            'language_code': subtitle_language_code,
+        },
+    ]
+    result = cli_runner.invoke(
+        app,
+        ('treat', 'batch', '-'),
+        input='\n'.join(json.dumps(entry) for entry in entries),
+    )
+    # rich-click affects the exit codes
+    assert result.exit_code == 0
+    first, second = map(json.loads, result.output.splitlines())
+    assert first['succeeded']
+    assert not second['succeeded']
+    assert second['error'] == (
+        '`season_number` has not been given for a TV show.'
+    )
+
+
+def test_treat_batch_with_seasons(
+    cli_runner: CliRunner, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    mock_mkvmerge(monkeypatch)
+    entry = {
+        'kind': 'subtitle',
+        'imdb_id': tvshow_imdb_id,
+        'file_search_patterns': subtitle_file_search_patterns,
+        'language_code': subtitle_language_code,
+        'seasons': '5-6',
+    }
+    result = cli_runner.invoke(
+        app, ('treat', 'batch', '-'), input=json.dumps(entry)
+    )
+    assert result.exit_code == 0
+    batch_result = json.loads(result.output.splitlines()[-1])
+    assert batch_result['succeeded']
+    assert len(batch_result['outputs']) == 7
+
+
+@pytest.mark.parametrize(
+    'seasons, correct_season_numbers',
+    [
+        ('5-6', [5, 6]),
+        ('5,6', [5, 6]),
+        ('4,5-6', [4, 5, 6]),
+        ('5-6,5', [5, 6]),
+        ('all', 'all'),
+    ],
+)
+def test_treat_tvshow_with_seasons(
+    seasons: str,
+    correct_season_numbers: Any,
+    cli_runner: CliRunner,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    season_numbers = []
+
+    def treat_subtitle_mock(self: Any, *args: Any) -> None:
+        season_numbers.append(args[6])
+
+    monkeypatch.setattr(Medicure, 'treat_subtitle', treat_subtitle_mock)
+    result = cli_runner.invoke(
+        app,
+        (
+            'treat',
+            'subtitle',
+            tvshow_imdb_id,
+            str(subtitle_file_search_patterns),
+            subtitle_language_code,
+            '--seasons',
+            seasons,
+        ),
+    )
+    assert result.exit_code == 0
+    assert season_numbers == [correct_season_numbers]
+
+
+def test_treat_tvshow_with_invalid_seasons(cli_runner: CliRunner) -> None:
+    result = cli_runner.invoke(
+        app,
+        (
+            'treat',
+            'subtitle',
+            tvshow_imdb_id,
+            str(subtitle_file_search_patterns),
+            subtitle_language_code,
+            '--seasons',
+            '1-x',
+        ),
+    )
+    # rich-click affects the exit codes
+    assert result.exit_code == 0
+    assert (
+        "Error: Bad value for `seasons`. `'1-x'` is neither a list of "
+        'season numbers and ranges nor `all`.' in result.output
+    )
+
+
+def test_treat_tvshow_media_with_plan_out(
+    cli_runner: CliRunner, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    commands = mock_mkvmerge(monkeypatch)
+    plan_path = tmp_path / 'plan.json'
+    result = cli_runner.invoke(
+        app,
+        (
+            'treat',
+            'media',
+            tvshow_imdb_id,
+            str(media_file_search_patterns),
+            video_language_code,
+            video_source,
+            video_release_format,
+            json.dumps([['original', 0, video_language_code]]),
+            '6',
+            '--plan-out',
+            str(plan_path),
+        ),
+    )
+    assert result.exit_code == 0
+    assert commands == []
+    with open(plan_path, encoding='utf-8') as f:
+        assert len(json.load(f)['commands']) == 6
+
+    result = cli_runner.invoke(app, ('apply', str(plan_path), '-j', '2'))
+    assert result.exit_code == 0
+    assert len(commands) == 6
@@ -1,16 +1,15 @@
 import shutil
 
 import pytest
-import tmdbsimple as tmdb
 
+from medicure.tmdb_client import TMDBClient
 from tests.parameterize import *
-from tests.tmdb_mocks import FindMock, TVSeasonsMock
+from tests.tmdb_mocks import request_mock
 
 
 @pytest.fixture(autouse=True)
 def mock_tmdb(monkeypatch: pytest.MonkeyPatch):
-    monkeypatch.setattr(tmdb, 'Find', FindMock)
-    monkeypatch.setattr(tmdb, 'TV_Seasons', TVSeasonsMock)
+    monkeypatch.setattr(TMDBClient, '_request', request_mock)
 
 
 @pytest.fixture(autouse=True)
@@ -0,0 +1,131 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from medicure.async_core import AsyncMedicure
+from tests.parameterize import *
+
+pytestmark = pytest.mark.skipif(
+    os.name != 'posix', reason='Needs a POSIX script'
+)
+
+
+def _install_mkvmerge(
+    directory: Path, monkeypatch: pytest.MonkeyPatch, sleep: float
+) -> None:
+    # A fake mkvmerge which writes a part of the output, saves its pid
+    # next to it and sleeps before finishing the output
+    mkvmerge = directory / 'mkvmerge'
+    mkvmerge.write_text(
+        f'#!{sys.executable}\n'
+        'import json, os, sys, time\n'
+        'with open(sys.argv[1][1:], encoding="utf-8") as f:\n'
+        '    output = json.load(f)[1]\n'
+        'with open(output + ".pid", "w") as f:\n'
+        '    f.write(str(os.getpid()))\n'
+        'with open(output, "wb") as f:\n'
+        '    f.write(bytes(5))\n'
+        '    f.flush()\n'
+        f'    time.sleep({sleep})\n'
+        '    f.write(bytes(5))\n'
+    )
+    mkvmerge.chmod(0o755)
+    monkeypatch.setenv('PATH', f'{directory}{os.pathsep}{os.environ["PATH"]}')
+
+
+def _treat_media(medicure: AsyncMedicure, jobs: int) -> Any:
+    file_search_patterns, dubbing_suppliers, _ = treat_media_args[1][-1]
+    return medicure.treat_media(
+        tvshow_imdb_id,
+        file_search_patterns,
+        video_language_code,
+        video_source,
+        video_release_format,
+        dubbing_suppliers,
+        6,
+        jobs=jobs,
+    )
+
+
+def test_treat_tvshow_media(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _install_mkvmerge(tmp_path, monkeypatch, 0)
+    medicure = AsyncMedicure(tmdb_api_key, tvshows_directory=tvshows_directory)
+    mux_results = asyncio.run(_treat_media(medicure, 2))
+    assert len(mux_results) == 6
+    for mux_result in mux_results:
+        assert mux_result.exit_code == 0
+        assert mux_result.output.stat().st_size == 10
+
+
+def test_cancel_treating_tvshow_media(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _install_mkvmerge(tmp_path, monkeypatch, 30)
+    medicure = AsyncMedicure(tmdb_api_key, tvshows_directory=tvshows_directory)
+    pid_paths = []
+
+    async def treat_and_cancel() -> None:
+        task = asyncio.ensure_future(_treat_media(medicure, 2))
+        # Waits for both mkvmerge processes to start
+        while len(pid_paths) < 2:
+            await asyncio.sleep(0.05)
+            pid_paths[:] = tvshows_directory.rglob('*.pid')
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(treat_and_cancel())
+    for pid_path in pid_paths:
+        # Processes have been terminated and partial outputs removed
+        with pytest.raises(ProcessLookupError):
+            os.kill(int(pid_path.read_text()), 0)
+        assert not pid_path.with_suffix('').exists()
+    # Commands which had not been started created no output
+    assert len(pid_paths) == 2
+    assert not list(tvshows_directory.rglob('* Edited/*.mkv'))
+
+
+def test_cancel_treating_tvshow_media_with_propedit(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _install_mkvmerge(tmp_path, monkeypatch, 30)
+    mkvpropedit = tmp_path / 'mkvpropedit'
+    mkvpropedit.write_text('#!/bin/sh\nexit 2\n')
+    mkvpropedit.chmod(0o755)
+    medicure = AsyncMedicure(tmdb_api_key, tvshows_directory=tvshows_directory)
+    pid_paths = []
+
+    async def treat_and_cancel() -> None:
+        task = asyncio.ensure_future(
+            medicure.treat_media(
+                tvshow_imdb_id,
+                media_file_search_patterns,
+                video_language_code,
+                video_source,
+                video_release_format,
+                [DubbingSupplier('original', 0, *[video_language_code] * 3)],
+                6,
+                jobs=2,
+                propedit=True,
+            )
+        )
+        # mkvpropedit fails, so both commands fall back to mkvmerge
+        while len(pid_paths) < 2:
+            await asyncio.sleep(0.05)
+            pid_paths[:] = tvshows_directory.rglob('*.pid')
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(treat_and_cancel())
+    for pid_path in pid_paths:
+        with pytest.raises(ProcessLookupError):
+            os.kill(int(pid_path.read_text()), 0)
+        assert not pid_path.with_suffix('').exists()
+    assert not list(tvshows_directory.rglob('* Edited/*.mkv'))
@@ -0,0 +1,273 @@
+import json
+import os
+import sqlite3
+import subprocess
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from medicure.cache import ProbeCache, TMDBCache
+from medicure.core import Medicure
+from medicure.data_structures import FileInfo, TrackInfo
+from medicure.prober import MkvmergeProber, NativeProber
+from tests.parameterize import *
+from tests.utils import mock_mkvmerge
+
+_tracks = [
+    TrackInfo('General'),
+    TrackInfo('Audio', 1, 'TinyMoviez.co', 'fa', ['Persian', 'fa', 'per']),
+]
+_tracks_size = len(json.dumps([asdict(track) for track in _tracks]).encode())
+
+
+@pytest.fixture
+def probe_cache(tmp_path: Path) -> ProbeCache:
+    # Tracks info of two files fit in it
+    return ProbeCache(
+        tmp_path / 'probe_cache.sqlite3', max_size=2 * _tracks_size
+    )
+
+
+def _create_files(directory: Path, count: int) -> List[Path]:
+    paths = [directory / f'{i}.mka' for i in range(count)]
+    for path in paths:
+        path.write_bytes(b'')
+    return paths
+
+
+def test_probe_cache_hit_and_miss(
+    probe_cache: ProbeCache, tmp_path: Path
+) -> None:
+    (path,) = _create_files(tmp_path, 1)
+    assert probe_cache.get(path) is None
+    probe_cache.set(path, _tracks)
+    assert probe_cache.get(path) == _tracks
+    stats = probe_cache.stats()
+    assert (stats['entries'], stats['hits'], stats['misses']) == (1, 1, 1)
+
+
+def test_probe_cache_with_changed_file(
+    probe_cache: ProbeCache, tmp_path: Path
+) -> None:
+    (path,) = _create_files(tmp_path, 1)
+    probe_cache.set(path, _tracks)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert probe_cache.get(path) is None
+
+
+def test_probe_cache_eviction(probe_cache: ProbeCache, tmp_path: Path) -> None:
+    first, second, third = _create_files(tmp_path, 3)
+    probe_cache.set(first, _tracks)
+    probe_cache.set(second, _tracks)
+    # Makes the second file the least recently used one
+    probe_cache.get(first)
+    probe_cache.set(third, _tracks)
+    assert probe_cache.get(second) is None
+    assert probe_cache.get(first) == _tracks
+    assert probe_cache.get(third) == _tracks
+    assert probe_cache.stats()['evictions'] == 1
+
+
+def test_probe_cache_eviction_by_size(
+    probe_cache: ProbeCache, tmp_path: Path
+) -> None:
+    first, second, third = _create_files(tmp_path, 3)
+    probe_cache.set(first, _tracks[:1])
+    probe_cache.set(second, _tracks[:1])
+    # Tracks info of the third file fills the cache on its own
+    large_tracks = _tracks * 2
+    probe_cache.set(third, large_tracks)
+    assert probe_cache.get(first) is None
+    assert probe_cache.get(second) is None
+    assert probe_cache.get(third) == large_tracks
+    assert probe_cache.stats()['evictions'] == 2
+
+
+def test_probe_cache_clear(probe_cache: ProbeCache, tmp_path: Path) -> None:
+    (path,) = _create_files(tmp_path, 1)
+    probe_cache.set(path, _tracks)
+    probe_cache.get(path)
+    probe_cache.clear()
+    stats = probe_cache.stats()
+    assert (stats['entries'], stats['hits'], stats['misses']) == (0, 0, 0)
+
+
+def test_probe_cache_many_files(tmp_path: Path) -> None:
+    probe_cache = ProbeCache(tmp_path / 'probe_cache.sqlite3')
+    paths = _create_files(tmp_path, 3)
+    statements: List[str] = []
+    probe_cache._connection.set_trace_callback(statements.append)
+    probe_cache.set_many(paths[:2], [_tracks, _tracks[1:]])
+    assert probe_cache.get_many(paths) == [_tracks, _tracks[1:], None]
+    # Each call is written in one transaction
+    assert statements.count('COMMIT') == 2
+    stats = probe_cache.stats()
+    assert (stats['entries'], stats['hits'], stats['misses']) == (2, 2, 1)
+
+
+def test_probe_cache_of_probers(
+    probe_cache: ProbeCache, tmp_path: Path
+) -> None:
+    (path,) = _create_files(tmp_path, 1)
+    probe_cache.set(path, _tracks, prober='native')
+    assert probe_cache.get(path, prober='mkvmerge') is None
+    assert probe_cache.get(path, prober='native') == _tracks
+
+
+def test_probe_cache_without_probers(tmp_path: Path) -> None:
+    path = tmp_path / 'probe_cache.sqlite3'
+    connection = sqlite3.connect(str(path))
+    connection.execute(
+        'CREATE TABLE probes (path TEXT PRIMARY KEY, size INTEGER, '
+        'mtime_ns INTEGER, inode INTEGER, tracks TEXT, accessed_at REAL)'
+    )
+    connection.execute("INSERT INTO probes VALUES ('a.mkv', 0, 0, 0, '[]', 0)")
+    connection.commit()
+    connection.close()
+    # Entries whose probe backend is not known are dropped
+    probe_cache = ProbeCache(path)
+    assert probe_cache.stats()['entries'] == 0
+    (media_path,) = _create_files(tmp_path, 1)
+    probe_cache.set(media_path, _tracks, prober='native')
+    assert probe_cache.get(media_path, prober='native') == _tracks
+
+
+def test_probe_with_mkvmerge_after_native_prober(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    identification = {
+        'container': {'recognized': True, 'supported': True},
+        'tracks': [
+            {'id': 0, 'type': 'audio', 'properties': {'language': 'per'}}
+        ],
+    }
+
+    def run_mock(args: List[str], **kwargs: Any) -> Any:
+        stdout = json.dumps(identification)
+        return subprocess.CompletedProcess(args, 0, stdout)
+
+    monkeypatch.setattr(subprocess, 'run', run_mock)
+    probe_cache = ProbeCache(tmp_path / 'probe_cache.sqlite3')
+    path = sorted((movies_directory / 'The Batman - 2022').iterdir())[0]
+    native_tracks, mkvmerge_tracks = [
+        Medicure(tmdb_api_key, probe_cache=probe_cache, prober=prober)._probe(
+            [FileInfo(path, 0)]
+        )[0]
+        for prober in (NativeProber(), MkvmergeProber())
+    ]
+    assert native_tracks != mkvmerge_tracks
+    assert [(t.track_type, t.track_id) for t in mkvmerge_tracks] == [
+        ('Audio', 1)
+    ]
+    assert probe_cache.stats()['entries'] == 2
+
+
+def test_treat_media_with_probe_cache(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    mock_mkvmerge(monkeypatch)
+    probe_cache = ProbeCache(tmp_path / 'probe_cache.sqlite3')
+    medicure = Medicure(
+        tmdb_api_key,
+        tvshows_directory=tvshows_directory,
+        probe_cache=probe_cache,
+    )
+    for _ in range(2):
+        medicure.treat_media(
+            tvshow_imdb_id,
+            [r'PSA\.AM', 'TinyMoviez'],
+            video_language_code,
+            video_source,
+            video_release_format,
+            [DubbingSupplier('original', 0, video_language_code)],
+            6,
+        )
+
+    stats = probe_cache.stats()
+    assert (stats['entries'], stats['hits'], stats['misses']) == (12, 12, 12)
+
+
+def test_tmdb_cache_hit_and_miss(tmp_path: Path) -> None:
+    fetches = []
+
+    def fetch() -> Dict[str, Any]:
+        fetches.append(None)
+        return {'name': 'Peaky Blinders'}
+
+    tmdb_cache = TMDBCache(tmp_path / 'tmdb_cache.sqlite3')
+    for _ in range(2):
+        assert tmdb_cache.get_or_fetch('tv/60574', fetch) == {
+            'name': 'Peaky Blinders'
+        }
+    # Persistent cache is used in a new process
+    tmdb_cache = TMDBCache(tmp_path / 'tmdb_cache.sqlite3')
+    tmdb_cache.get_or_fetch('tv/60574', fetch)
+    assert len(fetches) == 1
+    stats = tmdb_cache.stats()
+    assert (stats['entries'], stats['hits'], stats['misses']) == (1, 2, 1)
+
+
+def test_tmdb_cache_counters_in_batches(tmp_path: Path) -> None:
+    tmdb_cache = TMDBCache(tmp_path / 'tmdb_cache.sqlite3')
+    tmdb_cache.get_or_fetch('tv/60574', dict)
+    statements: List[str] = []
+    tmdb_cache._connection.set_trace_callback(statements.append)
+    for _ in range(150):
+        tmdb_cache.get('tv/60574')
+    # Hits in memory are written once per batch
+    assert statements.count('COMMIT') == 1
+    assert tmdb_cache.stats()['hits'] == 150
+
+
+def test_tmdb_cache_with_expired_response(tmp_path: Path) -> None:
+    fetches = []
+    tmdb_cache = TMDBCache(tmp_path / 'tmdb_cache.sqlite3', ttl=0)
+    for _ in range(2):
+        tmdb_cache.get_or_fetch('tv/60574', lambda: fetches.append(None))
+    assert len(fetches) == 2
+
+
+def test_tmdb_cache_offline(tmp_path: Path) -> None:
+    path = tmp_path / 'tmdb_cache.sqlite3'
+    TMDBCache(path, ttl=0).get_or_fetch('tv/60574', lambda: {'id': 60574})
+    tmdb_cache = TMDBCache(path, ttl=0, offline=True)
+    # Expired responses are used in offline mode
+    assert tmdb_cache.get_or_fetch('tv/60574', dict) == {'id': 60574}
+    with pytest.raises(
+        LookupError,
+        match='No cached TMDB response found for `tv/1` in offline mode.',
+    ):
+        tmdb_cache.get_or_fetch('tv/1', dict)
+
+
+def test_treat_with_tmdb_cache(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    mock_mkvmerge(monkeypatch)
+    tmdb_cache = TMDBCache(tmp_path / 'tmdb_cache.sqlite3')
+    medicure = Medicure(
+        tmdb_api_key,
+        tvshows_directory=tvshows_directory,
+        tmdb_cache=tmdb_cache,
+    )
+    medicure.treat_media(
+        tvshow_imdb_id,
+        media_file_search_patterns,
+        video_language_code,
+        video_source,
+        video_release_format,
+        [DubbingSupplier('original', 0, video_language_code)],
+        6,
+    )
+    medicure.treat_subtitle(
+        tvshow_imdb_id,
+        subtitle_file_search_patterns,
+        subtitle_language_code,
+        season_number=6,
+    )
+    stats = tmdb_cache.stats()
+    # TV show info is cached along with its season
+    assert (stats['entries'], stats['hits'], stats['misses']) == (3, 2, 2)
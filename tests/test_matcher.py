@@ -0,0 +1,171 @@
+from typing import Dict, List, Optional
+
+import pytest
+
+from medicure.data_structures import DubbingSupplier, TrackInfo, TrackKind
+from medicure.languages import describe_language, normalize_language
+from medicure.matcher import SupplierMatcher
+
+
+def _track(
+    track_type: str, language_code: Optional[str], title: Optional[str] = None
+) -> TrackInfo:
+    language, other_language = describe_language(language_code)
+    return TrackInfo(track_type, 2, title, language, other_language)
+
+
+@pytest.mark.parametrize(
+    'language, normalized_language',
+    [
+        ('fa', 'fa'),
+        ('per', 'fa'),
+        ('fas', 'fa'),
+        ('Persian', 'fa'),
+        ('PT-br', 'pt-br'),
+        ('Luba-Katanga', 'lu'),
+        ('tlh', None),
+    ],
+)
+def test_normalize_language(
+    language: str, normalized_language: Optional[str]
+) -> None:
+    assert normalize_language(language) == normalized_language
+
+
+@pytest.mark.parametrize(
+    'dubbing_suppliers, track, selected, index',
+    [
+        # ISO 639-2/B and T codes and English names are the same
+        (
+            [DubbingSupplier('A', 0, 'per', 'fas')],
+            _track('Audio', 'per'),
+            {},
+            0,
+        ),
+        (
+            [DubbingSupplier('A', 0, 'per', 'per')],
+            _track('Audio', 'fa'),
+            {},
+            0,
+        ),
+        (
+            [DubbingSupplier('A', 0, 'per', 'Persian')],
+            _track('Audio', 'fas'),
+            {},
+            0,
+        ),
+        # Another file, kind or language
+        (
+            [DubbingSupplier('A', 1, 'per', 'per')],
+            _track('Audio', 'fa'),
+            {},
+            None,
+        ),
+        (
+            [DubbingSupplier('A', 0, 'per', 'per')],
+            _track('Text', 'fa'),
+            {},
+            None,
+        ),
+        (
+            [DubbingSupplier('A', 0, 'per', 'eng')],
+            _track('Audio', 'fa'),
+            {},
+            None,
+        ),
+        # Only a supplier without a region matches all regions
+        (
+            [DubbingSupplier('A', 0, 'por', 'por')],
+            _track('Audio', 'pt-BR'),
+            {},
+            0,
+        ),
+        (
+            [DubbingSupplier('A', 0, 'por', 'pt-BR')],
+            _track('Audio', 'pt-PT'),
+            {},
+            None,
+        ),
+        # Unknown languages are searched in other representations
+        (
+            [DubbingSupplier('A', 0, 'tlh', 'tlh')],
+            _track('Audio', 'tlh'),
+            {},
+            0,
+        ),
+        # Undetermined languages only match suppliers without one
+        ([DubbingSupplier('A', 0, 'eng')], _track('Audio', 'und'), {}, 0),
+        (
+            [DubbingSupplier('A', 0, 'eng', 'eng')],
+            _track('Audio', None),
+            {},
+            None,
+        ),
+        # The first supplier which matches title and was not selected
+        (
+            [
+                DubbingSupplier('A', 0, 'per', 'per', None, 'A'),
+                DubbingSupplier('B', 0, 'per', 'per', None, r'B\d'),
+                DubbingSupplier('C', 0, 'per', 'per', None, r'\d'),
+            ],
+            _track('Audio', 'fa', 'B1'),
+            {},
+            1,
+        ),
+        (
+            [
+                DubbingSupplier('B', 0, 'per', 'per', None, r'B\d'),
+                DubbingSupplier('C', 0, 'per', 'tlh', None, r'\d'),
+                DubbingSupplier('D', 0, 'per', 'per', None, r'\d'),
+            ],
+            _track('Audio', 'fa', 'B1'),
+            {0: 1},
+            2,
+        ),
+        (
+            [DubbingSupplier('A', 0, 'per', 'per')],
+            _track('Audio', 'fa', 'A'),
+            {},
+            None,
+        ),
+    ],
+)
+def test_match_supplier(
+    dubbing_suppliers: List[DubbingSupplier],
+    track: TrackInfo,
+    selected: Dict[int, int],
+    index: Optional[int],
+) -> None:
+    kind = (
+        TrackKind.AUDIO if track.track_type == 'Audio' else TrackKind.SUBTITLE
+    )
+    matcher = SupplierMatcher(dubbing_suppliers)
+    # Candidates are cached, so matching again gives the same result
+    for _ in range(2):
+        assert matcher.match(0, kind, track, selected) == index
+
+
+def test_get_file_suppliers() -> None:
+    matcher = SupplierMatcher(
+        [
+            DubbingSupplier('original', 0, 'eng'),
+            DubbingSupplier('A', 1, 'per'),
+            DubbingSupplier('B', 0, 'per'),
+        ]
+    )
+    assert matcher.get_file_suppliers(0) == [0, 2]
+    assert matcher.get_file_suppliers(1) == [1]
+    assert matcher.get_file_suppliers(2) == []
+
+
+def test_match_all_suppliers() -> None:
+    matcher = SupplierMatcher(
+        [
+            DubbingSupplier('A', 0, 'per', 'per', None, r'\d'),
+            DubbingSupplier('B', 1, 'per', 'per'),
+            DubbingSupplier('C', 0, 'per', 'fas', None, r'B\d'),
+        ]
+    )
+    track = _track('Audio', 'fa', 'B1')
+    assert matcher.match_all(0, TrackKind.AUDIO, track) == [0, 2]
+    assert matcher.match_all(0, TrackKind.SUBTITLE, track) == []
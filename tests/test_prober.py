@@ -0,0 +1,252 @@
+import json
+import struct
+import subprocess
+from pathlib import Path
+from typing import Any, List, Optional
+
+import pytest
+from pymediainfo import MediaInfo
+
+from medicure.languages import describe_language
+from medicure.prober import (
+    MediaInfoProber,
+    MkvmergeProber,
+    NativeProber,
+    get_prober,
+    probe_tracks,
+)
+from tests.parameterize import movies_directory, tvshows_directory
+
+_matroska_paths = sorted(
+    path
+    for directory in (movies_directory, tvshows_directory)
+    for path in directory.rglob('*.mk[av]')
+)
+
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def _trak(
+    track_id: int,
+    handler_type: bytes,
+    language_code: str,
+    enabled: bool,
+    name: Optional[str] = None,
+) -> bytes:
+    packed_language = 0
+    for letter in language_code:
+        packed_language = (packed_language << 5) | (ord(letter) - 0x60)
+
+    tkhd = _box(
+        b'tkhd',
+        bytes([0, 0, 0, enabled])
+        + struct.pack('>IIII', 0, 0, track_id, 0)
+        + bytes(64),
+    )
+    mdhd = _box(
+        b'mdhd',
+        bytes(4) + struct.pack('>IIIIHH', 0, 0, 1000, 0, packed_language, 0),
+    )
+    hdlr = _box(b'hdlr', bytes(8) + handler_type + bytes(12) + b'\0')
+    payload = tkhd + _box(b'mdia', mdhd + hdlr)
+    if name is not None:
+        payload += _box(b'udta', _box(b'name', name.encode()))
+    return _box(b'trak', payload)
+
+
+@pytest.mark.parametrize(
+    'path', _matroska_paths, ids=[path.name for path in _matroska_paths]
+)
+def test_probe_matroska_tracks(path: Path) -> None:
+    tracks = probe_tracks(path)
+    correct_tracks = [
+        track
+        for track in MediaInfo.parse(path).tracks
+        if track.track_type != 'General'
+    ]
+    assert len(tracks) == len(correct_tracks)
+    for track, correct_track in zip(tracks, correct_tracks):
+        for field in [
+            'track_type',
+            'track_id',
+            'title',
+            'language',
+            'default',
+            'forced',
+        ]:
+            assert getattr(track, field) == getattr(correct_track, field)
+        if correct_track.other_language is not None:
+            assert set(track.other_language) <= set(
+                correct_track.other_language
+            )
+
+
+def test_probe_mp4_tracks(tmp_path: Path) -> None:
+    path = tmp_path / 'movie.mp4'
+    path.write_bytes(
+        _box(b'ftyp', b'isom' + bytes(4) + b'isom')
+        + _box(
+            b'moov',
+            _box(b'mvhd', bytes(100))
+            + _trak(1, b'vide', 'und', True)
+            + _trak(2, b'soun', 'eng', True, 'Stereo')
+            + _trak(3, b'sbtl', 'fas', False),
+        )
+        + _box(b'mdat', bytes(16))
+    )
+    tracks = probe_tracks(path)
+    assert [
+        (t.track_type, t.track_id, t.title, t.language, t.default)
+        for t in tracks
+    ] == [
+        ('Video', 1, None, None, None),
+        ('Audio', 2, 'Stereo', 'en', None),
+        ('Text', 3, None, 'fa', 'No'),
+    ]
+    assert 'per' in tracks[2].other_language
+
+
+@pytest.mark.parametrize(
+    'name, content',
+    [
+        ('empty.mkv', b''),
+        ('truncated.mkv', _matroska_paths[0].read_bytes()[:100]),
+        ('not_matroska.mkv', b'RIFF' + bytes(100)),
+        ('truncated.mp4', _box(b'moov', bytes(4))[:-2]),
+        ('subtitle.srt', b'1\n00:00:01,000 --> 00:00:02,000\nHi\n'),
+    ],
+)
+def test_probe_unsupported_tracks(
+    name: str, content: bytes, tmp_path: Path
+) -> None:
+    path = tmp_path / name
+    path.write_bytes(content)
+    assert probe_tracks(path) is None
+
+
+@pytest.mark.parametrize(
+    'code, language, other_language',
+    [
+        ('eng', 'en', ['English', 'en', 'eng']),
+        ('fas', 'fa', ['Persian', 'fa', 'per', 'fas']),
+        ('pt-BR', 'pt', ['Portuguese', 'pt', 'por', 'pt-BR']),
+        ('und', None, None),
+        (None, None, None),
+        ('tlh', 'tlh', ['tlh']),
+    ],
+)
+def test_describe_language(
+    code: Optional[str],
+    language: Optional[str],
+    other_language: Optional[List[str]],
+) -> None:
+    assert describe_language(code) == (language, other_language)
+
+
+def test_probe_with_mkvmerge(monkeypatch: pytest.MonkeyPatch) -> None:
+    identification = {
+        'container': {'recognized': True, 'supported': True},
+        'tracks': [
+            {
+                'id': 0,
+                'type': 'video',
+                'properties': {'language': 'und', 'default_track': True},
+            },
+            {
+                'id': 1,
+                'type': 'audio',
+                'properties': {
+                    'language': 'per',
+                    'language_ietf': 'fa',
+                    'track_name': 'TinyMoviez',
+                    'default_track': False,
+                    'forced_track': False,
+                },
+            },
+            {
+                'id': 2,
+                'type': 'subtitles',
+                'properties': {'language': 'eng', 'forced_track': True},
+            },
+        ],
+    }
+    runs = []
+
+    def run_mock(args: List[str], **kwargs: Any) -> Any:
+        runs.append(args)
+        stdout = json.dumps(identification)
+        return subprocess.CompletedProcess(args, 0, stdout)
+
+    monkeypatch.setattr(subprocess, 'run', run_mock)
+    paths = [Path(f'Show.S01E0{i}.mkv') for i in range(1, 9)]
+    all_tracks = MkvmergeProber(jobs=4).probe_many(paths)
+    assert [args[:2] for args in runs] == [['mkvmerge', '-J']] * 8
+    assert sorted(args[2] for args in runs) == [str(p) for p in paths]
+    assert len(all_tracks) == 8
+    assert [
+        (t.track_type, t.track_id, t.title, t.language, t.default, t.forced)
+        for t in all_tracks[0]
+    ] == [
+        ('Video', 1, None, None, 'Yes', 'No'),
+        ('Audio', 2, 'TinyMoviez', 'fa', 'No', 'No'),
+        ('Text', 3, None, 'en', 'No', 'Yes'),
+    ]
+    assert 'per' in all_tracks[0][1].other_language
+
+
+def test_probe_unrecognized_file_with_mkvmerge(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def run_mock(args: List[str], **kwargs: Any) -> Any:
+        identification = {'container': {'recognized': False}, 'tracks': []}
+        stdout = json.dumps(identification)
+        return subprocess.CompletedProcess(args, 2, stdout)
+
+    monkeypatch.setattr(subprocess, 'run', run_mock)
+    with pytest.raises(
+        RuntimeError, match='mkvmerge could not identify the file: a.nfo.'
+    ):
+        MkvmergeProber().probe(Path('a.nfo'))
+
+
+def test_native_and_mediainfo_probers() -> None:
+    path = movies_directory / 'The Batman - 2022'
+    paths = sorted(path.iterdir())
+    native_tracks = NativeProber().probe_many(paths)
+    mediainfo_tracks = MediaInfoProber().probe_many(paths)
+    for native, mediainfo in zip(native_tracks, mediainfo_tracks):
+        # Only tracks which are not General are read natively
+        assert [
+            (t.track_type, t.track_id)
+            for t in native
+            if t.track_type != 'General'
+        ] == [
+            (t.track_type, t.track_id)
+            for t in mediainfo
+            if t.track_type != 'General'
+        ]
+
+
+def test_minimal_mediainfo_prober() -> None:
+    paths = sorted(
+        path
+        for directory in (movies_directory, tvshows_directory)
+        for path in directory.rglob('*.*')
+    )
+    minimal_prober = MediaInfoProber()
+    full_prober = MediaInfoProber(minimal=False)
+    for path in paths:
+        assert minimal_prober.probe(path) == [
+            track
+            for track in full_prober.probe(path)
+            if track.track_type != 'General'
+        ]
+
+
+def test_get_prober() -> None:
+    assert isinstance(get_prober('mkvmerge'), MkvmergeProber)
+    assert get_prober('native', 2)._jobs == 2
+    with pytest.raises(AssertionError, match='`prober` should be either'):
+        get_prober('ffprobe')
@@ -0,0 +1,63 @@
+import re
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import pytest
+
+from medicure.scanner import PatternSet, scan_directory
+
+_suffix_pattern = re.compile(r'\.(mkv|mka|srt)$')
+
+
+@pytest.mark.parametrize(
+    'patterns, text, index',
+    [
+        (['PSA', 'TinyMoviez'], 'Show.S01E01.TinyMoviez.mka', 1),
+        (['PSA', 'TinyMoviez'], 'Show.S01E01.PSA.TinyMoviez.mka', 0),
+        (['PSA', 'TinyMoviez'], 'Show.S01E01.mka', None),
+        ([r'\.mkv', r'\.mka'], 'Show.S01E01.mka', 1),
+        ([r'\.mkv'], 'Show.S01E01_mkv', None),
+        ([r'E0\d\.mka', r'E1\d\.mka', 'PSA'], 'Show.S01E12.mka', 1),
+        ([r'E0\d\.mka', r'E1\d\.mka', 'PSA'], 'Show.S01E12.PSA.mkv', 2),
+        ([r'E0\d\.mka', r'E1\d\.mka'], 'Show.S01E22.mka', None),
+        # Can not be combined
+        ([r'(a)\1', r'(?i)psa'], 'Show.S01E01.Psa.mkv', 1),
+    ],
+)
+def test_pattern_set(
+    patterns: List[str], text: str, index: Optional[int]
+) -> None:
+    assert PatternSet(patterns).match(text) == index
+
+
+def test_scan_directory(tmp_path: Path) -> None:
+    for name in [
+        'Show.S01E01.mkv',
+        'Show.S01E01.srt',
+        'Show.S01E01.nfo',
+        'sample.mkv',
+        'Show.S01E01-sample.mkv',
+        'Subs/Show.S01E01.srt',
+        'Sample/Show.S01E01.mkv',
+        '.hidden/Show.S01E01.mkv',
+    ]:
+        path = tmp_path / name
+        path.parent.mkdir(exist_ok=True)
+        path.touch()
+
+    pattern_set = PatternSet([r'\.mkv', 'srt'])
+
+    def scan(recursive: bool) -> List[Tuple[str, int]]:
+        return sorted(
+            (Path(entry.path).relative_to(tmp_path).as_posix(), i)
+            for entry, i in scan_directory(
+                tmp_path, pattern_set, _suffix_pattern, recursive
+            )
+        )
+
+    assert scan(False) == [('Show.S01E01.mkv', 0), ('Show.S01E01.srt', 1)]
+    assert scan(True) == [
+        ('Show.S01E01.mkv', 0),
+        ('Show.S01E01.srt', 1),
+        ('Subs/Show.S01E01.srt', 1),
+    ]
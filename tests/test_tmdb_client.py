@@ -0,0 +1,184 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pytest
+import requests
+
+from medicure.cache import TMDBCache
+from medicure.tmdb_client import RateLimiter, TMDBClient
+from tests.parameterize import *
+from tests.tmdb_mocks import request_mock
+
+_request = TMDBClient._request
+
+
+def _create_response(
+    status_code: int,
+    content: Dict[str, Any],
+    retry_after: Optional[str] = None,
+) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response.url = f'{TMDBClient.base_url}/tv/60574'
+    response._content = json.dumps(content).encode()
+    if retry_after is not None:
+        response.headers['Retry-After'] = retry_after
+    return response
+
+
+@pytest.fixture
+def sleeps(monkeypatch: pytest.MonkeyPatch) -> List[float]:
+    sleeps = []
+    monkeypatch.setattr(time, 'sleep', sleeps.append)
+    return sleeps
+
+
+def test_tmdb_client_api_key(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(TMDBClient, '_request', _request)
+    monkeypatch.setattr(
+        requests.Session,
+        'get',
+        lambda self, url, params, timeout: _create_response(200, params),
+    )
+    first_client, second_client = TMDBClient('first'), TMDBClient('second')
+    assert first_client.get('tv/60574')['api_key'] == 'first'
+    assert second_client.get('tv/60574')['api_key'] == 'second'
+
+
+def test_tmdb_client_coalescing(monkeypatch: pytest.MonkeyPatch) -> None:
+    paths: List[str] = []
+    all_started = threading.Barrier(8)
+
+    def slow_request_mock(
+        self: TMDBClient, path: str, params: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        paths.append(path)
+        time.sleep(0.1)
+        return request_mock(self, path, params)
+
+    def get_season(client: TMDBClient) -> Dict[str, Any]:
+        all_started.wait()
+        return client.season(60574, 6)
+
+    monkeypatch.setattr(TMDBClient, '_request', slow_request_mock)
+    client = TMDBClient(tmdb_api_key)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        seasons = list(executor.map(get_season, [client] * 8))
+
+    assert paths == ['tv/60574/season/6']
+    assert all(season == seasons[0] for season in seasons)
+    # Each caller gets its own copy of the response
+    seasons[0]['name'] = ''
+    assert seasons[1]['name'] == 'Series 6'
+
+
+def test_tmdb_client_seasons(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    requests_params: List[Dict[str, Any]] = []
+
+    def many_seasons_request_mock(
+        self: TMDBClient, path: str, params: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        requests_params.append(params)
+        return {
+            'name': 'Peaky Blinders',
+            **{
+                appended_path: {'name': appended_path, 'episodes': []}
+                for appended_path in params['append_to_response'].split(',')
+            },
+        }
+
+    monkeypatch.setattr(TMDBClient, '_request', many_seasons_request_mock)
+    client = TMDBClient(
+        tmdb_api_key, TMDBCache(tmp_path / 'tmdb_cache.sqlite3')
+    )
+    seasons = client.seasons(60574, list(range(1, 26)))
+    assert list(seasons) == list(range(1, 26))
+    assert seasons[25]['name'] == 'season/25'
+    # TMDB returns at most 20 appended responses
+    appended_counts = [
+        len(params['append_to_response'].split(','))
+        for params in requests_params
+    ]
+    assert appended_counts == [20, 5]
+    # Changing a returned season changes no cached season
+    seasons[3]['name'] = ''
+
+    # All seasons and the TV show info itself are cached
+    requests_params.clear()
+    assert client.season(60574, 3)['name'] == 'season/3'
+    assert client.tvshow(60574) == {'name': 'Peaky Blinders'}
+    assert client.seasons(60574, [25, 3]) == {
+        25: seasons[25],
+        3: {'name': 'season/3', 'episodes': []},
+    }
+    assert requests_params == []
+
+
+def test_tmdb_client_missing_season() -> None:
+    client = TMDBClient(tmdb_api_key)
+    with pytest.raises(
+        LookupError, match='Season 9 of TV show 60574 was not found on TMDB.'
+    ):
+        client.seasons(60574, [6, 9])
+
+
+def test_rate_limiter(sleeps: List[float]) -> None:
+    rate_limiter = RateLimiter(rate=10, capacity=1)
+    for _ in range(3):
+        rate_limiter.acquire()
+
+    assert len(sleeps) == 2
+    assert rate_limiter.stats()['wait_time'] == pytest.approx(0.3, abs=0.01)
+
+
+@pytest.mark.parametrize('status_code', [429, 503])
+@pytest.mark.parametrize('retry_after', ['2', None])
+def test_tmdb_client_throttled(
+    retry_after: Optional[str],
+    status_code: int,
+    sleeps: List[float],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    responses = [
+        _create_response(status_code, {}, retry_after),
+        _create_response(200, {'name': 'Peaky Blinders'}),
+    ]
+    monkeypatch.setattr(TMDBClient, '_request', _request)
+    monkeypatch.setattr(
+        requests.Session,
+        'get',
+        lambda self, url, params, timeout: responses.pop(0),
+    )
+    client = TMDBClient(tmdb_api_key, rate_limiter=RateLimiter(), backoff=1)
+    assert client.tvshow(60574) == {'name': 'Peaky Blinders'}
+    stats = client.rate_limiter.stats()
+    # Only responses of too many requests are counted as throttled
+    assert stats['throttled'] == int(status_code == 429)
+    assert stats['retried'] == int(status_code != 429)
+    if retry_after is not None:
+        assert stats['wait_time'] == pytest.approx(2, abs=0.01)
+    else:
+        assert 0 <= stats['wait_time'] <= 1.01
+
+
+def test_tmdb_client_throttled_too_many_times(
+    sleeps: List[float], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(TMDBClient, '_request', _request)
+    monkeypatch.setattr(
+        requests.Session,
+        'get',
+        lambda self, url, params, timeout: _create_response(429, {}, '1'),
+    )
+    client = TMDBClient(
+        tmdb_api_key, rate_limiter=RateLimiter(), max_retries=2
+    )
+    with pytest.raises(requests.HTTPError, match='429'):
+        client.tvshow(60574)
+    assert client.rate_limiter.stats()['throttled'] == 2
@@ -1,10 +1,32 @@
-from typing import Any, List, Tuple
+import copy
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
 
 import pytest
 
+from medicure import core
+from medicure.cache import ProbeCache
 from medicure.core import Medicure
+from medicure.data_structures import (
+    InputPlan,
+    MuxCommand,
+    MuxResult,
+    TrackInfo,
+    TrackPlan,
+    TreatEvent,
+)
+from medicure.manifest import ManifestStore
+from medicure.muxer import mux
+from medicure.prober import MediaInfoProber, NativeProber, Prober
 from tests.parameterize import *
 from tests.utils import (
+    mock_mkvmerge,
     validate_movie_media_file,
     validate_movie_subtitle_file,
     validate_tvshow_media_files,
@@ -12,6 +34,11 @@ from tests.utils import (
 )
 
 
+def get_propedit_exit_code(arguments: List[str]) -> int:
+    # mkvpropedit fails and mkvmerge succeeds
+    return 0 if arguments[0] == '--output' else 2
+
+
 @pytest.mark.parametrize(*treat_media_args)
 def test_treat_movie_media(
     file_search_patterns: List[str],
@@ -30,6 +57,7 @@ def test_treat_movie_media(
     validate_movie_media_file(movie_imdb_id, correct_tracks, movies_directory)
 
 
+@pytest.mark.parametrize('jobs', [1, 4])
 @pytest.mark.parametrize(*season_info_args)
 @pytest.mark.parametrize(*treat_media_args)
 def test_treat_tvshow_media(
@@ -38,6 +66,7 @@ def test_treat_tvshow_media(
     file_search_patterns: List[str],
     dubbing_suppliers: List[DubbingSupplier],
     correct_tracks: List[Track],
+    jobs: int,
 ) -> None:
     medicure = Medicure(tmdb_api_key, tvshows_directory=tvshows_directory)
     medicure.treat_media(
@@ -48,6 +77,7 @@ def test_treat_tvshow_media(
         video_release_format,
         dubbing_suppliers,
         season_number,
+        jobs,
     )
     validate_tvshow_media_files(
         tvshow_imdb_id,
@@ -82,6 +112,7 @@ def test_treat_movie_subtitle(
     )
 
 
+@pytest.mark.parametrize('jobs', [1, 4])
 @pytest.mark.parametrize(*season_info_args)
 @pytest.mark.parametrize(*treat_subtitle_args)
 def test_treat_tvshow_subtitle(
@@ -89,6 +120,7 @@ def test_treat_tvshow_subtitle(
     available_episode_count: int,
     include_full_information: bool,
     suffix: str,
+    jobs: int,
 ):
     medicure = Medicure(tmdb_api_key, tvshows_directory=tvshows_directory)
     medicure.treat_subtitle(
@@ -99,6 +131,7 @@ def test_treat_tvshow_subtitle(
         subtitle_release_format,
         include_full_information,
         season_number,
+        jobs,
     )
     validate_tvshow_subtitle_files(
         tvshow_imdb_id,
@@ -215,3 +248,684 @@ def test_treat_tvshow_with_invalid_file_names(
             *extra_treat_args,
             4,
         )
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_treat_tvshow_media_with_failed_episodes(
+    jobs: int, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def get_exit_code(arguments: List[str]) -> int:
+        # Fails episodes 2 and 5 with mkvmerge's error exit code
+        output = arguments[1]
+        return 2 if any(f'S06E0{e}' in output for e in (2, 5)) else 0
+
+    mock_mkvmerge(monkeypatch, get_exit_code)
+    medicure = Medicure(tmdb_api_key, tvshows_directory=tvshows_directory)
+    with pytest.raises(
+        RuntimeError,
+        match=(
+            r'mkvmerge failed for: '
+            r'Peaky Blinders - S06E02 - Black Shirt\.mkv \(exit code 2\), '
+            r'Peaky Blinders - S06E05 - The Road to Hell\.mkv '
+            r'\(exit code 2\)\.'
+        ),
+    ):
+        medicure.treat_media(
+            tvshow_imdb_id,
+            media_file_search_patterns,
+            video_language_code,
+            video_source,
+            video_release_format,
+            [DubbingSupplier('original', 0, video_language_code)],
+            6,
+            jobs,
+        )
+
+
+def test_treat_tvshow_media_incrementally(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def get_exit_code(arguments: List[str]) -> int:
+        # Creates the output as mkvmerge would
+        Path(arguments[1]).touch()
+        return 0
+
+    commands = mock_mkvmerge(monkeypatch, get_exit_code)
+    medicure = Medicure(tmdb_api_key, tvshows_directory=tvshows_directory)
+    arguments = (
+        tvshow_imdb_id,
+        media_file_search_patterns,
+        video_language_code,
+        video_source,
+        video_release_format,
+        [DubbingSupplier('original', 0, video_language_code)],
+        6,
+    )
+    medicure.treat_media(*arguments, incremental=True)
+    assert len(commands) == 6
+
+    # Nothing has changed, so all episodes are skipped
+    medicure.treat_media(*arguments, incremental=True)
+    assert len(commands) == 6
+
+    # A changed track config invalidates all episodes
+    medicure.treat_media(
+        *arguments[:2], 'en', *arguments[3:], incremental=True
+    )
+    assert len(commands) == 12
+
+    medicure.treat_media(*arguments, incremental=True, force=True)
+    assert len(commands) == 18
+
+
+def test_treat_tvshow_media_with_truncated_manifest(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def get_exit_code(arguments: List[str]) -> int:
+        Path(arguments[1]).touch()
+        return 0
+
+    commands = mock_mkvmerge(monkeypatch, get_exit_code)
+    medicure = Medicure(tmdb_api_key, tvshows_directory=tvshows_directory)
+    arguments = (
+        tvshow_imdb_id,
+        media_file_search_patterns,
+        video_language_code,
+        video_source,
+        video_release_format,
+        [DubbingSupplier('original', 0, video_language_code)],
+        6,
+    )
+    medicure.treat_media(*arguments, incremental=True)
+    (manifest_path,) = tvshows_directory.rglob('.medicure.json')
+    # No temporary file is left next to the manifest
+    assert [p.name for p in manifest_path.parent.glob('*.tmp')] == []
+
+    # E.g. an older version has been interrupted while writing it
+    manifest_path.write_text(manifest_path.read_text()[:20])
+    medicure.treat_media(*arguments, incremental=True)
+    assert len(commands) == 12
+    with open(manifest_path) as f:
+        assert len(json.load(f)) == 6
+
+
+def test_split_up_to_date_commands_while_saving_manifest() -> None:
+    medicure = Medicure(tmdb_api_key, tvshows_directory=tvshows_directory)
+    commands = medicure._plan_media(
+        tvshow_imdb_id,
+        media_file_search_patterns,
+        video_language_code,
+        video_source,
+        video_release_format,
+        [DubbingSupplier('original', 0, video_language_code)],
+        6,
+    )
+    # Another job, e.g. of another instance, is saving manifests, they
+    # are not read meanwhile
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with ManifestStore()._lock:
+            future = executor.submit(
+                ManifestStore().split_up_to_date_commands, commands, False
+            )
+            with pytest.raises(FutureTimeoutError):
+                future.result(timeout=0.1)
+        outdated_commands, _ = future.result()
+    assert len(outdated_commands) == 6
+
+
+def test_treat_batch_with_failed_mux(monkeypatch: pytest.MonkeyPatch) -> None:
+    mock_mkvmerge(monkeypatch)
+
+    def mux_mock(command: MuxCommand, *args: Any) -> MuxResult:
+        if 'S06E03' in command.output.name:
+            raise OSError('No space left on device')
+        return mux(command, *args)
+
+    monkeypatch.setattr(core, 'mux', mux_mock)
+    medicure = Medicure(tmdb_api_key, movies_directory, tvshows_directory)
+    entry = {
+        'kind': 'subtitle',
+        'imdb_id': tvshow_imdb_id,
+        'file_search_patterns': subtitle_file_search_patterns,
+        'language_code': subtitle_language_code,
+    }
+    results = list(
+        medicure.treat_batch(
+            [{**entry, 'season_number': 6}, {**entry, 'season_number': 5}],
+            jobs=2,
+        )
+    )
+    # Only the entry whose mux raised fails
+    assert results[0].error == 'No space left on device'
+    assert results[1].succeeded
+
+
+def test_treat_batch(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Fails the last episode with mkvmerge's error exit code
+    commands = mock_mkvmerge(
+        monkeypatch, lambda arguments: 2 if 'S06E06' in arguments[1] else 0
+    )
+    medicure = Medicure(tmdb_api_key, movies_directory, tvshows_directory)
+    entries = [
+        {
+            'kind': 'media',
+            'imdb_id': movie_imdb_id,
+            'file_search_patterns': media_file_search_patterns,
+            'video_language_code': video_language_code,
+            'video_source': video_source,
+            'video_release_format': video_release_format,
+            'dubbing_suppliers': [
+                DubbingSupplier('original', 0, video_language_code)
+            ],
+        },
+        {
+            'kind': 'subtitle',
+            'imdb_id': tvshow_imdb_id,
+            'file_search_patterns': subtitle_file_search_patterns,
+            'language_code': subtitle_language_code,
+            'source': subtitle_source,
+            'release_format': subtitle_release_format,
+            'include_full_information': True,
+            'season_number': 6,
+        },
+        # No season number
+        {
+            'kind': 'subtitle',
+            'imdb_id': tvshow_imdb_id,
+            'file_search_patterns': subtitle_file_search_patterns,
+            'language_code': subtitle_language_code,
+        },
+        {'kind': 'unknown'},
+    ]
+    results = list(medicure.treat_batch(entries, jobs=4))
+    assert [result.index for result in results] == [0, 1, 2, 3]
+    assert len(commands) == 7
+    assert results[0].succeeded
+    assert results[0].outputs == [
+        movies_directory / 'The Batman - 2022 Edited/The Batman - 2022.mkv'
+    ]
+    assert len(results[1].outputs) == 6
+    assert results[1].error == (
+        'mkvmerge failed for: '
+        'Peaky Blinders - S06E06 - Lock and Key.per.mks (exit code 2).'
+    )
+    assert results[2].error == (
+        '`season_number` has not been given for a TV show.'
+    )
+    assert results[3].error == (
+        '`kind` should be either `media` or `subtitle`.'
+    )
+
+
+# Repeated seasons are treated once
+@pytest.mark.parametrize('season_number', [[5, 6], range(5, 7), [5, 6, 5]])
+def test_treat_tvshow_media_with_many_seasons(
+    season_number: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    commands = mock_mkvmerge(monkeypatch)
+    medicure = Medicure(tmdb_api_key, tvshows_directory=tvshows_directory)
+    medicure.treat_media(
+        tvshow_imdb_id,
+        media_file_search_patterns,
+        video_language_code,
+        video_source,
+        video_release_format,
+        [DubbingSupplier('original', 0, video_language_code)],
+        season_number,
+        jobs=4,
+    )
+    # One episode of season 5 and six of season 6
+    assert len(commands) == 7
+    outputs = [arguments[1] for arguments in commands]
+    assert sum('S05E01 - Black Tuesday.mkv' in o for o in outputs) == 1
+    assert sum('Series 6 Edited' in o for o in outputs) == 6
+
+
+def test_plan_tvshow_media_with_bulk_probing() -> None:
+    probed_paths = []
+
+    class RecordingProber(NativeProber):
+        def probe_many(
+            self, paths: List[Path], on_probe: Any = None
+        ) -> List[List[TrackInfo]]:
+            probed_paths.append(paths)
+            return super().probe_many(paths, on_probe)
+
+    plans = [
+        Medicure(
+            tmdb_api_key, tvshows_directory=tvshows_directory, prober=prober
+        ).plan_media(
+            tvshow_imdb_id,
+            media_file_search_patterns,
+            video_language_code,
+            video_source,
+            video_release_format,
+            [DubbingSupplier('original', 0, video_language_code)],
+            [5, 6],
+        )
+        for prober in (RecordingProber(jobs=4), NativeProber(jobs=1))
+    ]
+    # Files of all episodes of both seasons are probed in one stage
+    assert len(probed_paths) == 1
+    assert len(probed_paths[0]) >= 7
+    assert plans[0] == plans[1]
+
+
+@pytest.mark.parametrize('prober', [NativeProber(), MediaInfoProber()])
+def test_plan_tvshow_media_with_inferred_layout(prober: Prober) -> None:
+    probed_paths: List[List[Path]] = []
+
+    class RecordingProber(Prober):
+        def probe(self, path: Path) -> List[TrackInfo]:
+            probed_paths[-1].append(path)
+            return prober.probe(path)
+
+    def plan(infer_layout: bool) -> Any:
+        probed_paths.append([])
+        medicure = Medicure(
+            tmdb_api_key,
+            tvshows_directory=tvshows_directory,
+            prober=RecordingProber(),
+        )
+        return medicure.plan_media(
+            tvshow_imdb_id,
+            file_search_patterns,
+            video_language_code,
+            video_source,
+            video_release_format,
+            dubbing_suppliers,
+            [5, 6],
+            infer_layout=infer_layout,
+        )
+
+    file_search_patterns, dubbing_suppliers, _ = treat_media_args[1][-1]
+    assert plan(False) == plan(True)
+    # Only the first file of each layout is probed, and subtitles whose
+    # headers can not be read
+    assert set(probed_paths[1]) < set(probed_paths[0])
+    assert sorted(
+        path.suffix for path in probed_paths[1] if path.suffix != '.srt'
+    ) == ['.mka', '.mkv']
+
+
+def test_plan_concurrently_with_shared_medicure() -> None:
+    medicure = Medicure(tmdb_api_key, movies_directory, tvshows_directory)
+    # Extra audio and subtitle files
+    file_search_patterns, dubbing_suppliers, _ = treat_media_args[1][-1]
+    copied_dubbing_suppliers = copy.deepcopy(dubbing_suppliers)
+    arguments = [
+        (movie_imdb_id, None),
+        (tvshow_imdb_id, 6),
+        (tvshow_imdb_id, 5),
+        (movie_imdb_id, None),
+    ]
+
+    def plan(imdb_id: str, season_number: Optional[int]) -> Any:
+        return medicure.plan_media(
+            imdb_id,
+            file_search_patterns,
+            video_language_code,
+            video_source,
+            video_release_format,
+            dubbing_suppliers,
+            season_number,
+        )
+
+    sequential_plans = [plan(*a) for a in arguments]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        concurrent_plans = list(
+            executor.map(lambda a: plan(*a), arguments * 4)
+        )
+    assert concurrent_plans == sequential_plans * 4
+    # Dubbing suppliers are not mutated, so they can be shared
+    assert dubbing_suppliers == copied_dubbing_suppliers
+
+
+def test_plan_tvshow_media_with_preflight() -> None:
+    medicure = Medicure(tmdb_api_key, tvshows_directory=tvshows_directory)
+    file_search_patterns, dubbing_suppliers, _ = treat_media_args[1][-1]
+
+    def plan(dubbing_suppliers: List[DubbingSupplier], preflight: bool) -> Any:
+        return medicure.plan_media(
+            tvshow_imdb_id,
+            file_search_patterns,
+            video_language_code,
+            video_source,
+            video_release_format,
+            dubbing_suppliers,
+            6,
+            preflight=preflight,
+        )
+
+    assert plan(dubbing_suppliers, True) == plan(dubbing_suppliers, False)
+    # Problems of all episodes are reported at once, before muxing
+    dubbing_suppliers = dubbing_suppliers + [
+        DubbingSupplier('German', 0, 'ger', 'ger')
+    ]
+    plan(dubbing_suppliers, False)
+    with pytest.raises(ValueError, match='Preflight found 6 problem') as e:
+        plan(dubbing_suppliers, True)
+    assert [line[:6] for line in str(e.value).splitlines()[1:]] == [
+        f'S06E0{i}' for i in range(1, 7)
+    ]
+    assert 'Dubbing supplier German matches no audio track.' in str(e.value)
+
+    # The audio track is found, but the subtitle track is not
+    file_search_patterns, dubbing_suppliers, _ = treat_media_args[1][-1]
+    dubbing_suppliers = list(dubbing_suppliers)
+    dubbing_suppliers[1] = replace(
+        dubbing_suppliers[1], subtitle_language_code='per'
+    )
+    with pytest.raises(ValueError, match='Preflight found 6 problem') as e:
+        plan(dubbing_suppliers, True)
+    assert str(e.value).splitlines()[1] == (
+        'S06E01: Dubbing supplier TinyMoviez matches no subtitle track.'
+    )
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='Needs a POSIX script')
+def test_iter_treat_tvshow_media(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # A fake mkvmerge which reports progress in GUI mode and writes the
+    # output
+    mkvmerge = tmp_path / 'mkvmerge'
+    mkvmerge.write_text(
+        f'#!{sys.executable}\n'
+        'import json, sys\n'
+        'assert sys.argv[1] == "--gui-mode"\n'
+        'with open(sys.argv[2][1:], encoding="utf-8") as f:\n'
+        '    output = json.load(f)[1]\n'
+        'print("#GUI#progress 50%")\n'
+        'print("#GUI#progress 100%")\n'
+        'with open(output, "wb") as f:\n'
+        '    f.write(bytes(10))\n'
+    )
+    mkvmerge.chmod(0o755)
+    monkeypatch.setenv('PATH', f'{tmp_path}{os.pathsep}{os.environ["PATH"]}')
+    medicure = Medicure(tmdb_api_key, tvshows_directory=tvshows_directory)
+    file_search_patterns, dubbing_suppliers, _ = treat_media_args[1][-1]
+    events = list(
+        medicure.iter_treat_media(
+            tvshow_imdb_id,
+            file_search_patterns,
+            video_language_code,
+            video_source,
+            video_release_format,
+            dubbing_suppliers,
+            6,
+            jobs=2,
+        )
+    )
+    kinds = [event.kind for event in events]
+    # Files of all episodes are probed before anything is planned
+    assert kinds.index('planned') == kinds.count('probed') >= 6
+    assert kinds.count('planned') == kinds.count('finished') == 6
+    outputs = [e.path for e in events if e.kind == 'planned']
+    for output in outputs:
+        assert [(e.kind, e.progress) for e in events if e.path == output] == [
+            ('planned', None),
+            ('started', None),
+            ('progress', 50),
+            ('progress', 100),
+            ('finished', None),
+        ]
+        finished = [e for e in events if e.path == output][-1]
+        assert finished.result.output == output
+        assert finished.result.exit_code == 0
+        assert finished.size == 10
+
+
+def test_plan_tvshow_media_events(tmp_path: Path) -> None:
+    probe_cache = ProbeCache(tmp_path / 'probe_cache.sqlite3')
+    file_search_patterns, dubbing_suppliers, _ = treat_media_args[1][-1]
+
+    def plan(
+        infer_layout: bool, probe_cache: Optional[ProbeCache]
+    ) -> List[TreatEvent]:
+        events: List[TreatEvent] = []
+        Medicure(
+            tmdb_api_key,
+            tvshows_directory=tvshows_directory,
+            probe_cache=probe_cache,
+        )._plan_media(
+            tvshow_imdb_id,
+            file_search_patterns,
+            video_language_code,
+            video_source,
+            video_release_format,
+            dubbing_suppliers,
+            6,
+            infer_layout=infer_layout,
+            on_event=events.append,
+        )
+        assert [e.kind for e in events].count('planned') == 6
+        return [e for e in events if e.kind == 'probed']
+
+    probed = plan(False, None)
+    # Only files which are really probed have events
+    inferred = plan(True, probe_cache)
+    assert 0 < len(inferred) < len(probed)
+    assert not any(e.cached for e in probed + inferred)
+
+    cached = plan(False, probe_cache)
+    assert len(cached) == len(probed)
+    assert {e.path for e in cached if e.cached} == {e.path for e in inferred}
+
+
+def test_treat_tvshow_with_all_seasons() -> None:
+    medicure = Medicure(tmdb_api_key, tvshows_directory=tvshows_directory)
+    # Episode numbers of season 4 files do not match the pattern, so it
+    # shows all seasons are scanned.
+    with pytest.raises(
+        ValueError,
+        match='File name did not match with episode number pattern.',
+    ):
+        medicure.treat_subtitle(
+            tvshow_imdb_id,
+            subtitle_file_search_patterns,
+            subtitle_language_code,
+            season_number='all',
+        )
+
+
+def test_plan_and_apply_tvshow_media(monkeypatch: pytest.MonkeyPatch) -> None:
+    commands = mock_mkvmerge(monkeypatch)
+    medicure = Medicure(tmdb_api_key, tvshows_directory=tvshows_directory)
+    plan = medicure.plan_media(
+        tvshow_imdb_id,
+        media_file_search_patterns,
+        video_language_code,
+        video_source,
+        video_release_format,
+        [DubbingSupplier('original', 0, video_language_code)],
+        6,
+    )
+    assert commands == []
+    plan = json.loads(json.dumps(plan))
+    assert len(plan['commands']) == 6
+    video_track = plan['commands'][0]['inputs'][0]['tracks'][0]
+    assert video_track['type'] == 'video'
+    assert video_track['language'] == video_language_code
+    assert video_track['default']
+
+    mux_results = medicure.apply(plan, jobs=2)
+    assert len(commands) == 6
+    assert [str(mux_result.output) for mux_result in mux_results] == [
+        command['output'] for command in plan['commands']
+    ]
+    assert sorted(commands) == sorted(
+        MuxCommand.from_dict(command).arguments for command in plan['commands']
+    )
+
+
+@pytest.mark.parametrize(
+    'get_exit_code, correct_kind',
+    [(lambda arguments: 0, 'propedit'), (get_propedit_exit_code, 'mux')],
+)
+def test_treat_tvshow_media_with_propedit(
+    get_exit_code: Any, correct_kind: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    commands = mock_mkvmerge(monkeypatch, get_exit_code)
+    medicure = Medicure(tmdb_api_key, tvshows_directory=tvshows_directory)
+    mux_results = medicure.treat_media(
+        tvshow_imdb_id,
+        media_file_search_patterns,
+        video_language_code,
+        video_source,
+        video_release_format,
+        [DubbingSupplier('original', 0, *[video_language_code] * 3)],
+        6,
+        propedit=True,
+    )
+    assert [mux_result.kind for mux_result in mux_results] == [
+        correct_kind
+    ] * 6
+    propedit_arguments = commands[0]
+    assert propedit_arguments[0] == str(mux_results[0].output)
+    assert propedit_arguments[1:] == [
+        *['--edit', 'track:1', '--set', 'language=eng'],
+        *['--set', 'flag-default=1', '--set', 'flag-forced=0'],
+        *['--set', f'name={video_source} {video_release_format}'],
+        *['--edit', 'track:2', '--set', 'language=eng'],
+        *['--set', 'flag-default=1', '--set', 'flag-forced=0'],
+        *['--delete', 'name'],
+        *['--edit', 'track:3', '--set', 'language=eng'],
+        *['--set', 'flag-default=0', '--set', 'flag-forced=0'],
+        *['--delete', 'name'],
+    ]
+    if correct_kind == 'propedit':
+        # Clones of the inputs are edited
+        assert len(commands) == 6
+        assert all(mux_result.output.exists() for mux_result in mux_results)
+    else:
+        # Falls back to remuxing
+        assert len(commands) == 12
+        assert commands[1][:2] == ['--output', str(mux_results[0].output)]
+
+
+def test_treat_media_with_propedit_and_extra_inputs(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    commands = mock_mkvmerge(monkeypatch)
+    medicure = Medicure(tmdb_api_key, movies_directory=movies_directory)
+    mux_results = medicure.treat_media(
+        movie_imdb_id,
+        [*media_file_search_patterns, r'\.mka'],
+        video_language_code,
+        video_source,
+        video_release_format,
+        [DubbingSupplier('original', 0, video_language_code)],
+        propedit=True,
+    )
+    assert [mux_result.kind for mux_result in mux_results] == ['mux']
+    assert commands[0][0] == '--output'
+
+
+@pytest.mark.parametrize(
+    'subtitle_default, correct_kind', [('No', 'link'), ('Yes', 'mux')]
+)
+def test_treat_tvshow_media_with_linked_outputs(
+    subtitle_default: str,
+    correct_kind: str,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture,
+) -> None:
+    other_language = ['English', 'en', 'eng']
+
+    class FakeProber(Prober):
+        def probe(self, path: Path) -> List[TrackInfo]:
+            return [
+                TrackInfo('General'),
+                TrackInfo(
+                    'Video',
+                    1,
+                    f'{video_source} {video_release_format}',
+                    'en',
+                    other_language,
+                    'Yes',
+                    'No',
+                ),
+                TrackInfo('Audio', 2, None, 'en', other_language, 'Yes', 'No'),
+                TrackInfo(
+                    'Text',
+                    3,
+                    None,
+                    'en',
+                    other_language,
+                    subtitle_default,
+                    'No',
+                ),
+            ]
+
+    commands = mock_mkvmerge(monkeypatch)
+    medicure = Medicure(
+        tmdb_api_key, tvshows_directory=tvshows_directory, prober=FakeProber()
+    )
+    mux_results = medicure.treat_media(
+        tvshow_imdb_id,
+        media_file_search_patterns,
+        video_language_code,
+        video_source,
+        video_release_format,
+        [DubbingSupplier('original', 0, *[video_language_code] * 3)],
+        6,
+    )
+    assert [mux_result.kind for mux_result in mux_results] == [
+        correct_kind
+    ] * 6
+    if correct_kind == 'link':
+        assert commands == []
+        saved_bytes = 0
+        for mux_result in mux_results:
+            assert mux_result.output.exists()
+            assert mux_result.saved_bytes == mux_result.output.stat().st_size
+            saved_bytes += mux_result.saved_bytes
+        assert (
+            f'6 file(s) linked to their inputs, {saved_bytes} bytes of '
+            'writes avoided.'
+        ) in capsys.readouterr().out
+    else:
+        assert len(commands) == 6
+
+
+def test_apply_plan_with_unknown_version() -> None:
+    medicure = Medicure(tmdb_api_key)
+    with pytest.raises(AssertionError, match='`plan` version should be 1.'):
+        medicure.apply({'version': 2, 'commands': []})
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='Needs a POSIX shell script')
+def test_mux_without_shell(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # A fake mkvmerge which saves its option file and fails
+    mkvmerge = tmp_path / 'mkvmerge'
+    mkvmerge.write_text(
+        '#!/bin/sh\n'
+        'cp "${1#@}" "$(dirname "$0")/options.json"\n'
+        'echo "Error: bad track" >&2\n'
+        'exit 2\n'
+    )
+    mkvmerge.chmod(0o755)
+    monkeypatch.setenv('PATH', f'{tmp_path}{os.pathsep}{os.environ["PATH"]}')
+
+    output = tmp_path / 'It\'s "$HOME".mkv'
+    command = MuxCommand(
+        output,
+        [
+            InputPlan(
+                tmp_path / '$(ls).mkv',
+                0,
+                [TrackPlan(0, 'video', 'eng', '`ls` & $PATH', True, False)],
+            )
+        ],
+    )
+    mux_result = mux(command)
+    assert mux_result.output == output
+    assert mux_result.exit_code == 2
+    assert not mux_result.succeeded
+    assert mux_result.stderr == 'Error: bad track\n'
+    assert mux_result.wall_time > 0
+    with open(tmp_path / 'options.json', encoding='utf-8') as f:
+        assert json.load(f) == command.arguments
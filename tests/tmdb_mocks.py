@@ -1,69 +1,73 @@
 from typing import Any, Dict
 
+from medicure.tmdb_client import TMDBClient
 from tests.parameterize import movie_imdb_id, tvshow_imdb_id
 
+_tvshow_id = 60574
+_episode_names = {
+    4: [
+        'The Noose',
+        'Heathens',
+        'Blackbird',
+        'Dangerous',
+        'The Duel',
+        'The Company',
+    ],
+    5: [
+        'Black Tuesday',
+        'Black Cats',
+        'Strategy',
+        'The Loop',
+        'The Shock',
+        'Mr Jones',
+    ],
+    6: [
+        'Black Day',
+        'Black Shirt',
+        'Gold',
+        'Sapphire',
+        'The Road to Hell',
+        'Lock and Key',
+    ],
+}
 
-class FindMock:
-    def __init__(self, id: str) -> None:
-        self.id = id
-
-    def info(self, external_source: str) -> Dict[str, Any]:
-        result = {
-            movie_imdb_id: {
-                'movie_results': [
-                    {'title': 'The Batman', 'release_date': '2022-03-01'}
-                ],
-                'tv_results': [],
-            },
-            tvshow_imdb_id: {
-                'movie_results': [],
-                'tv_results': [{'name': 'Peaky Blinders', 'id': 60574}],
-            },
+responses = {
+    f'find/{movie_imdb_id}': {
+        'movie_results': [
+            {'title': 'The Batman', 'release_date': '2022-03-01'}
+        ],
+        'tv_results': [],
+    },
+    f'find/{tvshow_imdb_id}': {
+        'movie_results': [],
+        'tv_results': [{'name': 'Peaky Blinders', 'id': _tvshow_id}],
+    },
+    f'tv/{_tvshow_id}': {
+        'name': 'Peaky Blinders',
+        'seasons': [
+            {'season_number': season_number}
+            for season_number in _episode_names
+        ],
+    },
+    **{
+        f'tv/{_tvshow_id}/season/{season_number}': {
+            'name': f'Series {season_number}',
+            'episodes': [
+                {'episode_number': i + 1, 'name': name}
+                for i, name in enumerate(episode_names)
+            ],
         }
-        return result[self.id]
-
+        for season_number, episode_names in _episode_names.items()
+    },
+}
 
-class TVSeasonsMock:
-    def __init__(self, tv_id, season_number):
-        self.tv_id = tv_id
-        self.season_number = season_number
 
-    def info(self) -> Dict[str, Any]:
-        result = {
-            60574: {
-                season_number: {
-                    'name': f'Series {season_number}',
-                    'episodes': [
-                        {'episode_number': i + 1, 'name': name}
-                        for i, name in enumerate(episode_names)
-                    ],
-                }
-                for season_number, episode_names in {
-                    4: [
-                        'The Noose',
-                        'Heathens',
-                        'Blackbird',
-                        'Dangerous',
-                        'The Duel',
-                        'The Company',
-                    ],
-                    5: [
-                        'Black Tuesday',
-                        'Black Cats',
-                        'Strategy',
-                        'The Loop',
-                        'The Shock',
-                        'Mr Jones',
-                    ],
-                    6: [
-                        'Black Day',
-                        'Black Shirt',
-                        'Gold',
-                        'Sapphire',
-                        'The Road to Hell',
-                        'Lock and Key',
-                    ],
-                }.items()
-            }
-        }
-        return result[self.tv_id][self.season_number]
+def request_mock(
+    self: TMDBClient, path: str, params: Dict[str, Any]
+) -> Dict[str, Any]:
+    response = dict(responses[path])
+    for appended_path in params.get('append_to_response', '').split(','):
+        # Like TMDB, appended paths which do not exist are left out
+        if f'{path}/{appended_path}' in responses:
+            response[appended_path] = responses[f'{path}/{appended_path}']
+    return response
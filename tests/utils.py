@@ -1,11 +1,16 @@
+import json
+import subprocess
 from dataclasses import fields
 from pathlib import Path
-from typing import List
+from typing import Any, Callable, List
 
+import pytest
 from pymediainfo import MediaInfo
 
-from medicure.utils import get_movie_name, get_tvshow_info
+from medicure.tmdb_client import TMDBClient
+from medicure.utils import get_movie_name, get_tvshow_seasons_info
 from tests.data_structures import Track
+from tests.parameterize import tmdb_api_key
 
 
 def _validate_destination_directory(source_directory: Path) -> Path:
@@ -19,7 +24,9 @@ def validate_movie_media_file(
     correct_tracks: List[Track],
     movies_directory: Path,
 ) -> None:
-    movie_name = get_movie_name(imdb_id=imdb_id)
+    movie_name = get_movie_name(
+        imdb_id=imdb_id, tmdb_client=TMDBClient(tmdb_api_key)
+    )
     destination_directory = _validate_destination_directory(
         movies_directory / movie_name
     )
@@ -44,7 +51,9 @@ def validate_tvshow_media_files(
     correct_tracks: List[Track],
     tvshows_directory: Path,
 ) -> None:
-    name, season_name, season = get_tvshow_info(season_number, imdb_id=imdb_id)
+    [(name, season_name, season)] = get_tvshow_seasons_info(
+        [season_number], TMDBClient(tmdb_api_key), imdb_id=imdb_id
+    )
     destination_directory = _validate_destination_directory(
         tvshows_directory / name / season_name
     )
@@ -74,7 +83,9 @@ def validate_movie_subtitle_file(
     correct_track: Track,
     movies_directory: Path,
 ) -> None:
-    movie_name = get_movie_name(imdb_id=imdb_id)
+    movie_name = get_movie_name(
+        imdb_id=imdb_id, tmdb_client=TMDBClient(tmdb_api_key)
+    )
     destination_directory = _validate_destination_directory(
         movies_directory / movie_name
     )
@@ -100,7 +111,9 @@ def validate_tvshow_subtitle_files(
     correct_track: Track,
     tvshows_directory: Path,
 ) -> None:
-    name, season_name, season = get_tvshow_info(season_number, imdb_id=imdb_id)
+    [(name, season_name, season)] = get_tvshow_seasons_info(
+        [season_number], TMDBClient(tmdb_api_key), imdb_id=imdb_id
+    )
     season_directory = tvshows_directory / name / season_name
     destination_directory = Path(f'{season_directory} Edited')
     assert destination_directory.exists()
@@ -121,3 +134,28 @@ def validate_tvshow_subtitle_files(
                 assert getattr(
                     media_info.text_tracks[0], field.name
                 ) == getattr(correct_track, field.name)
+
+
+def mock_mkvmerge(
+    monkeypatch: pytest.MonkeyPatch,
+    get_exit_code: Callable[[List[str]], int] = lambda arguments: 0,
+) -> List[List[str]]:
+    """
+    Mocks mkvmerge and mkvpropedit runs, returns a list which arguments
+    of each run are appended to.
+    """
+    runs = []
+
+    def run_mock(
+        args: List[str], **kwargs: Any
+    ) -> subprocess.CompletedProcess:
+        assert args[0] in ('mkvmerge', 'mkvpropedit')
+        with open(args[1][1:], encoding='utf-8') as f:
+            arguments = json.load(f)
+        runs.append(arguments)
+        return subprocess.CompletedProcess(
+            args, get_exit_code(arguments), '', ''
+        )
+
+    monkeypatch.setattr(subprocess, 'run', run_mock)
+    return runs